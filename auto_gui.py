@@ -1,4 +1,4 @@
-import cv2
+import time
 import numpy as np
 from pathlib import Path
 from loguru import logger
@@ -8,6 +8,9 @@ from PySide6.QtWidgets import QApplication, QMainWindow, QGraphicsScene, QGraphi
 
 from auto_gui_ui import Ui_MainWIndow
 from hik.hik_sync_cam import HikSyncedCameras, FrameType
+from hik.frames import StereoPair
+from hik.errors import CameraError
+from hik.latency import recorder as latency
 from pts.auto_pts import scan_positions, PTSPositionGenerator
 from pts.pts_controller import PTSController
 
@@ -21,15 +24,25 @@ DEFAULT_H_COUNT = 10
 DEFAULT_V_FOV = 35
 DEFAULT_V_COUNT = 10
 DEFAULT_PORT = "COM4"
+# record undemosaiced Bayer frames into one raw session file per scan instead of jpg pairs
+SAVE_RAW = False
+# 曝光包围：每个位姿依次以这些曝光时间 (us) 各拍一组，一次扫描代替多次不同曝光的扫描；为空时每个位姿只拍一组
+BRACKET_EXPOSURES = []
+# 每个位姿（及每个曝光）平均的帧数，降低角点检测受到的传感器噪声；1 为不平均
+AVERAGE_FRAMES = 1
 
 
 class ScanThread(QThread):
     position_reached = Signal(dict)  # 发送位置信息
     scan_finished = Signal()         # 扫描完成信号
     
-    def __init__(self, camera_group: HikSyncedCameras, port: str = "COM4", h_fov: float = 40, v_fov: float = 40, h_count: int = 9, v_count: int = 9):
+    def __init__(self, camera_group: HikSyncedCameras, port: str = "COM4", h_fov: float = 40, v_fov: float = 40, h_count: int = 9, v_count: int = 9,
+                 exposures: list = None, average: int = 1, saving_path: str | Path = ROOT_DIR):
         super().__init__()
         self.camera_group = camera_group
+        self.exposures = list(exposures or [])
+        self.average = max(int(average), 1)
+        self.saving_path = Path(saving_path)
         self.port = port
         self.h_fov = h_fov
         self.v_fov = v_fov
@@ -41,6 +54,8 @@ class ScanThread(QThread):
         self._is_running = False
         
     def run(self):
+        # exposure to restore after a bracketed scan
+        base_exposure = self.camera_group.params.get("ExposureTime")[0] if self.exposures else None
         try:
             for position_info in scan_positions(h_fov=self.h_fov, v_fov=self.v_fov, h_count=self.h_count, v_count=self.v_count, port=self.port):
                 if not self._is_running:
@@ -48,9 +63,28 @@ class ScanThread(QThread):
                     
                 self.position_reached.emit(position_info)
                 QThread.msleep(1500)
+                # backpressure: wait until the image writer can take one more pair
+                self.camera_group.writer.wait_for_capacity(2)
+                if self.exposures:
+                    # whole bracket in one pass, every set is awaited instead of sleeping
+                    record = self.camera_group.capture_bracket(self.exposures, position_info,
+                                                               reverse=position_info["index"] % 2 == 0,
+                                                               average=self.average)
+                    self.camera_group.save_pose(self.saving_path, record)
+                    continue
+                if self.average > 1:
+                    # the averaged pair is emitted and saved like a single capture
+                    self.camera_group.capture_averaged(self.average)
+                    continue
                 self.camera_group.capture_dual_camera()
                 QThread.msleep(1000)
 
+            self.camera_group.writer.flush()
+            if base_exposure is not None:
+                self.camera_group.set_exp(base_exposure)
+            # per-stage latency of this scan, when AUTOCAMCALIB_LATENCY is set
+            if latency.enabled:
+                latency.dump(self.saving_path / f"latency_{int(time.time())}.json")
             self.scan_finished.emit()
         except Exception as e:
             logger.error(f"Scan process error: {str(e)}")
@@ -66,11 +100,13 @@ class AutoGui(QMainWindow, Ui_MainWIndow):
         self.camera_group = None
         self.scan_thread = None
 
-        self.left_frame_captured = False
-        self.right_frame_captured = False
-
         self.actionConnnect_Cameras.triggered.connect(self.connect_camera)
         self.pushButton_start.clicked.connect(self.start_scan_process)
+        # connected once, the slots use the camera group connected at call time
+        self.actionCapture_Camera.triggered.connect(self.capture_camera)
+        # edits are debounced, only the value typed last reaches the cameras
+        self.lineEdit_expTime.textChanged.connect(lambda text: self.request_camera_param("ExposureTime", text))
+        self.lineEdit_gain.textChanged.connect(lambda text: self.request_camera_param("Gain", text))
 
         self.lineEdit_savingPath.setText(str(ROOT_DIR))
 
@@ -147,19 +183,39 @@ class AutoGui(QMainWindow, Ui_MainWIndow):
         self.graphicsView_right.scene().addItem(self.right_pixmap)
 
     def connect_camera(self):
-        self.camera_group = HikSyncedCameras()
-        self.camera_group.initialize_camera_group()
-        self.camera_group.frame_signal.connect(self.update_frame)
-        self.camera_group.frame_signal.connect(self.save_frame)
+        if self.camera_group:
+            # reconnect: close the cameras and the image writer of the previous group first
+            self.camera_group._deinit_cameras()
+            self.camera_group = None
+        camera_group = HikSyncedCameras()
+        try:
+            camera_group.initialize_camera_group()
+        except CameraError as e:
+            logger.error(f"相机连接失败: {e}")
+            QMessageBox.critical(self, "错误", f"相机连接失败: {e}")
+            return
+        self.camera_group = camera_group
+        self._update_preview_size()
+        self.camera_group.preview_signal.connect(self.update_frame)
+        self.camera_group.stereo_pair_signal.connect(self.save_frame)
 
         # set default exp and gain
-        self.camera_group.set_exp(DEFAULT_EXP)
-        self.camera_group.set_gain(DEFAULT_GAIN)
+        self.camera_group.set_exp_gain(DEFAULT_EXP, DEFAULT_GAIN)
 
-        self.lineEdit_expTime.textChanged.connect(lambda: self.camera_group.set_exp(int(self.lineEdit_expTime.text())))
-        self.lineEdit_gain.textChanged.connect(lambda: self.camera_group.set_gain(int(self.lineEdit_gain.text())))
+    def capture_camera(self):
+        if not self.camera_group:
+            QMessageBox.warning(self, "警告", "请先连接相机")
+            return
+        self.camera_group.capture_dual_camera()
 
-        self.actionCapture_Camera.triggered.connect(self.camera_group.capture_dual_camera)
+    def request_camera_param(self, name: str, text: str):
+        if not self.camera_group:
+            return
+        try:
+            value = float(text)
+        except ValueError:
+            return
+        self.camera_group.params.request(name, value)
 
     def start_scan_process(self):
         if not self.camera_group:
@@ -176,10 +232,22 @@ class AutoGui(QMainWindow, Ui_MainWIndow):
             h_fov=float(self.lineEdit_hFov.text()),
             v_fov=float(self.lineEdit_vFov.text()),
             h_count=int(self.lineEdit_hCount.text()),
-            v_count=int(self.lineEdit_vCount.text())
+            v_count=int(self.lineEdit_vCount.text()),
+            exposures=BRACKET_EXPOSURES,
+            average=AVERAGE_FRAMES,
+            saving_path=self.lineEdit_savingPath.text()
         )
         self.scan_thread.position_reached.connect(self.on_position_reached)
         self.scan_thread.scan_finished.connect(self.on_scan_finished)
+        if SAVE_RAW:
+            try:
+                self.camera_group.start_raw_session(self.lineEdit_savingPath.text(),
+                                                    max_pairs=int(self.lineEdit_hCount.text()) * int(self.lineEdit_vCount.text())
+                                                    * max(len(BRACKET_EXPOSURES), 1) * AVERAGE_FRAMES)
+            except CameraError as e:
+                logger.error(f"raw 录制启动失败: {e}")
+                QMessageBox.critical(self, "错误", f"raw 录制启动失败: {e}")
+                return
         self.scan_thread.start()
         
         self.pushButton_start.setEnabled(False)
@@ -188,32 +256,35 @@ class AutoGui(QMainWindow, Ui_MainWIndow):
         logger.info(f"到达位置 {position_info['index']}")
         
     def on_scan_finished(self):
+        self.camera_group.stop_raw_session()
         self.pushButton_start.setEnabled(True)
         logger.info("扫描过程完成")
 
-    def update_frame(self, type: FrameType, frame: np.ndarray):
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = frame.shape
+    def update_frame(self, type: FrameType, preview: np.ndarray):
+        # preview is already downscaled to the viewport and RGB on the acquisition thread
+        t0 = time.perf_counter()
+        h, w, ch = preview.shape
         bytes_per_line = ch * w
-        q_image = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
+        q_image = QImage(preview.data, w, h, bytes_per_line, QImage.Format_RGB888)
         if type == FrameType.LEFT:
             self.left_pixmap.setPixmap(QPixmap.fromImage(q_image))
             self.graphicsView_left.fitInView(self.left_pixmap, Qt.KeepAspectRatio)
         elif type == FrameType.RIGHT:
             self.right_pixmap.setPixmap(QPixmap.fromImage(q_image))
             self.graphicsView_right.fitInView(self.right_pixmap, Qt.KeepAspectRatio)
+        latency.since("paint", t0)
 
-    def save_frame(self, type: FrameType, frame: np.ndarray):
-        if type == FrameType.LEFT:
-            self.left_frame_captured = True
-        elif type == FrameType.RIGHT:
-            self.right_frame_captured = True
+    def _update_preview_size(self):
+        viewport = self.graphicsView_left.viewport().size()
+        if self.camera_group:
+            self.camera_group.set_preview_size(viewport.width(), viewport.height())
+
+    def resizeEvent(self, event):
+        self._update_preview_size()
+        return super().resizeEvent(event)
 
-        if self.left_frame_captured and self.right_frame_captured:
-            self.camera_group.save_frames(self.lineEdit_savingPath.text())
-            # reset flag
-            self.left_frame_captured = False
-            self.right_frame_captured = False
+    def save_frame(self, pair: StereoPair):
+        self.camera_group.save_frames(self.lineEdit_savingPath.text(), pair)
 
     def closeEvent(self, event):
         if self.camera_group:
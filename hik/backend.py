@@ -0,0 +1,87 @@
+# backend.py
+#
+# A camera backend is a namespace exposing the part of the MVS python API (MvCameraControl_class) used
+# by the capture path: the MvCamera class, the ctypes structs and the constants.
+#   "hik"  the MVS SDK, needs MVCAM_SDK_PATH / MVCAM_COMMON_RUNENV and real cameras
+#   "sim"  hik.sim_camera, a simulated rig rendering chessboard frames, needs neither
+#
+# Backends are loaded on first use, not on import: the GUIs and the tools that do not touch a camera
+# never pay for the SDK import.
+
+import os
+import time
+import importlib
+import threading
+
+from loguru import logger
+
+from hik.errors import CameraError
+
+
+BACKEND_ENV = "AUTOCAMCALIB_BACKEND"
+DEFAULT_BACKEND = "hik"
+# loading a backend slower than this is logged as a warning
+LOAD_BUDGET_MS = 500
+
+
+def _load_hik():
+    from hik.utils import load_hik_sdk
+    return load_hik_sdk()
+
+
+def _load_sim():
+    return importlib.import_module("hik.sim_camera")
+
+
+BACKENDS = {
+    "hik": _load_hik,
+    "sim": _load_sim,
+}
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def is_loaded(backend=None) -> bool:
+    """
+        Whether a backend has been loaded already, without loading it
+    """
+    return (backend or os.environ.get(BACKEND_ENV, DEFAULT_BACKEND)) in _loaded
+
+
+def get_backend(backend=None):
+    """
+        Return a camera backend, loading it on first use
+
+    Args:
+    --------------------
+        backend: str, "hik" or "sim", defaults to $AUTOCAMCALIB_BACKEND or "hik";
+                 a backend namespace is returned as is
+
+    Returns:
+    --------------------
+        module exposing MvCamera, the MV_* structs and constants
+
+    Raises:
+    --------------------
+        CameraError: the backend failed to load, e.g. the MVS SDK is not installed
+    """
+    if backend is not None and not isinstance(backend, str):
+        return backend
+    name = backend or os.environ.get(BACKEND_ENV, DEFAULT_BACKEND)
+    if name not in BACKENDS:
+        raise ValueError(f"unknown camera backend: {name}, expected one of {list(BACKENDS)}")
+    with _load_lock:
+        if name not in _loaded:
+            t0 = time.perf_counter()
+            try:
+                module = BACKENDS[name]()
+            except ImportError as e:
+                raise CameraError(f"load {name} camera backend", detail=str(e)) from e
+            load_ms = (time.perf_counter() - t0) * 1e3
+            if load_ms > LOAD_BUDGET_MS:
+                logger.warning(f"{name} camera backend loaded in {load_ms:.0f} ms, over the {LOAD_BUDGET_MS} ms budget")
+            else:
+                logger.info(f"{name} camera backend loaded in {load_ms:.0f} ms")
+            _loaded[name] = module
+        return _loaded[name]
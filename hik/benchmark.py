@@ -0,0 +1,336 @@
+# benchmark.py
+#
+# Offline micro benchmarks for the capture path, no camera required:
+#   python -m hik.benchmark conversion --width 5472 --height 3648
+#   python -m hik.benchmark latency
+#   python -m hik.benchmark throughput --cameras 4 --width 4032 --height 3036 --poses 20
+#   python -m hik.benchmark startup
+
+import time
+import queue
+import sys
+import json
+import argparse
+import tempfile
+import threading
+import subprocess
+from ctypes import c_ubyte, memmove, byref, cast, POINTER
+
+import numpy as np
+
+from hik.utils import buffer2numpy
+
+
+def _legacy_buffer2numpy(data, nWidth, nHeight):
+    # 旧版本的实现：三次按通道跨步拷贝到新分配的数组
+    data_ = np.frombuffer(data, count=int(nWidth * nHeight * 3), dtype=np.uint8, offset=0)
+    data_r = data_[0:nWidth * nHeight * 3:3]
+    data_g = data_[1:nWidth * nHeight * 3:3]
+    data_b = data_[2:nWidth * nHeight * 3:3]
+    numArray = np.zeros([nHeight, nWidth, 3], "uint8")
+    numArray[:, :, 0] = data_r.reshape(nHeight, nWidth)
+    numArray[:, :, 1] = data_g.reshape(nHeight, nWidth)
+    numArray[:, :, 2] = data_b.reshape(nHeight, nWidth)
+    return numArray
+
+
+def _legacy_path(sdk_raw, sdk_rgb, width, height):
+    """
+        memmove raw -> ConvertPixelType -> memmove rgb -> buffer2numpy, as CamRunThread used to do.
+    The SDK conversion is stood in for by a memmove of the RGB-sized output.
+    """
+    raw_len = width * height
+    rgb_len = width * height * 3
+    buf_save_image = (c_ubyte * raw_len)()
+    memmove(byref(buf_save_image), sdk_raw, raw_len)
+    pDstBuffer = (c_ubyte * rgb_len)()
+    memmove(byref(pDstBuffer), sdk_rgb, rgb_len)
+    img_buff = (c_ubyte * (rgb_len + 2048))()
+    memmove(byref(img_buff), pDstBuffer, rgb_len)
+    frame = _legacy_buffer2numpy(img_buff, width, height)
+    # raw copy + conversion + rgb copy + zeros fill + per-channel copies
+    copied = raw_len + rgb_len + rgb_len + rgb_len + rgb_len
+    return frame, copied
+
+
+def _single_copy_path(sdk_rgb, width, height):
+    """
+        ConvertPixelType straight from the SDK buffer, then a zero-copy numpy view.
+    """
+    rgb_len = width * height * 3
+    img_buff = (c_ubyte * rgb_len)()
+    memmove(byref(img_buff), sdk_rgb, rgb_len)
+    frame = buffer2numpy(img_buff, width, height)
+    return frame, rgb_len
+
+
+def bench_conversion(width=5472, height=3648, repeat=10):
+    """
+        Compare bytes copied and time per frame between the legacy and single-copy conversion paths.
+
+    Returns:
+    --------------------
+        dict: {path_name: (mb_copied_per_frame, ms_per_frame)}
+    """
+    sdk_raw = (c_ubyte * (width * height))()
+    sdk_rgb = (c_ubyte * (width * height * 3))()
+
+    results = {}
+    for name, func in (
+        ("legacy", lambda: _legacy_path(sdk_raw, sdk_rgb, width, height)),
+        ("single_copy", lambda: _single_copy_path(sdk_rgb, width, height)),
+    ):
+        func()  # warm up the allocator
+        copied = 0
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            frame, copied = func()
+            del frame
+        elapsed = (time.perf_counter() - t0) / repeat
+        results[name] = (copied / 1e6, elapsed * 1e3)
+        print(f"{name:>12}: {copied / 1e6:8.1f} MB copied/frame, {elapsed * 1e3:8.2f} ms/frame")
+    return results
+
+
+class FakeMvCamera:
+    """
+        Minimal stand-in for MvCamera: every software trigger makes one frame available after exposure_ms.
+    """
+    def __init__(self, width=640, height=480, exposure_ms=5):
+        self.width = width
+        self.height = height
+        self.exposure_ms = exposure_ms
+        self.frame_num = 0
+        self._frames = queue.Queue()
+        self._raw = (c_ubyte * (width * height))()
+
+    def MV_CC_SetCommandValue(self, name):
+        t_trigger = time.perf_counter()
+        threading.Timer(self.exposure_ms / 1000, self._frames.put, args=(t_trigger,)).start()
+        return 0
+
+    def MV_CC_GetImageBuffer(self, stOutFrame, nMsec):
+        from hik.sim_camera import MV_E_NODATA, PixelType_Gvsp_BayerRG8
+        try:
+            self._frames.get(timeout=nMsec / 1000)
+        except queue.Empty:
+            return MV_E_NODATA
+        self.frame_num += 1
+        stOutFrame.stFrameInfo.nWidth = self.width
+        stOutFrame.stFrameInfo.nHeight = self.height
+        stOutFrame.stFrameInfo.nFrameLen = self.width * self.height
+        stOutFrame.stFrameInfo.enPixelType = PixelType_Gvsp_BayerRG8
+        stOutFrame.stFrameInfo.nFrameNum = self.frame_num
+        stOutFrame.pBufAddr = cast(self._raw, POINTER(c_ubyte))
+        return 0
+
+    def MV_CC_ConvertPixelType(self, stConvertParam):
+        memmove(stConvertParam.pDstBuffer, stConvertParam.pSrcData, stConvertParam.nSrcDataLen)
+        return 0
+
+    def MV_CC_FreeImageBuffer(self, stOutFrame):
+        return 0
+
+
+def _legacy_polling_loop(cam, state, on_frame, grab_timeout_ms):
+    # 旧版 CamRunThread.run 的等待逻辑：100 ms 轮询标志位，然后阻塞取流
+    from hik.sim_camera import MV_FRAME_OUT
+    stOutFrame = MV_FRAME_OUT()
+    while not state["exit"]:
+        if state["capture"]:
+            if cam.MV_CC_GetImageBuffer(stOutFrame, grab_timeout_ms) == 0:
+                on_frame()
+            state["capture"] = False
+        time.sleep(0.1)
+
+
+def bench_latency(n_triggers=20, exposure_ms=5, legacy_grab_timeout_ms=10000):
+    """
+        Trigger-to-frame and stop latency of the event-driven CamRunThread against the old polling loop,
+    using FakeMvCamera. The stop latency is measured while a grab is pending and no frame arrives.
+    """
+    from PySide6.QtCore import Qt, QThreadPool
+    from hik.hik_sync_cam import CamRunThread, FrameType
+
+    def report(name, latencies, stop_latency):
+        latencies = np.array(latencies) * 1e3 - exposure_ms
+        print(f"{name:>14}: trigger->frame overhead p50 {np.percentile(latencies, 50):7.2f} ms, "
+              f"max {latencies.max():7.2f} ms, stop {stop_latency * 1e3:8.1f} ms")
+
+    # event driven
+    cam = FakeMvCamera(exposure_ms=exposure_ms)
+    thread = CamRunThread(cam, FrameType.LEFT, sdk="sim")
+    thread.setAutoDelete(False)
+    arrived = threading.Event()
+    thread.signals.captured_frame.connect(lambda *args: arrived.set(), Qt.DirectConnection)
+    QThreadPool.globalInstance().start(thread)
+    latencies = []
+    for _ in range(n_triggers):
+        arrived.clear()
+        t0 = time.perf_counter()
+        cam.MV_CC_SetCommandValue("TriggerSoftware")
+        thread.start_capture()
+        arrived.wait(5)
+        latencies.append(time.perf_counter() - t0)
+        time.sleep(0.02)
+    thread.start_capture()
+    time.sleep(0.05)
+    t0 = time.perf_counter()
+    thread.stop(wait_ms=int(legacy_grab_timeout_ms) + 1000)
+    report("event_driven", latencies, time.perf_counter() - t0)
+
+    # legacy polling
+    cam = FakeMvCamera(exposure_ms=exposure_ms)
+    state = {"capture": False, "exit": False}
+    worker = threading.Thread(target=_legacy_polling_loop,
+                              args=(cam, state, arrived.set, legacy_grab_timeout_ms), daemon=True)
+    worker.start()
+    latencies = []
+    for _ in range(n_triggers):
+        arrived.clear()
+        t0 = time.perf_counter()
+        cam.MV_CC_SetCommandValue("TriggerSoftware")
+        state["capture"] = True
+        arrived.wait(5)
+        latencies.append(time.perf_counter() - t0)
+        time.sleep(0.02)
+    state["capture"] = True
+    time.sleep(0.15)
+    t0 = time.perf_counter()
+    state["exit"] = True
+    worker.join()
+    report("legacy_polling", latencies, time.perf_counter() - t0)
+
+
+def bench_throughput(n_cameras=2, width=4032, height=3036, pixel_format="BayerRG8", latency_ms=60,
+                     poses=20, move_ms=0, saving_path=None, raw=False):
+    """
+        Headless scan / capture / save through HikCameraGroup on simulated cameras: for every pose wait
+    for writer capacity, trigger, wait for the frame set and queue it for saving, as ScanThread does.
+
+    Returns:
+    --------------------
+        dict: frame sets per second, MB per second saved, the writer stats and the per-stage latency
+    """
+    from PySide6.QtCore import QCoreApplication
+    from hik import sim_camera
+    from hik.latency import recorder as latency
+    from hik.hik_sync_cam import HikCameraGroup, CameraSpec, MASTER_CFG_PATH, SLAVE_CFG_PATH
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    names = [f"cam{i}" for i in range(n_cameras)]
+    sim_camera.configure(names, width=width, height=height, pixel_format=pixel_format, latency_ms=latency_ms)
+    group = HikCameraGroup([CameraSpec(name, MASTER_CFG_PATH if i == 0 else SLAVE_CFG_PATH, master=i == 0)
+                            for i, name in enumerate(names)], backend="sim")
+    frame_sets = []
+    group.frame_set_signal.connect(frame_sets.append)
+    group.initialize_camera_group()
+    latency_enabled, latency.enabled = latency.enabled, True
+    latency.reset()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saving_path = saving_path or tmp
+        if raw:
+            group.start_raw_session(saving_path, max_sets=poses)
+        t0 = time.perf_counter()
+        for pose in range(poses):
+            time.sleep(move_ms / 1000)
+            group.writer.wait_for_capacity(n_cameras)
+            group.capture()
+            deadline = time.perf_counter() + 5
+            while len(frame_sets) <= pose and time.perf_counter() < deadline:
+                app.processEvents()
+                time.sleep(0.001)
+            if len(frame_sets) <= pose:
+                print(f"pose {pose}: no frame set")
+                break
+            group.save_frames(saving_path, frame_sets[pose])
+        group.writer.flush()
+        elapsed = time.perf_counter() - t0
+        writer_stats = group.writer.stats()
+        raw_mb = len(group.raw_writer) * width * height / 1e6 if group.raw_writer is not None else 0
+        group._deinit_cameras()
+
+    mb = raw_mb if raw else writer_stats["total_mb"]
+    results = {
+        "sets_per_s": len(frame_sets) / elapsed,
+        "mb_per_s": mb / elapsed,
+        "writer": writer_stats,
+        "latency": latency.stats(),
+    }
+    latency.enabled = latency_enabled
+    print(f"{n_cameras} x {width}x{height} {pixel_format}, {len(frame_sets)} sets in {elapsed:.2f} s: "
+          f"{results['sets_per_s']:.2f} sets/s, {results['mb_per_s']:.1f} MB/s {'raw' if raw else 'jpg'}")
+    if not raw:
+        print(f"writer: encode {writer_stats['mean_encode_ms']:.1f} ms, write {writer_stats['mean_write_ms']:.1f} ms per image")
+    print(latency.report())
+    return results
+
+
+# entry points that must start without the camera SDK: (module, statement run after the import)
+STARTUP_TARGETS = [
+    ("auto_gui", ""),
+    ("hik.gui.caputre_gui", ""),
+    ("hik.hik_sync_cam", "hik.hik_sync_cam.HikSyncedCameras()"),
+    ("pts.auto_pts", "pts.auto_pts.PTSPositionGenerator().generate_grid_positions()"),
+]
+STARTUP_BUDGET_MS = 1000
+
+_STARTUP_PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+{statement}
+print(json.dumps({{"ms": (time.perf_counter() - t0) * 1e3, "sdk": "MvCameraControl_class" in sys.modules}}))
+"""
+
+
+def bench_startup(repeat=3, budget_ms=STARTUP_BUDGET_MS):
+    """
+        Import time of the GUIs and tools in a fresh interpreter each run, and whether the import loaded
+    the camera SDK. None of them should: the SDK is loaded by the first camera operation.
+    """
+    results = {}
+    for module, statement in STARTUP_TARGETS:
+        times, sdk = [], False
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE.format(module=module, statement=statement)],
+                                 capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"{module:>20}: failed\n{out.stderr.strip().splitlines()[-1]}")
+                break
+            probe = json.loads(out.stdout.strip().splitlines()[-1])
+            times.append(probe["ms"])
+            sdk |= probe["sdk"]
+        if not times:
+            continue
+        best = min(times)
+        results[module] = {"ms": best, "sdk": sdk}
+        verdict = "ok" if best <= budget_ms and not sdk else "OVER BUDGET" if best > budget_ms else "LOADS SDK"
+        print(f"{module:>20}: {best:7.0f} ms{' (SDK loaded)' if sdk else ''}  {verdict}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="capture path benchmarks")
+    parser.add_argument("mode", choices=["conversion", "latency", "throughput", "startup"])
+    parser.add_argument("--width", type=int, default=5472)
+    parser.add_argument("--height", type=int, default=3648)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--cameras", type=int, default=2, help="throughput: simulated cameras")
+    parser.add_argument("--pixel-format", default="BayerRG8", help="throughput: simulated pixel format")
+    parser.add_argument("--latency-ms", type=float, default=60, help="throughput: trigger to frame latency")
+    parser.add_argument("--poses", type=int, default=20, help="throughput: captures in the scan")
+    parser.add_argument("--move-ms", type=float, default=0, help="throughput: simulated pose move time")
+    parser.add_argument("--raw", action="store_true", help="throughput: record a raw session instead of jpg")
+    args = parser.parse_args()
+
+    if args.mode == "conversion":
+        bench_conversion(args.width, args.height, args.repeat)
+    elif args.mode == "latency":
+        bench_latency(n_triggers=args.repeat)
+    elif args.mode == "throughput":
+        bench_throughput(args.cameras, args.width, args.height, args.pixel_format, args.latency_ms,
+                         args.poses, args.move_ms, raw=args.raw)
+    elif args.mode == "startup":
+        bench_startup(args.repeat)
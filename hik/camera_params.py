@@ -0,0 +1,178 @@
+# camera_params.py
+#
+# Exposure and gain of a camera group. GUI edits are coalesced into one write per camera after the
+# user stops typing, values a camera already holds are not written again, cameras are written
+# concurrently and every write is confirmed by reading the value back.
+
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from loguru import logger
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+
+# quiet time after the last edit before the pending values are written
+PARAM_DEBOUNCE_MS = 300
+
+
+def _same(a: float, b: float) -> bool:
+    return a is not None and b is not None and math.isclose(a, b, rel_tol=1e-6, abs_tol=1e-6)
+
+
+class CameraParameterManager(QObject):
+    """
+        Float features (ExposureTime, Gain) of every camera of a HikCameraGroup.
+
+    ``request`` is for GUI edits: values are collected and written PARAM_DEBOUNCE_MS after the last
+    request, on a worker thread, so typing never blocks the GUI and half-typed values never reach the
+    cameras. ``apply`` writes at once and waits. Each camera keeps a cache of the values it was asked
+    for and the values it read back (the camera may round them), seeded from the snapshot of the
+    config engine; a value equal to either is not written again. Batches are applied in order, the
+    cameras of a batch in parallel.
+    """
+    applied = Signal(dict)      # {feature: [read-back value per camera, None if it failed]}
+
+    def __init__(self, group, debounce_ms: int = PARAM_DEBOUNCE_MS):
+        super().__init__()
+        self.group = group
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._cache = {}        # {(camera index, feature): (requested, read back)}
+        self._batches = ThreadPoolExecutor(max_workers=1, thread_name_prefix="CamParams")
+        self.closed = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def reset(self):
+        """
+            Forget the cached values, e.g. after the cameras were reconnected; restarts the worker after close
+        """
+        with self._lock:
+            self._cache.clear()
+        if self.closed:
+            self._batches = ThreadPoolExecutor(max_workers=1, thread_name_prefix="CamParams")
+            self.closed = False
+
+    def close(self):
+        """
+            Drop the edits waiting for the debounce and the queued batches, finish the running batch
+        and stop the worker thread; call before the camera handles are released
+        """
+        self._timer.stop()
+        with self._lock:
+            self._pending.clear()
+        self.closed = True
+        self._batches.shutdown(wait=True, cancel_futures=True)
+
+    def request(self, name: str, value: float):
+        """
+            Queue a value for all cameras; the last value requested within the debounce interval wins
+        """
+        with self._lock:
+            self._pending[name] = float(value)
+        self._timer.start()
+
+    @Slot()
+    def flush(self) -> Future:
+        """
+            Write the queued values now, without waiting for the result
+        """
+        self._timer.stop()
+        with self._lock:
+            values, self._pending = self._pending, {}
+        if self.closed:
+            future = Future()
+            future.set_result({})
+            return future
+        return self._batches.submit(self._apply, values)
+
+    def apply(self, values: dict) -> dict:
+        """
+            Write values to all cameras and wait for the read-back
+
+        Args:
+        --------------------
+            values: dict, {feature: value}, e.g. {"ExposureTime": 10000, "Gain": 0}
+
+        Returns:
+        --------------------
+            dict: {feature: [read-back value per camera, None if the camera failed]}
+        """
+        return self._batches.submit(self._apply, {name: float(value) for name, value in values.items()}).result()
+
+    def get(self, name: str) -> list:
+        """
+            Cached read-back value of a feature per camera, without touching the devices
+        """
+        return [self._cached(i, name)[1] for i in range(len(self.group.cams))]
+
+    def _apply(self, values: dict) -> dict:
+        if not values:
+            return {}
+        cams = list(self.group.cams)
+        if len(cams) == 1:
+            per_camera = [self._apply_camera(0, cams[0], values)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(cams), thread_name_prefix="CamParam") as executor:
+                per_camera = list(executor.map(lambda args: self._apply_camera(*args, values), enumerate(cams)))
+
+        results = {name: [applied.get(name) for applied in per_camera] for name in values}
+        failed = [name for name, applied in results.items() if None in applied]
+        if failed:
+            logger.error(f"set {', '.join(failed)} failed")
+        else:
+            logger.info("set " + ", ".join(f"{name} {applied}" for name, applied in results.items()))
+        self.applied.emit(results)
+        return results
+
+    def _apply_camera(self, index: int, cam, values: dict) -> dict:
+        applied = {}
+        if cam is None:
+            return applied
+        cam_name = self.group.specs[index].name.upper()
+        for name, value in values.items():
+            requested, current = self._cached(index, name)
+            if _same(value, requested) or _same(value, current):
+                applied[name] = current
+                continue
+            ret = cam.MV_CC_SetFloatValue(name, value)
+            if ret != 0:
+                logger.warning(f"{cam_name} cam: set {name} {value:g} failed! ret[0x{ret & 0xffffffff:x}]")
+                continue
+            current = self._read(cam, name)
+            if current is None:
+                logger.warning(f"{cam_name} cam: read back of {name} failed")
+                continue
+            if not _same(value, current):
+                logger.debug(f"{cam_name} cam: {name} {value:g} applied as {current:g}")
+            with self._lock:
+                self._cache[index, name] = (value, current)
+            # keep the config engine's snapshot in step, it is reused on reconnect
+            if self.group.serials[index]:
+                self.group.feature_engine.update(self.group.serials[index], name, current)
+            applied[name] = current
+        return applied
+
+    def _cached(self, index: int, name: str) -> tuple:
+        with self._lock:
+            cached = self._cache.get((index, name))
+        if cached is not None:
+            return cached
+        # the value the config engine last saw on this camera
+        serial = self.group.serials[index]
+        snapshot = self.group.feature_engine.cached(serial) if serial else None
+        setting = snapshot.settings.get((name, None)) if snapshot is not None else None
+        try:
+            return None, float(setting.value) if setting is not None else None
+        except ValueError:
+            return None, None
+
+    def _read(self, cam, name: str) -> float | None:
+        stFloatValue = self.group.sdk.MVCC_FLOATVALUE()
+        ret = cam.MV_CC_GetFloatValue(name, stFloatValue)
+        if ret != 0:
+            return None
+        return stFloatValue.fCurValue
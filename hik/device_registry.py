@@ -0,0 +1,173 @@
+# device_registry.py
+
+import time
+import threading
+from ctypes import cast, POINTER
+from dataclasses import dataclass, replace
+
+from loguru import logger
+
+from hik.backend import get_backend
+from hik.errors import CameraError
+
+
+# 枚举结果的有效期，期间重连和左右相机识别不再调用 MV_CC_EnumDevices
+ENUM_TTL_S = 10.0
+
+
+def _c_str(chars) -> str:
+    # fixed-size, NUL terminated char array of the SDK structs
+    return bytes(chars).split(b"\0", 1)[0].decode("ascii", errors="replace")
+
+
+def _ip_str(ip: int) -> str:
+    return f"{(ip >> 24) & 0xff}.{(ip >> 16) & 0xff}.{(ip >> 8) & 0xff}.{ip & 0xff}"
+
+
+@dataclass(frozen=True)
+class DeviceInfo:
+    index: int              # position in the SDK device list, used to create the handle
+    transport: str          # "GigE" or "USB"
+    user_name: str          # DeviceUserID
+    model_name: str
+    serial_number: str
+    ip: str = None          # GigE only
+
+    @property
+    def label(self) -> str:
+        address = self.ip if self.transport == "GigE" else self.serial_number
+        return f"[{self.index}]{self.transport}: {self.user_name} {self.model_name}({address})"
+
+    @classmethod
+    def from_sdk(cls, index, mvcc_dev_info, sdk) -> "DeviceInfo":
+        if mvcc_dev_info.nTLayerType == sdk.MV_GIGE_DEVICE:
+            info = mvcc_dev_info.SpecialInfo.stGigEInfo
+            return cls(index, "GigE", _c_str(info.chUserDefinedName), _c_str(info.chModelName),
+                       _c_str(info.chSerialNumber), _ip_str(info.nCurrentIp))
+        info = mvcc_dev_info.SpecialInfo.stUsb3VInfo
+        return cls(index, "USB", _c_str(info.chUserDefinedName), _c_str(info.chModelName),
+                   _c_str(info.chSerialNumber))
+
+
+@dataclass(frozen=True)
+class _Enumeration:
+    """
+        One enumeration result, replaced as a whole so readers never see a half updated registry
+    """
+    devices: tuple = ()
+    by_serial: dict = None
+    by_name: dict = None    # {lower case user name: tuple of DeviceInfo}, names need not be unique
+    by_ip: dict = None
+    device_list: object = None
+    stamp: float = None
+
+
+class DeviceRegistry:
+    """
+        Enumerated devices indexed by serial number, user defined name and IP.
+
+    Enumeration results are reused for ``ttl_s`` seconds, so reconnecting and resolving cameras by
+    name do not pay a full MV_CC_EnumDevices pass while the topology is unchanged. Call
+    ``invalidate`` when a device could not be opened, the next lookup enumerates again.
+    The camera backend is loaded by the first enumeration.
+    """
+    def __init__(self, backend=None, ttl_s: float = ENUM_TTL_S):
+        self.backend = backend
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._enumeration = _Enumeration()
+
+    @property
+    def sdk(self):
+        return get_backend(self.backend)
+
+    @property
+    def device_list(self):
+        """
+            The SDK list the DeviceInfo.index values refer to, needed by MV_CC_CreateHandle
+        """
+        return self._enumeration.device_list
+
+    def _current(self, refresh: bool = False) -> _Enumeration:
+        with self._lock:
+            enumeration = self._enumeration
+            if refresh or enumeration.stamp is None or time.monotonic() - enumeration.stamp > self.ttl_s:
+                enumeration = self._enumeration = self._enumerate()
+            return enumeration
+
+    def devices(self, refresh: bool = False) -> list[DeviceInfo]:
+        return list(self._current(refresh).devices)
+
+    def invalidate(self):
+        with self._lock:
+            self._enumeration = replace(self._enumeration, stamp=None)
+
+    def _enumerate(self) -> _Enumeration:
+        t0 = time.perf_counter()
+        sdk = self.sdk
+        device_list = sdk.MV_CC_DEVICE_INFO_LIST()
+        ret = sdk.MvCamera.MV_CC_EnumDevices(sdk.MV_GIGE_DEVICE | sdk.MV_USB_DEVICE, device_list)
+        if ret != 0:
+            raise CameraError("enum devices", ret)
+
+        devices = []
+        for i in range(device_list.nDeviceNum):
+            mvcc_dev_info = cast(device_list.pDeviceInfo[i], POINTER(sdk.MV_CC_DEVICE_INFO)).contents
+            if mvcc_dev_info.nTLayerType not in (sdk.MV_GIGE_DEVICE, sdk.MV_USB_DEVICE):
+                continue
+            devices.append(DeviceInfo.from_sdk(i, mvcc_dev_info, sdk))
+
+        by_name = {}
+        for d in devices:
+            if d.user_name:
+                by_name.setdefault(d.user_name.lower(), []).append(d)
+        logger.info(f"enumerated {len(devices)} devices in {(time.perf_counter() - t0) * 1e3:.0f} ms")
+        for d in devices:
+            logger.debug(d.label)
+        if not devices:
+            logger.error("find no device!")
+        return _Enumeration(
+            devices=tuple(devices),
+            by_serial={d.serial_number: d for d in devices if d.serial_number},
+            by_name={name: tuple(matches) for name, matches in by_name.items()},
+            by_ip={d.ip: d for d in devices if d.ip},
+            device_list=device_list,
+            stamp=time.monotonic(),
+        )
+
+    def by_serial(self, serial_number: str) -> DeviceInfo | None:
+        return self._current().by_serial.get(serial_number)
+
+    def by_name(self, user_name: str) -> DeviceInfo | None:
+        """
+            Device with this user defined name (case-insensitive), None if no or several devices have it
+        """
+        matches = self._current().by_name.get(user_name.lower(), ())
+        return matches[0] if len(matches) == 1 else None
+
+    def by_ip(self, ip: str) -> DeviceInfo | None:
+        return self._current().by_ip.get(ip)
+
+    def resolve(self, key: str) -> DeviceInfo | None:
+        """
+            Find the device whose serial number, IP or user defined name (case-insensitive) equals key;
+            if none does, the one device whose user defined name contains key, e.g. "left" for a camera
+            named "A_left_cam"
+
+        Raises:
+        --------------------
+            CameraError: more than one device matches key, exactly or, without an exact match, by name
+        """
+        enumeration = self._current()
+        matches = [enumeration.by_serial.get(key), enumeration.by_ip.get(key),
+                   *enumeration.by_name.get(key.lower(), ())]
+        matches = list(dict.fromkeys(d for d in matches if d is not None))
+        if not matches:
+            matches = [d for d in enumeration.devices if d.user_name and key.lower() in d.user_name.lower()]
+            if len(matches) == 1:
+                logger.debug(f"{key!r} resolved by user defined name to {matches[0].label}")
+        if len(matches) > 1:
+            raise CameraError("resolve device", detail=f"{key!r} matches {[d.label for d in matches]}")
+        if not matches:
+            logger.debug(f"no device is named {key!r}, devices: {[d.label for d in enumeration.devices]}")
+        return matches[0] if matches else None
@@ -0,0 +1,38 @@
+# errors.py
+
+
+class CameraError(RuntimeError):
+    """
+        A camera operation failed
+
+    Attributes:
+    --------------------
+        step: str, operation that failed, e.g. "open", "configure", "start grabbing"
+        ret: int, SDK error code, None if the failure did not come from an SDK call
+        camera: str, name of the camera, None if not camera specific
+    """
+    def __init__(self, step: str, ret: int = None, camera: str = None, detail: str = None):
+        self.step = step
+        self.ret = ret
+        self.camera = camera
+        self.detail = detail
+        super().__init__(str(self))
+
+    def __str__(self):
+        msg = f"{self.step} failed"
+        if self.camera is not None:
+            msg = f"{self.camera} cam: {msg}"
+        if self.ret is not None:
+            msg += f"! ret[0x{self.ret & 0xffffffff:x}]"
+        if self.detail:
+            msg += f": {self.detail}"
+        return msg
+
+
+class CameraInitError(CameraError):
+    """
+        Bringing up a camera group failed; ``errors`` holds the failure of every camera that failed
+    """
+    def __init__(self, errors: list[CameraError]):
+        self.errors = list(errors)
+        super().__init__("initialize cameras", detail="; ".join(str(e) for e in self.errors))
@@ -0,0 +1,366 @@
+# feature_config.py
+#
+# Incremental apply of GenApi persistence files (the .cfg files written by MV_CC_FeatureSave).
+#
+# A persistence file is a list of "Feature<TAB>Value" lines. Selected features are preceded by the
+# selector line they depend on, e.g.
+#   LineSelector    Line2
+#   LineSource      ExposureStartActive
+# so every setting is keyed by (feature, last selector line before it).
+
+import os
+import math
+import time
+import tempfile
+import threading
+from ctypes import c_bool
+from pathlib import Path
+from dataclasses import dataclass, field
+
+from loguru import logger
+
+
+# features read back to confirm a cached snapshot still matches the camera before it is trusted
+VERIFY_FEATURES = 8
+# hardware sync settings (trigger, I/O lines, strobe), always written when a cached snapshot is used:
+# a wrong value leaves the cameras out of sync, and their enum values cannot be read back as symbols
+SYNC_FEATURE_PREFIXES = ("Trigger", "Line", "Strobe")
+
+
+@dataclass(frozen=True)
+class FeatureSetting:
+    name: str
+    value: str
+    selector: tuple = None      # (selector name, selector value) the feature depends on, if any
+
+    @property
+    def key(self):
+        return self.name, self.selector
+
+
+@dataclass
+class FeatureFile:
+    """
+        Parsed persistence file: settings in file order, and the selector values the file leaves behind
+    """
+    path: Path
+    settings: dict = field(default_factory=dict)    # {(name, selector): FeatureSetting}
+    selectors: dict = field(default_factory=dict)   # {selector name: final value}
+
+    def __len__(self):
+        return len(self.settings)
+
+    @classmethod
+    def parse(cls, path: str | Path) -> "FeatureFile":
+        feature_file = cls(Path(path))
+        selector = None
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                parts = line.split(None, 1)
+                name = parts[0]
+                value = parts[1].strip() if len(parts) > 1 else ""
+                if name.endswith("Selector"):
+                    selector = (name, value)
+                    feature_file.selectors[name] = value
+                    continue
+                setting = FeatureSetting(name, value, selector)
+                # a later line for the same feature and selector wins, as it would with FeatureLoad
+                feature_file.settings.pop(setting.key, None)
+                feature_file.settings[setting.key] = setting
+        return feature_file
+
+    def diff(self, current: "FeatureFile") -> list[FeatureSetting]:
+        """
+            Settings of this file whose value differs from, or is missing in, current; in file order
+        """
+        changed = []
+        for key, setting in self.settings.items():
+            other = current.settings.get(key)
+            if other is None or not _same_value(setting.value, other.value):
+                changed.append(setting)
+        return changed
+
+
+def _same_value(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    try:
+        # persistence files print floats with limited precision
+        return math.isclose(float(a), float(b), rel_tol=1e-5, abs_tol=1e-6)
+    except ValueError:
+        return False
+
+
+@dataclass
+class ApplyReport:
+    path: Path
+    total: int = 0              # settings in the file
+    written: int = 0            # settings that differed and were written
+    failed: list = field(default_factory=list)     # names of settings the camera refused
+    snapshot_ms: float = 0.0
+    write_ms: float = 0.0
+    full_load: bool = False     # fell back to MV_CC_FeatureLoad
+    cached: bool = False        # diffed against the verified cached snapshot instead of a new one
+
+    @property
+    def total_ms(self):
+        return self.snapshot_ms + self.write_ms
+
+    def __str__(self):
+        if self.full_load:
+            return f"{self.path.name}: full load in {self.total_ms:.0f} ms"
+        return (f"{self.path.name}: wrote {self.written} / {self.total} features in {self.total_ms:.0f} ms "
+                f"({'cached snapshot verified' if self.cached else 'snapshot'} {self.snapshot_ms:.0f} ms, "
+                f"write {self.write_ms:.0f} ms)"
+                + (f", {len(self.failed)} failed: {self.failed}" if self.failed else ""))
+
+
+class FeatureConfigEngine:
+    """
+        Applies persistence files by writing only the features the camera does not already hold.
+
+    Config files are parsed once and cached until they change on disk. The camera's current values are
+    read in one MV_CC_FeatureSave and cached per camera key (its serial number); the cache is kept up
+    to date with everything written through the engine, and with ``update`` for writes made elsewhere.
+    On a later apply, e.g. after a reconnect, the cached snapshot is used if up to VERIFY_FEATURES of
+    its values, preferring the ones the engine had to write before, read back unchanged; otherwise
+    (camera power-cycled or changed by another program) a new snapshot is taken. With a cached
+    snapshot the hardware sync settings (SYNC_FEATURE_PREFIXES) of the file are written regardless,
+    they are the ones another program most likely changed and cannot all be read back.
+    Thread-safe, so cameras of a group can be configured concurrently.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}        # {path: (mtime, FeatureFile)}
+        self._snapshots = {}    # {camera key: FeatureFile}
+        self._setters = {}      # {feature name: setter name that worked}
+        self._written = {}      # {camera key: {setting key: None}}, settings written by earlier applies
+
+    def load(self, path: str | Path) -> FeatureFile:
+        path = Path(path)
+        mtime = path.stat().st_mtime
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        feature_file = FeatureFile.parse(path)
+        with self._lock:
+            self._files[path] = (mtime, feature_file)
+        return feature_file
+
+    def snapshot(self, cam, key: str) -> FeatureFile | None:
+        """
+            Read every feature value of the camera with MV_CC_FeatureSave, None on failure
+        """
+        fd, tmp = tempfile.mkstemp(suffix=".cfg", prefix="snapshot_")
+        os.close(fd)
+        try:
+            ret = cam.MV_CC_FeatureSave(tmp)
+            if ret != 0:
+                logger.warning(f"feature snapshot of {key} failed! ret[0x{ret & 0xffffffff:x}]")
+                return None
+            current = FeatureFile.parse(tmp)
+        finally:
+            os.remove(tmp)
+        with self._lock:
+            self._snapshots[key] = current
+        return current
+
+    def cached(self, key: str) -> FeatureFile | None:
+        """
+            Last known feature values of a camera, without touching the device
+        """
+        with self._lock:
+            return self._snapshots.get(key)
+
+    def forget(self, key: str):
+        """
+            Drop the cached values of a camera, e.g. after writing features outside the engine
+        """
+        with self._lock:
+            self._snapshots.pop(key, None)
+
+    def update(self, key: str, name: str, value):
+        """
+            Record a value written to an unselected feature outside the engine
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                setting = FeatureSetting(name, value if isinstance(value, str) else f"{value:g}")
+                snapshot.settings[setting.key] = setting
+
+    def apply(self, cam, path: str | Path, key: str, sdk=None) -> ApplyReport:
+        """
+            Bring the camera to the values of a persistence file, writing only the differing features.
+            Falls back to MV_CC_FeatureLoad if the camera values cannot be read.
+
+        Args:
+        --------------------
+            cam: MvCamera, opened and not grabbing
+            path: str or Path, persistence file
+            key: str, camera key of the snapshot cache, e.g. the serial number
+            sdk: SDK namespace (MVCC_* value structs) to verify a cached snapshot with,
+                 None always takes a new snapshot
+
+        Returns:
+        --------------------
+            ApplyReport
+        """
+        target = self.load(path)
+        report = ApplyReport(target.path, total=len(target))
+
+        t0 = time.perf_counter()
+        active = {}     # selector values set during this apply
+        current = self.cached(key) if sdk is not None else None
+        if current is not None and self._verify(cam, sdk, key, current, target, active):
+            report.cached = True
+        else:
+            current = self.snapshot(cam, key)
+        t1 = time.perf_counter()
+        report.snapshot_ms = (t1 - t0) * 1e3
+        if current is None:
+            ret = cam.MV_CC_FeatureLoad(str(target.path))
+            report.write_ms = (time.perf_counter() - t1) * 1e3
+            report.full_load = True
+            report.written = report.total
+            self.forget(key)
+            if ret != 0:
+                report.failed.append(target.path.name)
+            return report
+
+        changed = target.diff(current)
+        if report.cached:
+            differing = {setting.key for setting in changed}
+            changed = [setting for setting in target.settings.values()
+                       if setting.key in differing or setting.name.startswith(SYNC_FEATURE_PREFIXES)]
+        for setting in changed:
+            if setting.selector is not None and not self._select(cam, setting.selector, active):
+                report.failed.append(setting.name)
+                continue
+            if self._write(cam, setting.name, setting.value):
+                report.written += 1
+                with self._lock:
+                    current.settings[setting.key] = setting
+                    self._written.setdefault(key, {})[setting.key] = None
+            else:
+                report.failed.append(setting.name)
+
+        # leave the selectors where the file leaves them
+        for name, value in target.selectors.items():
+            if name in active and active[name] != value:
+                self._select(cam, (name, value), active)
+        report.write_ms = (time.perf_counter() - t1) * 1e3
+        return report
+
+    def _verify(self, cam, sdk, key: str, snapshot: FeatureFile, target: FeatureFile, active: dict) -> bool:
+        """
+            Read back the numeric features of the cached snapshot: every selected one, with its selector
+            set, and up to VERIFY_FEATURES unselected ones. True if at least one was read and all of them
+            match. Unselected features written by earlier applies are checked first, they are the ones a
+            power-cycle or another program would have changed back.
+        """
+        with self._lock:
+            written = list(self._written.get(key, ()))
+            setters = dict(self._setters)
+        keys = written + [k for k in target.settings if k not in written]
+        checked = 0
+        unselected = 0
+        for name, selector in keys:
+            if selector is None and unselected >= VERIFY_FEATURES:
+                continue
+            setting = snapshot.settings.get((name, selector))
+            if setting is None:
+                continue
+            kinds = [setters[name]] if name in setters else _candidate_setters(setting.value)
+            kinds = [kind for kind in kinds if kind in _GETTERS]
+            if not kinds:
+                continue
+            if selector is not None and not self._select(cam, selector, active):
+                continue
+            value = next((v for v in (_GETTERS[kind](cam, sdk, name) for kind in kinds) if v is not None), None)
+            if value is None or not _same_value(setting.value, value):
+                logger.debug(f"cached snapshot of {key} is stale: {name} {setting.value} -> {value}")
+                return False
+            checked += 1
+            if selector is None:
+                unselected += 1
+        return checked > 0
+
+    def _select(self, cam, selector, active) -> bool:
+        name, value = selector
+        if active.get(name) == value:
+            return True
+        if not self._write(cam, name, value):
+            return False
+        active[name] = value
+        return True
+
+    def _write(self, cam, name: str, value: str) -> bool:
+        """
+            Write one feature with the setter matching its type. The type is not in the file, so setters
+            are tried in order and the one that works is remembered per feature name.
+        """
+        with self._lock:
+            known = self._setters.get(name)
+        candidates = [known] if known else _candidate_setters(value)
+        for setter in candidates:
+            try:
+                ret = _SETTERS[setter](cam, name, value)
+            except ValueError:
+                continue
+            if ret == 0:
+                if not known:
+                    with self._lock:
+                        self._setters[name] = setter
+                return True
+        logger.debug(f"failed to write feature {name} = {value}")
+        return False
+
+
+def _candidate_setters(value: str) -> list[str]:
+    try:
+        float(value)
+    except ValueError:
+        return ["enum", "string"]
+    if value in ("0", "1"):
+        return ["bool", "int", "float", "enum_int"]
+    if "." in value or "e" in value.lower():
+        return ["float"]
+    return ["int", "float", "enum_int"]
+
+
+_SETTERS = {
+    "enum": lambda cam, name, value: cam.MV_CC_SetEnumValueByString(name, value),
+    "string": lambda cam, name, value: cam.MV_CC_SetStringValue(name, value),
+    "bool": lambda cam, name, value: cam.MV_CC_SetBoolValue(name, value == "1"),
+    "int": lambda cam, name, value: cam.MV_CC_SetIntValue(name, int(value)),
+    "float": lambda cam, name, value: cam.MV_CC_SetFloatValue(name, float(value)),
+    "enum_int": lambda cam, name, value: cam.MV_CC_SetEnumValue(name, int(value)),
+}
+
+
+def _get_value(struct, getter, field):
+    def get(cam, sdk, name):
+        value = getattr(sdk, struct)() if struct else c_bool()
+        if getattr(cam, getter)(name, value) != 0:
+            return None
+        value = getattr(value, field)
+        return ("1" if value else "0") if isinstance(value, bool) else str(value)
+    return get
+
+
+# read-back of the numeric setter types, enum and string values are not compared cheaply
+_GETTERS = {
+    "bool": _get_value(None, "MV_CC_GetBoolValue", "value"),
+    "int": _get_value("MVCC_INTVALUE", "MV_CC_GetIntValue", "nCurValue"),
+    "float": _get_value("MVCC_FLOATVALUE", "MV_CC_GetFloatValue", "fCurValue"),
+    "enum_int": _get_value("MVCC_ENUMVALUE", "MV_CC_GetEnumValue", "nCurValue"),
+}
+
+
+# shared by every camera group, so the cached snapshots survive a reconnect with a new group
+engine = FeatureConfigEngine()
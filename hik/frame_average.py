@@ -0,0 +1,103 @@
+# frame_average.py
+#
+# Temporal averaging of frames of a static scene, to lower the sensor noise corner detection sees.
+# The mean is accumulated in float32 in place, and the temporal noise is estimated with Welford's
+# algorithm on a sparse pixel grid, so memory stays at about one float32 image per camera whatever
+# the number of frames.
+
+import numpy as np
+
+from hik.frames import CapturedFrame
+
+
+# every NOISE_GRID_STRIDE-th pixel in both directions is used for the noise estimate
+NOISE_GRID_STRIDE = 8
+
+
+class FrameAverager:
+    """
+        Running mean of the frames of one camera.
+
+    ``add`` folds a frame into the float32 sum, the frame's buffer can be reused right after.
+    ``result`` returns the mean as a uint8 CapturedFrame whose ``meta`` reports:
+        averaged:           number of frames
+        noise_sigma:        temporal noise of a single frame, DN, RMS over the grid pixels
+        noise_sigma_mean:   expected noise of the mean, sigma / sqrt(N) plus the uint8 rounding
+        noise_reduction:    noise_sigma / noise_sigma_mean
+    A median would need all N frames in memory, so only the mean is offered.
+    """
+    def __init__(self, noise_stride: int = NOISE_GRID_STRIDE):
+        self.noise_stride = noise_stride
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.first = None
+        self.last = None
+        self._sum = None
+        self._grid_mean = None
+        self._grid_m2 = None
+
+    def add(self, frame: CapturedFrame):
+        image = frame.image
+        grid = image[::self.noise_stride, ::self.noise_stride].astype(np.float32)
+        if self._sum is None:
+            self._sum = image.astype(np.float32)
+            self._grid_mean = grid
+            self._grid_m2 = np.zeros_like(grid)
+        else:
+            if image.shape != self._sum.shape:
+                raise ValueError(f"frame shape {image.shape} does not match {self._sum.shape}")
+            np.add(self._sum, image, out=self._sum)
+            # Welford update of the per-pixel mean and sum of squared deviations
+            delta = grid - self._grid_mean
+            self._grid_mean += delta / (self.n + 1)
+            self._grid_m2 += delta * (grid - self._grid_mean)
+        self.n += 1
+        # keep the metadata, not the image, the pool buffer can be reused
+        self.last = CapturedFrame(frame.camera, None, frame_num=frame.frame_num, dev_timestamp=frame.dev_timestamp,
+                                  host_timestamp=frame.host_timestamp, arrival=frame.arrival, exposure_us=frame.exposure_us,
+                                  gain=frame.gain, seq=frame.seq, preview=frame.preview)
+        if self.n == 1:
+            self.first = self.last
+
+    @property
+    def noise_sigma(self) -> float:
+        if self.n < 2:
+            return 0.0
+        return float(np.sqrt(np.mean(self._grid_m2) / (self.n - 1)))
+
+    def result(self) -> CapturedFrame:
+        """
+            Mean of the frames added so far, rounded to uint8. Consumes the sum, call reset before reuse.
+        """
+        if self.n == 0:
+            raise ValueError("no frames to average")
+        image = self._sum
+        image *= 1.0 / self.n
+        np.rint(image, out=image)
+        image = image.astype(np.uint8)
+        self._sum = None
+
+        sigma = self.noise_sigma
+        # rounding to uint8 adds uniform noise of 1 / sqrt(12) DN
+        sigma_mean = float(np.sqrt(sigma ** 2 / self.n + 1 / 12))
+        last = self.last
+        return CapturedFrame(
+            camera=last.camera,
+            image=image,
+            frame_num=last.frame_num,
+            dev_timestamp=self.first.dev_timestamp,
+            host_timestamp=self.first.host_timestamp,
+            arrival=self.first.arrival,
+            exposure_us=last.exposure_us,
+            gain=last.gain,
+            seq=last.seq,
+            preview=last.preview,
+            meta={
+                "averaged": self.n,
+                "noise_sigma": round(sigma, 3),
+                "noise_sigma_mean": round(sigma_mean, 3),
+                "noise_reduction": round(sigma / sigma_mean, 2) if sigma > 0 else 1.0,
+            },
+        )
@@ -0,0 +1,112 @@
+# frame_pool.py
+
+import weakref
+import threading
+from ctypes import c_ubyte, addressof
+
+import numpy as np
+from loguru import logger
+
+
+class _PooledBuffer:
+    """
+        Owner of a pooled buffer exposed through ``__array_interface__``. numpy keeps the owner as the
+    ``base`` of the array and of every view derived from it, so the owner lives as long as any view.
+    """
+    __slots__ = ("buf", "__array_interface__", "__weakref__")
+
+    def __init__(self, buf, shape):
+        self.buf = buf
+        self.__array_interface__ = {
+            "shape": shape,
+            "typestr": "|u1",
+            "data": (addressof(buf), False),
+            "version": 3,
+        }
+
+
+class FrameBufferPool:
+    """
+        Per-camera pool of ctypes frame buffers keyed on (width, height, pixel type).
+
+    Buffers handed out through ``wrap`` return to the pool automatically once the numpy
+    view and every view derived from it (slices, reshapes, cv2 views) are garbage collected.
+    Buffers that were acquired but never wrapped go back via ``release``.
+    """
+    def __init__(self, name=""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._free = {}       # key -> [buffer, ...]
+        self._keys = {}       # id(buffer) -> key, for buffers owned by this pool
+        self._out = set()     # id(buffer) of buffers currently handed out
+
+        self.hits = 0
+        self.misses = 0
+        self.in_use = 0
+        self.high_water = 0
+
+    def preallocate(self, width, height, pixel_type, nbytes, count):
+        """
+            Allocate ``count`` buffers of ``nbytes`` for the given frame geometry up front
+        """
+        key = (width, height, pixel_type)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            for _ in range(count):
+                buf = (c_ubyte * nbytes)()
+                self._keys[id(buf)] = key
+                free.append(buf)
+        logger.debug(f"{self.name} pool: preallocated {count} x {nbytes / 1e6:.1f} MB for {key}")
+
+    def acquire(self, width, height, pixel_type, nbytes):
+        """
+            Take a buffer from the pool, allocating a new one on a miss
+        """
+        key = (width, height, pixel_type)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if free:
+                buf = free.pop()
+                self.hits += 1
+            else:
+                buf = None
+                self.misses += 1
+            self.in_use += 1
+            self.high_water = max(self.high_water, self.in_use)
+        if buf is None:
+            buf = (c_ubyte * nbytes)()
+        with self._lock:
+            self._keys[id(buf)] = key
+            self._out.add(id(buf))
+        return buf
+
+    def release(self, buf):
+        """
+            Return a buffer to the pool, buffers not handed out by this pool are ignored
+        """
+        with self._lock:
+            if id(buf) not in self._out:
+                return
+            self._out.discard(id(buf))
+            key = self._keys[id(buf)]
+            self._free.setdefault(key, []).append(buf)
+            self.in_use -= 1
+
+    def wrap(self, buf, width, height, channels=3):
+        """
+            Numpy view over ``buf`` that gives the buffer back to the pool when it is collected
+        """
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        owner = _PooledBuffer(buf, shape)
+        # the finalizer is on the owner, not the array: derived views reference the owner, not the array
+        weakref.finalize(owner, self.release, buf)
+        return np.asarray(owner)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "in_use": self.in_use,
+                "high_water": self.high_water,
+            }
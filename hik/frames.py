@@ -0,0 +1,323 @@
+# frames.py
+
+import threading
+from enum import IntEnum
+from collections import deque
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+from loguru import logger
+
+
+class FrameType(IntEnum):
+    """
+        Camera index of the two views of a stereo rig
+    """
+    LEFT = 0
+    RIGHT = 1
+
+# a frame set is complete when every camera delivered a frame within this window (host clock)
+DEFAULT_TIMESTAMP_WINDOW_MS = 1000
+
+
+# channel order of CapturedFrame.image, as delivered by MV_CC_ConvertPixelType(PixelType_Gvsp_RGB8_Packed)
+CHANNEL_ORDER = "RGB"
+
+_CONVERSIONS = {
+    "BGR": cv2.COLOR_RGB2BGR,
+    "GRAY": cv2.COLOR_RGB2GRAY,
+}
+
+
+@dataclass
+class CapturedFrame:
+    """
+        One converted frame together with the MV_FRAME_OUT_INFO_EX fields needed for pairing.
+
+    ``image`` is always in CHANNEL_ORDER. Other formats are converted on first request and cached
+    on the frame, so each format is computed at most once however many consumers ask for it.
+    """
+    camera: int                 # index of the camera in its group, FrameType for stereo rigs
+    image: np.ndarray
+    frame_num: int = 0
+    dev_timestamp: int = 0      # (nDevTimeStampHigh << 32) | nDevTimeStampLow, device ticks
+    host_timestamp: int = 0     # nHostTimeStamp, ms
+    arrival: float = 0.0        # perf_counter when MV_CC_GetImageBuffer returned, s
+    exposure_us: float = 0.0    # fExposureTime the frame was exposed with
+    gain: float = 0.0           # fGain, dB
+    seq: int = -1               # trigger sequence, assigned by FrameSetMatcher
+    preview: np.ndarray = None  # viewport-sized RGB image, made on the acquisition thread
+    meta: dict = field(default_factory=dict)   # processing applied to the image, e.g. temporal averaging
+    stamps: dict = field(default_factory=dict, repr=False, compare=False)   # perf_counter per stage, see hik.latency
+    _converted: dict = field(default_factory=dict, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @classmethod
+    def from_frame_info(cls, camera, image, stFrameInfo):
+        return cls(
+            camera=int(camera),
+            image=image,
+            frame_num=stFrameInfo.nFrameNum,
+            dev_timestamp=(stFrameInfo.nDevTimeStampHigh << 32) | stFrameInfo.nDevTimeStampLow,
+            host_timestamp=stFrameInfo.nHostTimeStamp,
+            exposure_us=getattr(stFrameInfo, "fExposureTime", 0.0),
+            gain=getattr(stFrameInfo, "fGain", 0.0),
+        )
+
+    @property
+    def frame_type(self):
+        return FrameType(self.camera) if self.camera < len(FrameType) else self.camera
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def as_format(self, fmt: str) -> np.ndarray:
+        """
+            Image in "RGB", "BGR" or "GRAY", converted lazily and cached
+        """
+        fmt = fmt.upper()
+        if fmt == CHANNEL_ORDER:
+            return self.image
+        if fmt not in _CONVERSIONS:
+            raise ValueError(f"unsupported frame format: {fmt}")
+        with self._lock:
+            if fmt not in self._converted:
+                self._converted[fmt] = cv2.cvtColor(self.image, _CONVERSIONS[fmt])
+            return self._converted[fmt]
+
+    def as_rgb(self) -> np.ndarray:
+        return self.as_format("RGB")
+
+    def as_bgr(self) -> np.ndarray:
+        return self.as_format("BGR")
+
+    def as_gray(self) -> np.ndarray:
+        return self.as_format("GRAY")
+
+
+@dataclass
+class FrameSet:
+    """
+        One frame of every camera of a group, from the same trigger, ordered by camera index
+    """
+    frames: list
+    exposure_starts: list = None    # exposure start of every frame on the host clock, s, see SyncMonitor
+    in_sync: bool = None            # exposure starts within the sync tolerance, None if not measured
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, camera) -> CapturedFrame:
+        return self.frames[camera]
+
+    @property
+    def seq(self):
+        return self.frames[0].seq
+
+    @property
+    def frame_nums(self):
+        return tuple(f.frame_num for f in self.frames)
+
+    @property
+    def host_skew_ms(self):
+        return self.frames[0].host_timestamp - self.frames[-1].host_timestamp
+
+    @property
+    def host_spread_ms(self):
+        stamps = [f.host_timestamp for f in self.frames]
+        return max(stamps) - min(stamps)
+
+    @property
+    def sync_skew_ms(self):
+        if self.exposure_starts is None:
+            return None
+        return (self.exposure_starts[0] - self.exposure_starts[-1]) * 1e3
+
+    @property
+    def sync_spread_ms(self):
+        if self.exposure_starts is None:
+            return None
+        return (max(self.exposure_starts) - min(self.exposure_starts)) * 1e3
+
+
+class StereoPair(FrameSet):
+    """
+        Left and right frames of the same trigger
+    """
+    def __init__(self, left: CapturedFrame, right: CapturedFrame):
+        super().__init__([left, right])
+
+    @property
+    def left(self) -> CapturedFrame:
+        return self.frames[FrameType.LEFT]
+
+    @property
+    def right(self) -> CapturedFrame:
+        return self.frames[FrameType.RIGHT]
+
+
+@dataclass
+class PoseRecord:
+    """
+        Exposure bracket of one pose: one FrameSet per exposure, in the order of ``exposures``
+    """
+    exposures: list             # requested ExposureTime per set, us
+    sets: list                  # FrameSet per exposure, None where the capture timed out
+    position: dict = None       # pose the bracket was taken at, e.g. the scan_positions info
+
+    def __len__(self):
+        return len(self.sets)
+
+    def __iter__(self):
+        return iter(zip(self.exposures, self.sets))
+
+    @property
+    def complete(self):
+        return all(frame_set is not None for frame_set in self.sets)
+
+    def to_dict(self) -> dict:
+        """
+            JSON friendly summary of the record, without the images
+        """
+        return {
+            "position": self.position,
+            "exposures": list(self.exposures),
+            "sets": [None if frame_set is None else [
+                {"camera": f.camera, "frame_num": f.frame_num, "dev_timestamp": f.dev_timestamp,
+                 "host_timestamp": f.host_timestamp, "exposure_us": f.exposure_us, "gain": f.gain, **f.meta}
+                for f in frame_set.frames] for frame_set in self.sets],
+        }
+
+
+class FrameSetMatcher:
+    """
+        Bounded matcher that groups one frame per camera of the same trigger.
+
+    In triggered mode every frame a camera delivers belongs to one trigger, so a camera's hardware
+    frame number relative to its first frame after ``reset`` is the trigger sequence. Frames are grouped
+    on equal sequence; if ``timestamp_window_ms`` is set, they must also arrive within a window of each
+    other on the host: ``timestamp_window_ms``, narrowed to half the shortest recent trigger interval
+    once one is known, so frames of neighbouring triggers never fall into one window. A frame whose
+    equal-sequence partner is outside the window while another camera's pending frame is inside it
+    re-aligns its camera's sequence base onto that frame (e.g. when one camera missed a trigger, or
+    lost its very first frame). Frames that can no longer be grouped, or that overflow
+    ``max_pending``, are dropped and counted as orphans.
+    """
+    def __init__(self, n_views: int, max_pending: int = 4, timestamp_window_ms: int | None = DEFAULT_TIMESTAMP_WINDOW_MS):
+        self.n_views = n_views
+        self.max_pending = max_pending
+        self.timestamp_window_ms = timestamp_window_ms
+
+        self.matched = 0
+        self.orphans = 0
+        self._base = {}
+        self._pending = {camera: deque() for camera in range(n_views)}
+        # host timestamp of the last frame and the interval before it, per camera, ms
+        self._last_host = {}
+        self._interval = {}
+
+    def reset(self):
+        self._base.clear()
+        self._last_host.clear()
+        self._interval.clear()
+        for queue in self._pending.values():
+            queue.clear()
+
+    def push(self, frame: CapturedFrame) -> FrameSet | None:
+        """
+            Add one frame, returning a FrameSet when it completes one
+        """
+        camera = frame.camera
+        others = [c for c in range(self.n_views) if c != camera]
+        base = self._base.setdefault(camera, frame.frame_num)
+        frame.seq = frame.frame_num - base
+        if camera in self._last_host:
+            self._interval[camera] = frame.host_timestamp - self._last_host[camera]
+        self._last_host[camera] = frame.host_timestamp
+        window = self._window_ms()
+
+        if window is not None:
+            pending = [f for c in others for f in self._pending[c]]
+            nearest = min(pending, key=lambda f: abs(f.host_timestamp - frame.host_timestamp), default=None)
+            if (nearest is not None and nearest.seq != frame.seq and self._in_window(frame, nearest, window)
+                    and not any(f.seq == frame.seq and self._in_window(frame, f, window) for f in pending)):
+                # same trigger by arrival time, but the sequence bases disagree: re-align this camera
+                logger.warning(f"camera {camera} sequence re-aligned: seq {frame.seq} -> {nearest.seq}")
+                self._base[camera] += frame.seq - nearest.seq
+                frame.seq = nearest.seq
+
+        matches = {}
+        for c in others:
+            index = next((i for i, f in enumerate(self._pending[c])
+                          if f.seq == frame.seq and self._in_window(frame, f, window)), None)
+            if index is None:
+                break
+            matches[c] = index
+
+        if len(matches) == len(others):
+            frames = {camera: frame}
+            for c, index in matches.items():
+                # older frames of the other cameras can no longer be grouped
+                self._drop(c, index)
+                frames[c] = self._pending[c].popleft()
+            # neither can older frames of this camera
+            own_queue = self._pending[camera]
+            self._drop(camera, sum(1 for f in own_queue if f.seq <= frame.seq))
+            self.matched += 1
+            return self.make_set([frames[c] for c in range(self.n_views)])
+
+        own_queue = self._pending[camera]
+        own_queue.append(frame)
+        if len(own_queue) > self.max_pending:
+            self._drop(camera, len(own_queue) - self.max_pending)
+        return None
+
+    def make_set(self, frames) -> FrameSet:
+        """
+            Build the set type of this matcher from one frame per camera, in camera order,
+        e.g. for frames combined outside the matcher
+        """
+        return FrameSet(frames)
+
+    def _window_ms(self) -> float | None:
+        """
+            Matching window: timestamp_window_ms, at most half the shortest recent trigger interval
+        """
+        if self.timestamp_window_ms is None:
+            return None
+        intervals = [interval for interval in self._interval.values() if interval > 0]
+        if not intervals:
+            return self.timestamp_window_ms
+        return min(self.timestamp_window_ms, min(intervals) / 2)
+
+    @staticmethod
+    def _in_window(a: CapturedFrame, b: CapturedFrame, window: float | None) -> bool:
+        if window is None:
+            return True
+        return abs(a.host_timestamp - b.host_timestamp) <= window
+
+    def _drop(self, camera, count):
+        queue = self._pending[camera]
+        for _ in range(count):
+            frame = queue.popleft()
+            self.orphans += 1
+            logger.warning(f"dropped orphan frame of camera {camera}: nFrameNum[{frame.frame_num}] seq[{frame.seq}]")
+
+    def stats(self):
+        stats = {"matched": self.matched, "orphans": self.orphans}
+        for camera, queue in self._pending.items():
+            stats[f"pending_{camera}"] = len(queue)
+        return stats
+
+
+class StereoMatcher(FrameSetMatcher):
+    """
+        FrameSetMatcher for a left / right rig, producing StereoPair
+    """
+    def __init__(self, max_pending: int = 4, timestamp_window_ms: int | None = DEFAULT_TIMESTAMP_WINDOW_MS):
+        super().__init__(2, max_pending, timestamp_window_ms)
+
+    def make_set(self, frames) -> StereoPair:
+        return StereoPair(*frames)
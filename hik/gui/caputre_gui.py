@@ -1,4 +1,4 @@
-import cv2
+import time
 import numpy as np
 from PySide6.QtCore import QPoint, Signal, Slot, Qt
 from PySide6.QtGui import QImage, QPixmap
@@ -6,6 +6,8 @@ from PySide6.QtWidgets import QPushButton, QWidget, QGraphicsScene, QGraphicsPix
 
 from .hikcap_ui import Ui_HIKCapture
 from ..hik_sync_cam import HikSyncedCameras, FrameType
+from ..errors import CameraError
+from ..latency import recorder as latency
 
 class HIKCaptureMain(QWidget):
     def __init__(self):
@@ -19,15 +21,18 @@ class HIKCaptureMain(QWidget):
         self.ui.pushButton_swtich.setEnabled(False)
         self.ui.pushButton_save_bmp.setEnabled(False)
         self.ui.pushButton_stream_mode.setEnabled(False)
+        self.ui.pushButton_still_mode.setEnabled(False)
 
         self.camera_group = HikSyncedCameras()
 
         self.ui.pushButton_detect.clicked.connect(self.detect_cameras)
         self.ui.pushButton_connect.clicked.connect(self.connect_cameras)
-        self.ui.pushButton_capture.clicked.connect(self.camera_group.capture_dual_camera)
+        self.ui.pushButton_capture.clicked.connect(self.capture)
         self.ui.pushButton_save_jpg.clicked.connect(self.save_frames)
         self.ui.pushButton_setexpparams.clicked.connect(self.setexpgain)
-        self.camera_group.frame_signal.connect(self.update_frame)
+        self.ui.pushButton_stream_mode.clicked.connect(self.stream_mode)
+        self.ui.pushButton_still_mode.clicked.connect(self.still_mode)
+        self.camera_group.preview_signal.connect(self.update_frame)
 
         # floating_button = QPushButton("Floating", self.ui.graphicsView_left)
         # pos = self.ui.graphicsView_left.pos()
@@ -43,13 +48,22 @@ class HIKCaptureMain(QWidget):
         self.ui.graphicsView_right.scene().addItem(self.right_pixmap)
 
     def detect_cameras(self):
-        device_list = self.camera_group._enum_device_list()
+        try:
+            device_list = self.camera_group._enum_device_list(refresh=True)
+        except CameraError as e:
+            print(e)
+            return
         self.ui.comboBox_leftcam.clear()
         self.ui.comboBox_rightcam.clear()
         self.ui.comboBox_leftcam.addItems(device_list)
         self.ui.comboBox_rightcam.addItems(device_list)
 
-        left_cam_id, right_cam_id = self.camera_group._infer_LR_by_name()
+        try:
+            left_cam_id, right_cam_id = self.camera_group._infer_LR_by_name()
+        except CameraError as e:
+            # leave the choice to the user
+            print(e)
+            return
         self.ui.comboBox_leftcam.setCurrentIndex(left_cam_id)
         self.ui.comboBox_rightcam.setCurrentIndex(right_cam_id)
 
@@ -69,25 +83,58 @@ class HIKCaptureMain(QWidget):
             print("Please select different cameras!")
             return
         self.camera_group._set_cameras(left_cam, right_cam)
-        self.camera_group._init_cameras()
+        try:
+            self.camera_group._init_cameras()
+        except CameraError as e:
+            print(e)
+            return
+        self._update_preview_size()
         self.setexpgain()
 
         # UPDATE UIs
         self.ui.comboBox_leftcam.setEnabled(False)
         self.ui.comboBox_rightcam.setEnabled(False)
         self.ui.pushButton_connect.setEnabled(False)
+        self.ui.pushButton_stream_mode.setEnabled(True)
 
-    def update_frame(self, type: FrameType, frame: np.ndarray):
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = frame.shape
+    def stream_mode(self):
+        self.camera_group.start_streaming()
+        self.ui.pushButton_stream_mode.setEnabled(False)
+        self.ui.pushButton_still_mode.setEnabled(True)
+
+    def still_mode(self):
+        self.camera_group.stop_streaming()
+        self.ui.pushButton_stream_mode.setEnabled(True)
+        self.ui.pushButton_still_mode.setEnabled(False)
+
+    def capture(self):
+        # capturing leaves streaming mode for a full-resolution triggered pair
+        if self.camera_group.streaming:
+            self.still_mode()
+        self.camera_group.capture_dual_camera()
+
+    def update_frame(self, type: FrameType, preview: np.ndarray):
+        # preview is already downscaled to the viewport and RGB on the acquisition thread
+        t0 = time.perf_counter()
+        h, w, ch = preview.shape
         bytes_per_line = ch * w
-        q_image = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
+        q_image = QImage(preview.data, w, h, bytes_per_line, QImage.Format_RGB888)
         if type == FrameType.LEFT:
             self.left_pixmap.setPixmap(QPixmap.fromImage(q_image))
             self.ui.graphicsView_left.fitInView(self.left_pixmap, Qt.KeepAspectRatio)
         elif type == FrameType.RIGHT:
             self.right_pixmap.setPixmap(QPixmap.fromImage(q_image))
             self.ui.graphicsView_right.fitInView(self.right_pixmap, Qt.KeepAspectRatio)
+        latency.since("paint", t0)
+
+    def _update_preview_size(self):
+        viewport = self.ui.graphicsView_left.viewport().size()
+        if self.camera_group:
+            self.camera_group.set_preview_size(viewport.width(), viewport.height())
+
+    def resizeEvent(self, event):
+        self._update_preview_size()
+        return super().resizeEvent(event)
 
     def save_frames(self):
         self.camera_group.save_frames()
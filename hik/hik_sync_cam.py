@@ -1,17 +1,32 @@
 # hik_sync_cam.py
 
 import cv2
-import sys
+import json
 import time
+import threading
 import numpy as np
 from ctypes import *
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from dataclasses import dataclass
 from loguru import logger
-from PySide6.QtCore import Signal, QObject, QThread, QThreadPool, QRunnable
-
-from hik.utils import load_hik_sdk, buffer2numpy
-load_hik_sdk()
-from MvCameraControl_class import * 
+from PySide6.QtCore import (Signal, QObject, QThread, QThreadPool, QRunnable, QMutex, QMutexLocker, QWaitCondition,
+                            QCoreApplication)
+
+from hik.backend import get_backend
+from hik.errors import CameraError, CameraInitError
+from hik.feature_config import engine as feature_engine
+from hik.camera_params import CameraParameterManager
+from hik.device_registry import DeviceRegistry
+from hik.frame_pool import FrameBufferPool
+from hik.frame_average import FrameAverager
+from hik.frames import (FrameType, CapturedFrame, FrameSet, FrameSetMatcher, StereoPair, StereoMatcher, PoseRecord,
+                        CHANNEL_ORDER, DEFAULT_TIMESTAMP_WINDOW_MS)
+from hik.image_writer import ImageWriter
+from hik.raw_store import RawCaptureWriter, RAW_PIXEL_TYPES
+from hik.latency import recorder as latency
+from hik.sync_monitor import SyncMonitor
 
 
 HIK_SYNC = 1
@@ -22,216 +37,320 @@ SLAVE_CFG_PATH = Path(__file__).parent / "camera_config" / "slave.cfg"
 LEFT_CAM_TYPE = "SLAVE"
 RIGHT_CAM_TYPE = "MASTER"
 
+# 每个相机预分配的RGB帧缓冲数量：线程保留的最后一帧 + 正在转换的一帧 + 最近配对的一帧 + 等待配对的一帧
+POOL_BUFFERS_PER_CAM = 4
+
+# 后台保存图像的线程数，以及允许排队等待保存的图像数量
+WRITER_WORKERS = 2
+WRITER_MAX_PENDING = 4
+
+# 连续取流（预览）模式下主相机的默认帧率
+STREAM_FPS = 5.0
+
+# 预览图的默认最大尺寸 (宽, 高)，GUI 通过 set_preview_size 设置为视口大小
+PREVIEW_SIZE = (960, 720)
+
+# 单次取图的总超时，以及每次调用 MV_CC_GetImageBuffer 的等待时间片
+GRAB_TIMEOUT_MS = 10000
+GRAB_POLL_MS = 50
+
+# capture_set 等待一组图像的超时（不含曝光时间）
+SET_TIMEOUT_MS = 3000
+# 曝光包围的位姿记录，每行一个 json，保存在 save_pose 的目录下
+POSE_RECORDS_FILE = "poses.jsonl"
 
-from enum import Enum
-class FrameType(Enum):
-    LEFT = 0
-    RIGHT = 1
+# 曝光起始时间差超出容差（hik.sync_monitor.SYNC_TOLERANCE_MS）的图像组：False 只标记并告警，True 丢弃
+SYNC_REJECT = False
 
-class HikSyncedCameras(QObject):
+@dataclass
+class CameraSpec:
     """
-        This class is used to control HIK robotics cameras connection in QT way
+        One camera of a group: how to find it, which config to load and its role on the trigger line
+    """
+    name: str                   # matched case-insensitively against the enumerated device info
+    config: Path                # feature file loaded with MV_CC_FeatureLoad
+    master: bool = False        # receives the software trigger, its strobe triggers the slaves
+    prefix: str = None          # file name prefix used by save_frames, defaults to name
+
+    def __post_init__(self):
+        self.config = Path(self.config)
+        if self.prefix is None:
+            self.prefix = self.name
+
+
+class HikCameraGroup(QObject):
+    """
+        This class is used to control a group of HIK robotics cameras on one hardware trigger line in QT way.
+        One master camera receives the software trigger and drives the trigger line of all slave cameras,
+        every camera has its own config and acquisition thread, and one FrameSet is emitted per trigger.
+
+        Cameras are addressed by their index in specs. The camera API comes from a backend, see
+        hik.backend: the MVS SDK by default, or "sim" for simulated cameras without SDK or hardware.
     """
-    frame_signal = Signal(FrameType, np.ndarray)
-    def __init__(self):
+    # full-resolution frames; CapturedFrame.image is in FRAME_CHANNEL_ORDER,
+    # use as_bgr() / as_rgb() / as_gray() for other formats
+    FRAME_CHANNEL_ORDER = CHANNEL_ORDER
+    frame_signal = Signal(int, object)          # camera index, CapturedFrame
+    preview_signal = Signal(int, np.ndarray)    # camera index, downscaled RGB, for display only
+    frame_set_signal = Signal(object)           # FrameSet, one frame per camera of the same trigger
+    def __init__(self, specs: list[CameraSpec], backend=None):
         super().__init__()
-        self.left_cam = None
-        self.right_cam = None
-        self.left_frame = None
-        self.right_frame = None
-
-        self.left_cam_thread = None
-        self.right_cam_thread = None
-        self.master_cam = None
-        self.slave_cam = None
+        # loaded on the first camera operation, constructing a group does not import the SDK
+        self.backend = backend
+        masters = [i for i, spec in enumerate(specs) if spec.master]
+        if len(masters) != 1:
+            raise ValueError(f"a camera group needs exactly one master camera, got {len(masters)}")
+        self.specs = list(specs)
+        self.master_index = masters[0]
+
+        n = len(self.specs)
+        self.device_ids = [None] * n
+        self.cams = [None] * n
+        self.cam_threads = [None] * n
+        self.pools = [None] * n
+        self.frames = [None] * n
+        self.serials = [None] * n
+        self.matcher = self._make_matcher()
+        self.last_set = None
+        # exposure-start skew of every matched set, from the device timestamps
+        self.sync = SyncMonitor(n)
+        self.reject_out_of_sync = SYNC_REJECT
+        self._last_matched = None
+        # number of frame sets matched so far, capture_set waits on it
+        self._set_count = 0
+        self._set_cond = threading.Condition()
+        # while > 0 matched sets are consumed by a bracket / averaging capture instead of being emitted
+        self._consumers = 0
+        # started with the cameras, stopped in _deinit_cameras
+        self.writer = None
+        self.raw_writer = None
+        self.streaming = False
+        self.preview_size = PREVIEW_SIZE
+        self.init_timings = {}
+        # parsed config files and last known feature values per camera serial, kept across reconnects
+        self.feature_engine = feature_engine
+        self.registry = DeviceRegistry(backend)
+        # exposure / gain, debounced and cached
+        self.params = CameraParameterManager(self)
+        self.device_list = None
         self.devList = []
 
-    def _enum_device_list(self) -> list[str]:
+    def __len__(self):
+        return len(self.specs)
+
+    @property
+    def sdk(self):
+        return get_backend(self.backend)
+
+    def _make_matcher(self) -> FrameSetMatcher:
+        return FrameSetMatcher(len(self.specs))
+
+    @property
+    def master_cam(self):
+        return self.cams[self.master_index]
+
+    @property
+    def slave_cams(self):
+        return [cam for i, cam in enumerate(self.cams) if i != self.master_index]
+
+    def _enum_device_list(self, refresh: bool = False) -> list[str]:
         """
-            This function enumerate all connect HIK robotics cameras
-        
+            This function enumerate all connect HIK robotics cameras, reusing the registry's
+            cached enumeration unless it expired or refresh is set
+
         Returns:
         --------------------
             return a list of device info
         """
-        logger.info("enumerating devices")
-
-        self.device_list = MV_CC_DEVICE_INFO_LIST()
-        self.tlayer_type = MV_GIGE_DEVICE | MV_USB_DEVICE
-        ret = MvCamera.MV_CC_EnumDevices(self.tlayer_type, self.device_list)
-        if ret != 0:
-            print("enum devices fail! ret[0x%x]" % ret)
-            sys.exit()
-        if self.device_list.nDeviceNum == 0:
-            logger.error("find no device!")
-
-        self.devList = []
-        for i in range(0, self.device_list.nDeviceNum):
-            mvcc_dev_info = cast(self.device_list.pDeviceInfo[i], POINTER(MV_CC_DEVICE_INFO)).contents
-            if mvcc_dev_info.nTLayerType == MV_GIGE_DEVICE:
-                print("\ngige device: [%d]" % i)
-                chUserDefinedName = ""
-                for per in mvcc_dev_info.SpecialInfo.stGigEInfo.chUserDefinedName:
-                    if 0 == per:
-                        break
-                    chUserDefinedName = chUserDefinedName + chr(per)
-                print("device user define name: %s" % chUserDefinedName)
-
-                chModelName = ""
-                for per in mvcc_dev_info.SpecialInfo.stGigEInfo.chModelName:
-                    if 0 == per:
-                        break
-                    chModelName = chModelName + chr(per)
-
-                print("device model name: %s" % chModelName)
-
-                nip1 = ((mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp & 0xff000000) >> 24)
-                nip2 = ((mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp & 0x00ff0000) >> 16)
-                nip3 = ((mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp & 0x0000ff00) >> 8)
-                nip4 = (mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp & 0x000000ff)
-                print("current ip: %d.%d.%d.%d\n" % (nip1, nip2, nip3, nip4))
-                self.devList.append(
-                    "[" + str(i) + "]GigE: " + chUserDefinedName + " " + chModelName + "(" + str(nip1) + "." + str(
-                        nip2) + "." + str(nip3) + "." + str(nip4) + ")")
-            elif mvcc_dev_info.nTLayerType == MV_USB_DEVICE:
-                print("\nu3v device: [%d]" % i)
-                chUserDefinedName = ""
-                for per in mvcc_dev_info.SpecialInfo.stUsb3VInfo.chUserDefinedName:
-                    if per == 0:
-                        break
-                    chUserDefinedName = chUserDefinedName + chr(per)
-                print("device user define name: %s" % chUserDefinedName)
-
-                chModelName = ""
-                for per in mvcc_dev_info.SpecialInfo.stUsb3VInfo.chModelName:
-                    if 0 == per:
-                        break
-                    chModelName = chModelName + chr(per)
-                print("device model name: %s" % chModelName)
-
-                strSerialNumber = ""
-                for per in mvcc_dev_info.SpecialInfo.stUsb3VInfo.chSerialNumber:
-                    if per == 0:
-                        break
-                    strSerialNumber = strSerialNumber + chr(per)
-                print("user serial number: %s" % strSerialNumber)
-                self.devList.append("[" + str(i) + "]USB: " + chUserDefinedName + " " + chModelName
-                               + "(" + str(strSerialNumber) + ")")
-
+        devices = self.registry.devices(refresh)
+        self.device_list = self.registry.device_list
+        self.devList = [device.label for device in devices]
         return self.devList
     
-    def _set_cameras(self, left_cam_id, right_cam_id):
+    def _set_cameras(self, *device_ids):
         """
-            This function set the left and right camera index
+            This function set the device index of every camera
 
         Args:
         --------------------
-            left_cam_id: int, selected left camera index in enum_device_list
-            right_cam_id: int, selected right camera index in enum_device_list
+            device_ids: int, selected camera index in enum_device_list, one per spec in order
         """
-        self.left_cam_id = left_cam_id
-        self.right_cam_id = right_cam_id
+        if len(device_ids) != len(self.specs):
+            raise ValueError(f"expected {len(self.specs)} device indices, got {len(device_ids)}")
+        self.device_ids = list(device_ids)
 
-    def _infer_LR_by_name(self):
+    def _infer_ids_by_name(self):
         """
-            This function infer the left and right camera index by camera name
+            This function infer the device index of every camera from its spec name, which must equal the
+            serial number, IP or user defined name (case-insensitive) of one enumerated device, or else
+            be part of the user defined name of exactly one device, see DeviceRegistry.resolve
         """
+        device_ids = [None] * len(self.specs)
+        for k, spec in enumerate(self.specs):
+            device = self.registry.resolve(spec.name)
+            if device is not None and device.index not in device_ids:
+                device_ids[k] = device.index
+        missing = [spec.name for spec, device_id in zip(self.specs, device_ids) if device_id is None]
+        if missing:
+            raise CameraError("infer camera index", detail=f"no device matches {missing}, devices: "
+                                                           f"{[d.label for d in self.registry.devices()]}")
+        self._set_cameras(*device_ids)
+        logger.debug(f"inferred camera index: {dict(zip((spec.name for spec in self.specs), device_ids))}")
+
+        return self.device_ids
 
-        for i, dev_info in enumerate(self.devList):
-            if "left" in dev_info.lower():
-                self.left_cam_id = i
-            elif "right" in dev_info.lower():
-                self.right_cam_id = i
-        if self.left_cam_id is None or self.right_cam_id is None:
-            logger.error("Failed to infer left and right camera index")
-            sys.exit()
-        self._set_cameras(self.left_cam_id, self.right_cam_id)
-        logger.debug(f"inferred left and right camera index: {self.left_cam_id}, {self.right_cam_id}")
-
-        return self.left_cam_id, self.right_cam_id
-
-    def _determine_master_slave(self):
+    def _init_cameras(self):
         """
-            This function determine the master and slave cameras
+            This function open, configure and start every camera, then start the acquisition threads.
+            Every camera has its own handle, so the per-camera steps run concurrently and the bring-up
+            takes as long as the slowest camera instead of the sum of all of them.
 
-        Returns:
+        Raises:
         --------------------
-            master_cam: MvCamera, master camera
-            slave_cam: MvCamera, slave camera
+            CameraInitError: one or more cameras failed, the ones already opened are closed again
         """
-        if LEFT_CAM_TYPE == "MASTER":
-            self.master_cam = self.left_cam
-            self.slave_cam = self.right_cam
-            logger.debug("left cam is master, right cam is slave")
-        else:
-            self.master_cam = self.right_cam
-            self.slave_cam = self.left_cam
-            logger.debug("right cam is master, left cam is slave")
-        
-        return self.master_cam, self.slave_cam
-
-    def _init_cameras(self):
-        logger.info("initializing cameras...")
-        self.left_cam = self._connect_camera(self.device_list, self.left_cam_id)
-        self.right_cam = self._connect_camera(self.device_list, self.right_cam_id)
-
-        self.master_cam, self.slave_cam = self._determine_master_slave()
-        
-        self._set_master_camera_params(self.master_cam)
-        self._set_slave_camera_params(self.slave_cam)
-        
-        self._start_grab_camera(self.left_cam)
-        self._start_grab_camera(self.right_cam)
+        n = len(self.specs)
+        logger.info(f"initializing {n} cameras...")
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n, thread_name_prefix="CamInit") as executor:
+            futures = [executor.submit(self._bring_up_camera, i) for i in range(n)]
+
+        errors = []
+        self.init_timings = {}
+        for spec, future in zip(self.specs, futures):
+            try:
+                self.init_timings[spec.name] = future.result()
+            except CameraError as e:
+                errors.append(e)
+            except Exception as e:
+                errors.append(CameraError("initialize", camera=spec.name.upper(), detail=repr(e)))
+        if errors:
+            for e in errors:
+                logger.error(str(e))
+            self._release_cameras()
+            # the topology may have changed, enumerate again on the next attempt
+            self.registry.invalidate()
+            raise CameraInitError(errors)
+
+        wall_ms = (time.perf_counter() - t0) * 1e3
+        for name, timings in self.init_timings.items():
+            logger.info(f"{name.upper()} cam bring-up: " + ", ".join(f"{step} {ms:.0f} ms" for step, ms in timings.items()))
+        sequential_ms = sum(timings["total"] for timings in self.init_timings.values())
+        logger.info(f"cameras up in {wall_ms:.0f} ms, {sequential_ms:.0f} ms if brought up one by one")
+        logger.debug(f"master cam: {self.specs[self.master_index].name}")
+
+        self.matcher.reset()
+        self.sync.reset()
+        self.last_set = None
+        self.frames = [None] * n
+        self.params.reset()
+        if self.writer is None or self.writer.closed:
+            self.writer = ImageWriter(workers=WRITER_WORKERS, max_pending=WRITER_MAX_PENDING)
 
         # Start thread for each camera
-        self.left_cam_thread = CamRunThread(self.left_cam, FrameType.LEFT)
-        self.right_cam_thread = CamRunThread(self.right_cam, FrameType.RIGHT)
-
-        self.left_cam_thread.signals.captured_frame.connect(self._fetch_captured_images)
-        self.right_cam_thread.signals.captured_frame.connect(self._fetch_captured_images)
-        self.left_cam_thread.setAutoDelete(False)
-        self.right_cam_thread.setAutoDelete(False)
-        QThreadPool.globalInstance().start(self.left_cam_thread)
-        QThreadPool.globalInstance().start(self.right_cam_thread)
+        for i, spec in enumerate(self.specs):
+            thread = CamRunThread(self.cams[i], i, self.pools[i], spec.name.upper(), self.sdk)
+            thread.signals.captured_frame.connect(self._fetch_captured_images)
+            thread.signals.frame_ready.connect(self._fetch_streamed_image)
+            thread.setAutoDelete(False)
+            self.cam_threads[i] = thread
+        self.streaming = False
+        self.set_preview_size(*self.preview_size)
+        # one acquisition thread per camera must fit in the pool, or later cameras would never grab
+        pool = QThreadPool.globalInstance()
+        if pool.maxThreadCount() < len(self.cam_threads) + 1:
+            pool.setMaxThreadCount(len(self.cam_threads) + 1)
+        for thread in self.cam_threads:
+            pool.start(thread)
         logger.info("initializing cameras done")
 
+    def _bring_up_camera(self, index: int) -> dict:
+        """
+            This function open, configure and start grabbing one camera and allocate its frame buffers,
+            run on the bring-up thread pool
+
+        Returns:
+        --------------------
+            dict: {step: ms}, duration of every step and the total
+        """
+        spec = self.specs[index]
+        timings = {}
+        t_start = t = time.perf_counter()
+
+        def lap(step):
+            nonlocal t
+            now = time.perf_counter()
+            timings[step] = (now - t) * 1e3
+            t = now
+
+        step = "open"
+        try:
+            self.cams[index] = self._connect_camera(self.device_list, self.device_ids[index])
+            lap(step)
+            step = "configure"
+            self.serials[index] = self._get_serial_number(self.cams[index])
+            self._set_camera_params(self.cams[index], spec.config, self.serials[index])
+            tick_rate = self._get_tick_rate(self.cams[index])
+            if tick_rate is not None:
+                self.sync.set_tick_rate(index, tick_rate)
+            lap(step)
+            step = "start grabbing"
+            self._start_grab_camera(self.cams[index])
+            lap(step)
+            # Allocate frame buffers once, now that the stream geometry is fixed
+            step = "allocate buffers"
+            self.pools[index] = self._create_frame_pool(self.cams[index], spec.name.upper())
+            lap(step)
+        except CameraError as e:
+            e.camera = spec.name.upper()
+            raise
+        timings["total"] = (time.perf_counter() - t_start) * 1e3
+        return timings
+
     def _connect_camera(self, device_list, n_connection_num):
-        if int(n_connection_num) >= device_list.nDeviceNum:
-            print("intput error!")
-            sys.exit()
+        if n_connection_num is None or int(n_connection_num) >= device_list.nDeviceNum:
+            raise CameraError("open device", detail=f"invalid device index {n_connection_num}")
 
-        cam = MvCamera()
+        cam = self.sdk.MvCamera()
         # ch:选择设备并创建句柄 | en:Select device and create handle
-        stDeviceList = cast(device_list.pDeviceInfo[int(n_connection_num)], POINTER(MV_CC_DEVICE_INFO)).contents
+        stDeviceList = cast(device_list.pDeviceInfo[int(n_connection_num)], POINTER(self.sdk.MV_CC_DEVICE_INFO)).contents
         ret = cam.MV_CC_CreateHandle(stDeviceList)
         if ret != 0:
-            print("create handle fail! ret[0x%x]" % ret)
-            sys.exit()
-        ret = cam.MV_CC_OpenDevice(MV_ACCESS_Exclusive, 0)
+            raise CameraError("create handle", ret)
+        ret = cam.MV_CC_OpenDevice(self.sdk.MV_ACCESS_Exclusive, 0)
         if ret != 0:
-            print("open device fail! ret[0x%x]" % ret)
-            sys.exit()
+            cam.MV_CC_DestroyHandle()
+            raise CameraError("open device", ret)
 
         return cam
     
-    def _set_master_camera_params(self, cam: MvCamera):
-        # load config
-        ret = cam.MV_CC_FeatureLoad(str(MASTER_CFG_PATH))
+    def _set_camera_params(self, cam: "MvCamera", cfg_path: Path, serial: str = None):
+        # apply config, writing only the features the camera does not already hold
+        serial = serial or self._get_serial_number(cam)
+        report = self.feature_engine.apply(cam, cfg_path, serial, sdk=self.sdk)
+        logger.info(f"{serial} config {report}")
+        if report.full_load and report.failed:
+            raise CameraError("load config", detail=str(cfg_path))
+        return report
+
+    def _get_tick_rate(self, cam: "MvCamera") -> int | None:
+        # device timestamp ticks per second, GigE cameras report it, others use the SyncMonitor default
+        stTickRate = self.sdk.MVCC_INTVALUE()
+        ret = cam.MV_CC_GetIntValue("GevTimestampTickFrequency", stTickRate)
+        if ret != 0 or stTickRate.nCurValue <= 0:
+            return None
+        return stTickRate.nCurValue
+
+    def _get_serial_number(self, cam: "MvCamera") -> str:
+        stSerialNumber = self.sdk.MVCC_STRINGVALUE()
+        ret = cam.MV_CC_GetStringValue("DeviceSerialNumber", stSerialNumber)
         if ret != 0:
-            print("load config fail! ret[0x%x]" % ret)
-            sys.exit()
-
-    def _set_slave_camera_params(self, cam: MvCamera):
-        # ret = cam.MV_CC_FeatureSave("slave.cfg")
-
-        ret = cam.MV_CC_FeatureLoad(str(SLAVE_CFG_PATH))
-        if ret != 0:
-            print("load config fail! ret[0x%x]" % ret)
-            sys.exit()
+            return f"handle_{id(cam):x}"
+        return stSerialNumber.chCurValue.decode("ascii", errors="replace")
 
     def _get_device_info(self, device_list, i):
-        mvcc_dev_info = cast(device_list.pDeviceInfo[i], POINTER(MV_CC_DEVICE_INFO)).contents
-        if mvcc_dev_info.nTLayerType == MV_GIGE_DEVICE:
+        mvcc_dev_info = cast(device_list.pDeviceInfo[i], POINTER(self.sdk.MV_CC_DEVICE_INFO)).contents
+        if mvcc_dev_info.nTLayerType == self.sdk.MV_GIGE_DEVICE:
             print("\ngige device: [%d]" % i)
             str_mode_name = ""
             for per in mvcc_dev_info.SpecialInfo.stGigEInfo.chModelName:
@@ -244,7 +363,7 @@ class HikSyncedCameras(QObject):
             nip3 = ((mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp & 0x0000ff00) >> 8)
             nip4 = (mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp & 0x000000ff)
             print("current ip: %d.%d.%d.%d\n" % (nip1, nip2, nip3, nip4))
-        elif mvcc_dev_info.nTLayerType == MV_USB_DEVICE:
+        elif mvcc_dev_info.nTLayerType == self.sdk.MV_USB_DEVICE:
             print("\nusb device: [%d]" % i)
             str_mode_name = ""
             for per in mvcc_dev_info.SpecialInfo.stUsb3VInfo.chModelName:
@@ -255,236 +374,850 @@ class HikSyncedCameras(QObject):
         else:
             print("\nUnkown device: [%d]" % i)
 
-    def _start_grab_camera(self, cam: MvCamera):
+    def _start_grab_camera(self, cam: "MvCamera"):
         # ch:开始取流 | en:Start grab image
         ret = cam.MV_CC_StartGrabbing()
         if ret != 0:
-            print("start grabbing fail! ret[0x%x]" % ret)
-            sys.exit()
+            raise CameraError("start grabbing", ret)
 
-    def _stop_grab_camera(self, cam: MvCamera):
+    def _create_frame_pool(self, cam: "MvCamera", name: str) -> FrameBufferPool:
+        """
+            This function create a frame buffer pool sized for the camera's current RGB output
+        """
+        pool = FrameBufferPool(name)
+        frame_size = self._get_frame_size(cam)
+        if frame_size is None:
+            logger.warning(f"{name} cam: failed to read frame size, buffers will be allocated on demand")
+            return pool
+
+        width, height = frame_size
+        pool.preallocate(width, height, self.sdk.PixelType_Gvsp_RGB8_Packed, width * height * 3, POOL_BUFFERS_PER_CAM)
+        return pool
+
+    def _get_frame_size(self, cam: "MvCamera"):
+        """
+            This function read the current Width / Height of a camera, None on failure
+        """
+        stWidth = self.sdk.MVCC_INTVALUE()
+        stHeight = self.sdk.MVCC_INTVALUE()
+        ret0 = cam.MV_CC_GetIntValue("Width", stWidth)
+        ret1 = cam.MV_CC_GetIntValue("Height", stHeight)
+        if ret0 or ret1:
+            return None
+        return stWidth.nCurValue, stHeight.nCurValue
+
+    def _get_pixel_format(self, cam: "MvCamera"):
+        stPixelFormat = self.sdk.MVCC_ENUMVALUE()
+        ret = cam.MV_CC_GetEnumValue("PixelFormat", stPixelFormat)
+        if ret != 0:
+            return None
+        return stPixelFormat.nCurValue
+
+    def pool_stats(self):
+        """
+            This function return the frame buffer pool counters of every camera
+
+        Returns:
+        --------------------
+            dict: {camera index: {"hits", "misses", "in_use", "high_water"}}
+        """
+        return {i: pool.stats() for i, pool in enumerate(self.pools) if pool}
+
+    def _stop_grab_camera(self, cam: "MvCamera"):
         # ch:停止取流 | en:Stop grab image
         if cam is None:
             return
         ret = cam.MV_CC_StopGrabbing()
         if ret != 0:
-            print("stop grabbing fail! ret[0x%x]" % ret)
-            sys.exit()
+            raise CameraError("stop grabbing", ret)
 
-    def _disconnect_camera(self, cam: MvCamera):
+    def _disconnect_camera(self, cam: "MvCamera"):
         # ch:关闭设备 | Close device
         if cam is None:
             return
         ret = cam.MV_CC_CloseDevice()
         if ret != 0:
-            print("close deivce fail! ret[0x%x]" % ret)
-            sys.exit()
+            raise CameraError("close device", ret)
 
         # ch:销毁句柄 | Destroy handle
         ret = cam.MV_CC_DestroyHandle()
         if ret != 0:
-            print("destroy handle fail! ret[0x%x]" % ret)
-            sys.exit()
-
-    def _fetch_captured_images(self, frameType: FrameType, frame: np.ndarray):
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        if frameType == FrameType.LEFT:
-            self.left_frame = frame
-            self.frame_signal.emit(FrameType.LEFT, frame)
-        elif frameType == FrameType.RIGHT:
-            self.right_frame = frame
-            self.frame_signal.emit(FrameType.RIGHT, frame)
+            raise CameraError("destroy handle", ret)
+
+    def _release_cameras(self):
+        """
+            This function stop grabbing and close every opened camera, logging failures instead of raising
+            so one broken camera does not keep the others open
+        """
+        for i, cam in enumerate(self.cams):
+            if cam is None:
+                continue
+            name = self.specs[i].name.upper()
+            for release in (self._stop_grab_camera, self._disconnect_camera):
+                try:
+                    release(cam)
+                except CameraError as e:
+                    e.camera = name
+                    logger.error(str(e))
+        self.cams = [None] * len(self.specs)
+
+    def set_preview_size(self, width: int, height: int):
+        """
+            This function set the viewport size the preview images are downscaled to fit in
+        """
+        self.preview_size = (max(int(width), 1), max(int(height), 1))
+        for thread in self.cam_threads:
+            if thread:
+                thread.preview_size = self.preview_size
+
+    def _fetch_captured_images(self, captured: CapturedFrame):
+        camera = captured.camera
+        if captured.preview is not None:
+            self.preview_signal.emit(camera, captured.preview)
+        self.frames[camera] = captured
+        if "emit" in captured.stamps:
+            latency.since("signal", captured.stamps["emit"])
+        self.frame_signal.emit(camera, captured)
+
+        frame_set = self.matcher.push(captured)
+        if frame_set is not None:
+            in_sync = self.sync.measure(frame_set)
+            logger.debug(f"frame set seq[{frame_set.seq}] nFrameNum{frame_set.frame_nums} "
+                         f"host spread {frame_set.host_spread_ms} ms, exposure skew {frame_set.sync_skew_ms:.3f} ms")
+            if not in_sync and self.reject_out_of_sync and self.sync.calibrated:
+                logger.warning(f"frame set seq[{frame_set.seq}] rejected, cameras out of sync")
+                frame_set = None
+            else:
+                self.last_set = frame_set
+            # decided before waking the consumer, which may stop consuming right after
+            emit = frame_set is not None and not self._consumers
+            with self._set_cond:
+                self._last_matched = frame_set
+                self._set_count += 1
+                self._set_cond.notify_all()
+            if emit:
+                self._on_frame_set(frame_set)
+
+    def _on_frame_set(self, frame_set: FrameSet):
+        self.frame_set_signal.emit(frame_set)
+
+    def _fetch_streamed_image(self, camera: int):
+        captured = self.cam_threads[camera].take_latest()
+        if captured is not None:
+            self._fetch_captured_images(captured)
 
     def _deinit_cameras(self):
-        if self.left_cam_thread:
-            self.left_cam_thread.stop()
-        if self.right_cam_thread:
-            self.right_cam_thread.stop()
-
-        self._stop_grab_camera(self.left_cam)
-        self._stop_grab_camera(self.right_cam)
-        
-        self._disconnect_camera(self.left_cam)
-        self._disconnect_camera(self.right_cam)
-        
-        self.left_cam = None
-        self.right_cam = None
-        
+        self.streaming = False
+        # finish writing queued images first
+        if self.writer is not None:
+            self.writer.close()
+            logger.debug(f"image writer stats: {self.writer.stats()}")
+        self.stop_raw_session()
+        # no parameter write may reach the handles released below
+        self.params.close()
+
+        for thread in self.cam_threads:
+            if thread:
+                thread.stop()
+
+        self._release_cameras()
+
+        logger.debug(f"frame pool stats: {self.pool_stats()}")
+        logger.debug(f"frame set matcher stats: {self.matcher.stats()}")
+        logger.info(f"sync stats: {self.sync.stats()}")
         logger.info("Cameras deinitialized.")
 
 
     def initialize_camera_group(self):
         self._enum_device_list()
-        self._infer_LR_by_name()
+        self._infer_ids_by_name()
         self._init_cameras()
 
     def set_exp_gain(self, exp, gain):
-        ret0 = self.left_cam.MV_CC_SetFloatValue("ExposureTime", float(exp))
-        ret1 = self.left_cam.MV_CC_SetFloatValue("Gain", float(gain))
-        ret2 = self.right_cam.MV_CC_SetFloatValue("ExposureTime", float(exp))
-        ret3 = self.right_cam.MV_CC_SetFloatValue("Gain", float(gain))
-
-        if ret0 or ret1 or ret2 or ret3:
-            logger.error("set exp / gain failed")
-        else:
-            logger.success("set exp / gain successful")
+        """exp in unit us, gain in dB; written to all cameras in parallel, see CameraParameterManager"""
+        return self.params.apply({"ExposureTime": exp, "Gain": gain})
 
     def set_exp(self, value):
         """value in unit us, which is 1E-6 s"""
-        logger.debug("setting exp time"+str(value))
-        ret0 = self.left_cam.MV_CC_SetFloatValue("ExposureTime", float(value))
-        ret2 = self.right_cam.MV_CC_SetFloatValue("ExposureTime", float(value))
-        if ret0 or ret2:
-            logger.info("set exp  failed")
-        else:
-            logger.info("set exp successful")
+        return self.params.apply({"ExposureTime": value})
 
     def set_gain(self, value):
-        """value in unit us, which is 1E-6 s"""
-        logger.debug("setting gain"+str(value))
-        ret1 = self.left_cam.MV_CC_SetFloatValue("Gain", float(value))
-        ret3 = self.right_cam.MV_CC_SetFloatValue("Gain", float(value))
-        if ret1 or ret3:
-            logger.info("set gain failed")
-        else:
-            logger.info("set gain successful")
+        """value in unit dB"""
+        return self.params.apply({"Gain": value})
 
-    def capture_dual_camera(self):
+    def start_streaming(self, fps: float = STREAM_FPS):
         """
-            This function capture images from both cameras, either synced or not
+            This function switch all cameras to continuous grabbing for live preview.
+            The master free-runs at fps; with HIK_SYNC the slaves keep following the master's strobe line,
+            so streamed frames are still grouped. Only the latest frame is delivered, older ones are dropped.
+
+        Args:
+        --------------------
+            fps: float, target frame rate of the master camera
+        """
+        if self.streaming:
+            return
+        logger.info(f"switching to streaming mode at {fps} fps")
+        # trigger features change outside the config engine, take a new snapshot on the next apply
+        for serial in self.serials:
+            self.feature_engine.forget(serial)
+        free_running = [self.master_cam] if HIK_SYNC else self.cams
+        for cam in free_running:
+            ret0 = cam.MV_CC_SetBoolValue("AcquisitionFrameRateEnable", True)
+            ret1 = cam.MV_CC_SetFloatValue("AcquisitionFrameRate", float(fps))
+            ret2 = cam.MV_CC_SetEnumValue("TriggerMode", self.sdk.MV_TRIGGER_MODE_OFF)
+            if ret0 or ret1 or ret2:
+                logger.error("set free run mode failed")
+        for cam in self.cams:
+            cam.MV_CC_SetGrabStrategy(self.sdk.MV_GrabStrategy_LatestImagesOnly)
+
+        # frames of one set arrive one frame period apart at most
+        self.matcher.reset()
+        self.matcher.timestamp_window_ms = int(500 / fps)
+        for thread in self.cam_threads:
+            thread.set_streaming(True)
+        self.streaming = True
+
+    def stop_streaming(self):
+        """
+            This function switch back to software triggered full-resolution captures,
+            without stopping the grab or reconnecting the cameras
         """
-        self.left_frame = None
-        self.right_frame = None
+        if not self.streaming:
+            return
+        # threads go back to waiting for requests before the triggers are re-armed and the stale
+        # streamed frames are discarded; a frame grabbed before the switch is dropped by its thread
+        for thread in self.cam_threads:
+            if not thread.set_streaming(False):
+                logger.warning(f"{thread.name} cam thread still busy after leaving streaming mode")
+        triggered = [self.master_cam] if HIK_SYNC else self.cams
+        for cam in triggered:
+            ret0 = cam.MV_CC_SetEnumValue("TriggerMode", self.sdk.MV_TRIGGER_MODE_ON)
+            ret1 = cam.MV_CC_SetEnumValue("TriggerSource", self.sdk.MV_TRIGGER_SOURCE_SOFTWARE)
+            ret2 = cam.MV_CC_SetBoolValue("AcquisitionFrameRateEnable", False)
+            if ret0 or ret1 or ret2:
+                logger.error("set trigger mode failed")
+
+        for cam in self.cams:
+            cam.MV_CC_SetGrabStrategy(self.sdk.MV_GrabStrategy_OneByOne)
+            cam.MV_CC_ClearImageBuffer()
+
+        self.matcher.reset()
+        self.matcher.timestamp_window_ms = DEFAULT_TIMESTAMP_WINDOW_MS
+        self.streaming = False
+        logger.info(f"switched to triggered mode, dropped {[thread.dropped for thread in self.cam_threads]} "
+                    f"streamed frames")
+
+    def capture(self):
+        """
+            This function capture one image from every camera, either synced or not.
+            In streaming mode the cameras are switched back to triggered mode first.
+        """
+        if self.streaming:
+            self.stop_streaming()
 
-        # trigger master camera or both
+        self.frames = [None] * len(self.specs)
+
+        # trigger master camera or all of them
+        t_trigger = time.perf_counter()
         self.master_cam.MV_CC_SetCommandValue("TriggerSoftware")
         if not HIK_SYNC:
-            self.slave_cam.MV_CC_SetCommandValue("TriggerSoftware")
+            for cam in self.slave_cams:
+                cam.MV_CC_SetCommandValue("TriggerSoftware")
+        latency.since("trigger", t_trigger)
 
         logger.info("sent trigger command")
-        self.left_cam_thread.start_capture()
-        self.right_cam_thread.start_capture()
+        for thread in self.cam_threads:
+            thread.start_capture(t_trigger)
+
+    @contextmanager
+    def _consuming_sets(self):
+        self._consumers += 1
+        try:
+            yield
+        finally:
+            self._consumers -= 1
+
+    def capture_set(self, timeout_ms: float = SET_TIMEOUT_MS) -> FrameSet | None:
+        """
+            This function trigger one capture and wait for its frame set, for scan threads.
+            Called on the thread the group lives in, events are processed while waiting.
 
-    def save_frames(self, saving_path: str | Path = ROOT_DIR):
+        Args:
+        --------------------
+            timeout_ms: float, wait on top of the exposure time
+
+        Returns:
+        --------------------
+            FrameSet, or None if no set was matched in time or it was rejected as out of sync
         """
-            This function save images from both cameras, using timestamp as filename and save to ROOT_DIR
+        with self._set_cond:
+            target = self._set_count + 1
+        self.capture()
+
+        exposure_ms = max((e for e in self.params.get("ExposureTime") if e is not None), default=0) / 1000
+        owner = QThread.currentThread() == self.thread()
+        deadline = time.perf_counter() + (timeout_ms + exposure_ms) / 1000
+        while True:
+            if owner:
+                # the frame sets are matched by slots of this thread
+                QCoreApplication.processEvents()
+            with self._set_cond:
+                if self._set_count >= target:
+                    return self._last_matched
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    logger.warning(f"no frame set within {timeout_ms:.0f} ms")
+                    return None
+                self._set_cond.wait(min(remaining, 0.005) if owner else remaining)
+
+    def capture_averaged(self, n: int, timeout_ms: float = SET_TIMEOUT_MS, emit: bool = True) -> FrameSet | None:
+        """
+            This function capture n frame sets of the static scene and average them per camera, see
+            FrameAverager. Only the averaged set is emitted, as the result of the capture; its frames
+            report the number of frames and the noise reduction in CapturedFrame.meta.
+
+        Args:
+        --------------------
+            n: int, frames per camera
+            timeout_ms: float, wait for each set on top of the exposure time
+            emit: bool, emit the averaged set through frame_set_signal
+
+        Returns:
+        --------------------
+            FrameSet of averaged frames, or None if a capture timed out
+        """
+        averagers = [FrameAverager() for _ in self.specs]
+        in_sync = True
+        with self._consuming_sets():
+            for _ in range(n):
+                frame_set = self.capture_set(timeout_ms)
+                if frame_set is None:
+                    return None
+                in_sync = in_sync and frame_set.in_sync is not False
+                for averager, frame in zip(averagers, frame_set.frames):
+                    averager.add(frame)
+        averaged = self.matcher.make_set([averager.result() for averager in averagers])
+        averaged.in_sync = in_sync
+        logger.info(f"averaged {n} frames, noise " + ", ".join(
+            f"{f.meta['noise_sigma']:.2f} -> {f.meta['noise_sigma_mean']:.2f} DN" for f in averaged.frames))
+        if emit:
+            self.last_set = averaged
+            self._on_frame_set(averaged)
+        return averaged
+
+    def capture_bracket(self, exposures: list, position: dict = None, reverse: bool = False,
+                        average: int = 1, timeout_ms: float = SET_TIMEOUT_MS) -> PoseRecord:
+        """
+            This function capture one frame set per exposure at the current pose: set ExposureTime on all
+            cameras, trigger, wait for the set, then the next exposure. Exposure is only written when
+            it changes, so alternating reverse between poses saves one write per pose.
+            The sets are returned in the record, not emitted.
+
+        Args:
+        --------------------
+            exposures: list of float, ExposureTime per set, us
+            position: dict, pose info stored with the record
+            reverse: bool, capture the exposures in reverse order, the record keeps the given order
+            average: int, frames averaged per exposure, see capture_averaged
+            timeout_ms: float, wait for each set on top of its exposure time
+
+        Returns:
+        --------------------
+            PoseRecord, with None for the sets that failed
+        """
+        sets = [None] * len(exposures)
+        order = range(len(exposures) - 1, -1, -1) if reverse else range(len(exposures))
+        with self._consuming_sets():
+            for i in order:
+                applied = self.params.apply({"ExposureTime": exposures[i]})
+                if None in applied["ExposureTime"]:
+                    logger.error(f"bracket: skipped exposure {exposures[i]:g} us")
+                    continue
+                if average > 1:
+                    sets[i] = self.capture_averaged(average, timeout_ms, emit=False)
+                else:
+                    sets[i] = self.capture_set(timeout_ms)
+        record = PoseRecord(list(exposures), sets, position)
+        if not record.complete:
+            logger.warning(f"bracket incomplete: {sum(s is None for s in sets)} of {len(sets)} sets missing")
+        return record
+
+    def start_raw_session(self, saving_path: str | Path = ROOT_DIR, max_sets: int = 200):
+        """
+            This function start recording every captured frame undemosaiced into one raw session file.
+            While a session is active, save_frames does not write jpg files.
+
+        Args:
+        --------------------
+            saving_path: str or Path, folder of the session file
+            max_sets: int, number of frame sets preallocated in the file
+
+        Returns:
+        --------------------
+            path: Path, session file, read it back with hik.raw_store.RawCaptureReader
+
+        Raises:
+        --------------------
+            CameraError: a camera's PixelFormat is not 8-bit Bayer or Mono8, or differs from the master's
+        """
+        self.stop_raw_session()
+        frame_size = self._get_frame_size(self.master_cam)
+        pixel_types = [self._get_pixel_format(cam) for cam in self.cams]
+        pixel_type = pixel_types[self.master_index]
+        if frame_size is None or None in pixel_types:
+            logger.error("failed to read frame format, raw session not started")
+            return None
+        # the session stores one byte per pixel, wider or packed formats would be truncated
+        for spec, camera_type in zip(self.specs, pixel_types):
+            if camera_type not in RAW_PIXEL_TYPES or camera_type != pixel_type:
+                raise CameraError("start raw session", camera=spec.name.upper(),
+                                  detail=f"PixelFormat 0x{camera_type:x} is not 8-bit Bayer or Mono8 "
+                                         f"matching the master (0x{pixel_type:x})")
+
+        path = Path(saving_path) / f"raw_{int(time.time() * 1e7)}.accraw"
+        self.raw_writer = RawCaptureWriter(path, *frame_size, capacity=len(self.specs) * max_sets,
+                                           pixel_type=pixel_type, cameras=[spec.name for spec in self.specs])
+        for thread in self.cam_threads:
+            thread.raw_writer = self.raw_writer
+        return path
+
+    def stop_raw_session(self):
+        if self.raw_writer is None:
+            return
+        for thread in self.cam_threads:
+            if thread:
+                thread.raw_writer = None
+        self.raw_writer.close()
+        self.raw_writer = None
+
+    def save_frames(self, saving_path: str | Path = ROOT_DIR, frame_set: FrameSet = None, timestamp: int = None) -> list:
+        """
+            This function queue one image per camera for saving, named {prefix}_{timestamp}.jpg.
+            Encoding and writing happen on the background image writer, this function does not block
+            unless the writer queue is full.
 
         Args:
         --------------------
             saving_path: str or Path, saving path
+            frame_set: FrameSet, frames to save, defaults to the last matched set
+            timestamp: int, file name timestamp, defaults to now
+
+        Returns:
+        --------------------
+            list of Future, one per camera, each resolving to a WriteResult;
+            all None while a raw session is recording, the frames are already in the session file
+        """
+        return self._queue_frames(saving_path, self._frames_to_save(frame_set), timestamp)
+
+    def _frames_to_save(self, frame_set: FrameSet = None) -> list:
+        if frame_set is None:
+            frame_set = self.last_set
+        if frame_set is None:
+            logger.warning("no matched frame set, saving the latest frame of each camera")
+            return self.frames
+        return frame_set.frames
+
+    def _queue_frames(self, saving_path: str | Path, frames: list, timestamp: int = None) -> list:
+        """
+            This function submits one frame per camera to the image writer, shared by save_frames and save_pose
 
         Returns:
         --------------------
-            left_name: str, left camera image name
-            right_name: str, right camera image name
+            list of Future, one per camera, all None while a raw session is recording
+        """
+        if self.raw_writer is not None:
+            return [None] * len(self.specs)
+
+        saving_path = Path(saving_path)
+        if timestamp is None:
+            timestamp = int(time.time() * 1e7)
+        futures = []
+        names = []
+        for spec, frame in zip(self.specs, frames):
+            name = saving_path / self._frame_file_name(spec, timestamp)
+            futures.append(self.writer.submit(name, frame))
+            names.append(name.name)
+        logger.info(f"queued images for saving: {', '.join(names)}")
+
+        return futures
+
+    @staticmethod
+    def _frame_file_name(spec: CameraSpec, timestamp: int) -> str:
+        return f"{spec.prefix}_{timestamp}.jpg"
+
+    def save_pose(self, saving_path: str | Path, record: PoseRecord) -> list:
+        """
+            This function save an exposure bracket as one pose record: the images of every exposure go to
+            exp_{exposure}/ under saving_path with the names save_frames uses, so every exposure folder
+            is a complete dataset, and one json line describing the pose is appended to poses.jsonl.
+            While a raw session is recording only the record is written.
+
+        Returns:
+        --------------------
+            list of the save_frames futures, one list per exposure, None for missing sets
         """
         saving_path = Path(saving_path)
         timestamp = int(time.time() * 1e7)
-        left_name = saving_path / f"A_{timestamp}.jpg"
-        right_name = saving_path / f"D_{timestamp}.jpg"
-        self.left_cam_thread.Save_jpg(left_name)
-        self.right_cam_thread.Save_jpg(right_name)
-        logger.info("successfully saved images")
+        futures = []
+        files = []
+        for exposure, frame_set in record:
+            if frame_set is None:
+                futures.append(None)
+                files.append(None)
+                continue
+            folder = saving_path / f"exp_{exposure:g}"
+            folder.mkdir(parents=True, exist_ok=True)
+            futures.append(self._queue_frames(folder, frame_set.frames, timestamp))
+            files.append(None if self.raw_writer is not None else
+                         [f"{folder.name}/{self._frame_file_name(spec, timestamp)}" for spec in self.specs])
+
+        entry = {"timestamp": timestamp, "cameras": [spec.name for spec in self.specs], **record.to_dict(), "files": files}
+        with open(saving_path / POSE_RECORDS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        return futures
+
+
+class HikSyncedCameras(HikCameraGroup):
+    """
+        This class is used to control the left / right HIK robotics stereo cameras in QT way
+    """
+    stereo_pair_signal = Signal(object)     # StereoPair
+    def __init__(self, backend=None):
+        super().__init__([
+            CameraSpec("left", MASTER_CFG_PATH if LEFT_CAM_TYPE == "MASTER" else SLAVE_CFG_PATH,
+                       master=LEFT_CAM_TYPE == "MASTER", prefix="A"),
+            CameraSpec("right", MASTER_CFG_PATH if RIGHT_CAM_TYPE == "MASTER" else SLAVE_CFG_PATH,
+                       master=RIGHT_CAM_TYPE == "MASTER", prefix="D"),
+        ], backend)
+
+    def _make_matcher(self) -> StereoMatcher:
+        return StereoMatcher()
+
+    @property
+    def left_cam(self):
+        return self.cams[FrameType.LEFT]
+
+    @property
+    def right_cam(self):
+        return self.cams[FrameType.RIGHT]
+
+    @property
+    def left_cam_thread(self):
+        return self.cam_threads[FrameType.LEFT]
+
+    @property
+    def right_cam_thread(self):
+        return self.cam_threads[FrameType.RIGHT]
+
+    @property
+    def left_frame(self):
+        return self.frames[FrameType.LEFT]
+
+    @property
+    def right_frame(self):
+        return self.frames[FrameType.RIGHT]
+
+    @property
+    def slave_cam(self):
+        return self.slave_cams[0]
+
+    @property
+    def last_pair(self):
+        return self.last_set
+
+    def _set_cameras(self, left_cam_id, right_cam_id):
+        """
+            This function set the left and right camera index
+
+        Args:
+        --------------------
+            left_cam_id: int, selected left camera index in enum_device_list
+            right_cam_id: int, selected right camera index in enum_device_list
+        """
+        super()._set_cameras(left_cam_id, right_cam_id)
+
+    def _infer_LR_by_name(self):
+        """
+            This function infer the left and right camera index by camera name
+        """
+        return tuple(self._infer_ids_by_name())
 
-        return left_name, right_name
+    def _on_frame_set(self, pair: StereoPair):
+        super()._on_frame_set(pair)
+        self.stereo_pair_signal.emit(pair)
 
+    def capture_dual_camera(self):
+        """
+            This function capture images from both cameras, either synced or not.
+            In streaming mode the cameras are switched back to triggered mode first.
+        """
+        self.capture()
+
+    def start_raw_session(self, saving_path: str | Path = ROOT_DIR, max_pairs: int = 200):
+        return super().start_raw_session(saving_path, max_pairs)
+
+    def save_frames(self, saving_path: str | Path = ROOT_DIR, pair: StereoPair = None):
+        """
+            This function queue images from both cameras for saving, see HikCameraGroup.save_frames
+
+        Returns:
+        --------------------
+            left_future: Future, resolves to the left WriteResult
+            right_future: Future, resolves to the right WriteResult
+            both are None while a raw session is recording, the frames are already in the session file
+        """
+        left_future, right_future = self._queue_frames(saving_path, self._frames_to_save(pair))
+        return left_future, right_future
 
 class CameraSignals(QObject):
-    captured_frame = Signal(FrameType, np.ndarray)
+    captured_frame = Signal(object)     # CapturedFrame
+    frame_ready = Signal(int)           # streaming: camera index, a new latest frame waits in take_latest()
 
 class CamRunThread(QRunnable):
-    def __init__(self, cam: MvCamera, frameType):
+    def __init__(self, cam: "MvCamera", camera: int, pool: FrameBufferPool = None, name: str = None, sdk=None):
         super().__init__()
         self.signals = CameraSignals()
         self.cam = cam
-        self.capture = False
+        self.sdk = get_backend(sdk)
+        # 相机在相机组中的序号，以及日志中使用的名称
+        self.camera = int(camera)
+        self.name = name or getattr(camera, "name", str(camera))
+        self.pool = pool if pool is not None else FrameBufferPool(self.name)
         self.exit = False
-        self.frameType = frameType
+        self._started = False
+        self._pending = 0
+        # perf_counter of the last trigger, for the latency stats
+        self._t_trigger = None
+        self._mutex = QMutex()
+        self._wake = QWaitCondition()
+        self._finished = threading.Event()
+        self._idle = threading.Event()
+
+        # 连续取流模式：不等待触发请求，只保留最新一帧
+        self.streaming = False
+        self._latest = None
+        self.dropped = 0
+        # 每次切换模式加一，切换前取到的帧不再交付
+        self._generation = 0
+        # 在采集线程中生成适合视口大小的预览图，GUI线程只绘制小图
+        self.preview_size = PREVIEW_SIZE
+
+        # 最近一帧转换后的RGB图像（池缓冲区的视图），供 Save_jpg 使用
+        self.last_frame = None
+        # 若设置，原始Bayer数据在转换前直接从SDK缓冲区写入会话文件
+        self.raw_writer = None
+        self.stFrameInfo = self.sdk.MV_FRAME_OUT_INFO_EX()
+
+    def start_capture(self, t_trigger: float = None):
+        """
+            Request one frame, the acquisition loop wakes up immediately
+
+        Args:
+        --------------------
+            t_trigger: float, perf_counter when the trigger was sent, for the latency stats
+        """
+        with QMutexLocker(self._mutex):
+            self._pending += 1
+            self._t_trigger = t_trigger
+            self._wake.wakeAll()
 
-        self.buf_save_image = None
-        self.stFrameInfo = MV_FRAME_OUT_INFO_EX()
+    def set_streaming(self, enable: bool, wait_ms=1000) -> bool:
+        """
+            Switch between continuous grabbing and one grab per start_capture().
+            When leaving streaming mode, wait until the loop is back to waiting for requests,
+            so no streamed frame is mistaken for a triggered one afterwards.
+        """
+        with QMutexLocker(self._mutex):
+            self.streaming = enable
+            self._generation += 1
+            self._pending = 0
+            self._latest = None
+            if enable:
+                self._idle.clear()
+            self._wake.wakeAll()
+        if enable or not self._started:
+            return True
+        return self._idle.wait(wait_ms / 1000)
+
+    def take_latest(self) -> CapturedFrame:
+        """
+            Streaming: return the newest frame and clear the slot, None if it was already taken
+        """
+        with QMutexLocker(self._mutex):
+            captured, self._latest = self._latest, None
+        return captured
+
+    def _wait_for_request(self) -> bool:
+        # 阻塞等待 start_capture() 或 stop()，不再轮询；连续取流模式下不等待
+        with QMutexLocker(self._mutex):
+            while self._pending == 0 and not self.streaming and not self.exit:
+                self._idle.set()
+                self._wake.wait(self._mutex)
+            if self.exit:
+                return False
+            self._idle.clear()
+            if not self.streaming:
+                self._pending -= 1
+            return True
+
+    def _grab(self, stOutFrame) -> int:
+        # 分片等待取流，使 stop() 最多在 GRAB_POLL_MS 内生效
+        streaming = self.streaming
+        deadline = time.perf_counter() + GRAB_TIMEOUT_MS / 1000
+        ret = self.sdk.MV_E_NODATA
+        while not self.exit and streaming == self.streaming:
+            ret = self.cam.MV_CC_GetImageBuffer(stOutFrame, GRAB_POLL_MS)
+            if ret == 0 or time.perf_counter() >= deadline:
+                break
+        return ret
 
-    def start_capture(self):
-        self.capture = True
+    def _deliver(self, captured: CapturedFrame, generation: int):
+        with QMutexLocker(self._mutex):
+            if generation != self._generation:
+                # 取帧期间切换了模式，这一帧属于上一个模式
+                self.dropped += 1
+                return
+            if not self.streaming:
+                self.signals.captured_frame.emit(captured)
+                return
+            # 连续取流：消费者跟不上时覆盖旧帧，只发一次通知
+            replaced = self._latest is not None
+            self._latest = captured
+        if replaced:
+            self.dropped += 1
+        else:
+            self.signals.frame_ready.emit(self.camera)
 
     def run(self):
-        stOutFrame = MV_FRAME_OUT()
+        stOutFrame = self.sdk.MV_FRAME_OUT()
         memset(byref(stOutFrame), 0, sizeof(stOutFrame))
-        while True:
-            if self.exit:
-                break
-            if self.capture:
-                str_id = "LEFT" if self.frameType==FrameType.LEFT else "RIGHT"
-                logger.info(str_id+" cam Thread captureing...")
+        self._started = True
+        self._finished.clear()
+        try:
+            while self._wait_for_request():
+                str_id = self.name
+                if not self.streaming:
+                    logger.info(str_id+" cam Thread captureing...")
                 # 获取影像缓冲数据
-                ret = self.cam.MV_CC_GetImageBuffer(stOutFrame, 10000)
+                with QMutexLocker(self._mutex):
+                    streaming, generation = self.streaming, self._generation
+                ret = self._grab(stOutFrame)
                 self.stFrameInfo = stOutFrame.stFrameInfo
 
                 if None != stOutFrame.pBufAddr and 0 == ret:
-                    # 输出影像长、宽等信息
-                    logger.debug(str(self.frameType)[10:] + "\tget one frame: Width[%d], Height[%d], nFrameNum[%d]" % (
-                        self.stFrameInfo.nWidth, self.stFrameInfo.nHeight, self.stFrameInfo.nFrameNum))
-
-                    # 将缓冲数据的内存地址赋给 self.buf_grab_image
-                    self.buf_save_image = (c_ubyte * self.stFrameInfo.nFrameLen)()
-                    import platform
-                    if platform.system() == 'Windows':
-                        cdll.msvcrt.memcpy(byref(self.buf_save_image), stOutFrame.pBufAddr, self.stFrameInfo.nFrameLen)
-                    else:
-                        memmove(byref(self.buf_save_image), stOutFrame.pBufAddr, self.stFrameInfo.nFrameLen)
-
-                    n_save_image_size = self.stFrameInfo.nWidth * self.stFrameInfo.nHeight * 3 + 2048
-                    img_buff = (c_ubyte * n_save_image_size)()
-
-                    # 转换像素格式为RGB
-                    stConvertParam = MV_CC_PIXEL_CONVERT_PARAM()
-                    memset(byref(stConvertParam), 0, sizeof(stConvertParam))
-                    stConvertParam.nWidth = self.stFrameInfo.nWidth
-                    stConvertParam.nHeight = self.stFrameInfo.nHeight
-                    stConvertParam.pSrcData = cast(self.buf_save_image, POINTER(c_ubyte))
-                    stConvertParam.nSrcDataLen = self.stFrameInfo.nFrameLen
-                    stConvertParam.enSrcPixelType = self.stFrameInfo.enPixelType
-                    nConvertSize = self.stFrameInfo.nWidth * self.stFrameInfo.nHeight * 3
-                    stConvertParam.enDstPixelType = PixelType_Gvsp_RGB8_Packed
-                    stConvertParam.pDstBuffer = (c_ubyte * nConvertSize)()
-                    stConvertParam.nDstBufferSize = nConvertSize
-                    self.cam.MV_CC_ConvertPixelType(stConvertParam)
-
-                    # 将转换后的RGB数据拷贝给img_buff
-                    import platform
-                    if platform.system() == 'Windows':
-                        cdll.msvcrt.memcpy(byref(img_buff), stConvertParam.pDstBuffer, nConvertSize)
-                    else:
-                        memmove(byref(img_buff), stConvertParam.pDstBuffer, nConvertSize)
-
-                    # 将二进制的img_buff转换为numpy矩阵
-                    numArray = buffer2numpy(img_buff, self.stFrameInfo.nWidth, self.stFrameInfo.nHeight)
-                    # logger.info(f"frame shape: {numArray.shape} from {self.frameType} cam")
-                    self.signals.captured_frame.emit(self.frameType, numArray)
-
-                    nRet = self.cam.MV_CC_FreeImageBuffer(stOutFrame)
-                self.capture = False
-            QThread.msleep(100)
-    
-    def stop(self):
-        self.exit = True
+                    if generation != self._generation:
+                        # 切换模式前取到的帧，不转换直接归还
+                        self.cam.MV_CC_FreeImageBuffer(stOutFrame)
+                        self.dropped += 1
+                        continue
+                    t_buffer = time.perf_counter()
+                    t_trigger = None if streaming else self._t_trigger
+                    if t_trigger is not None:
+                        latency.record("trigger_to_buffer", (t_buffer - t_trigger) * 1e3)
+                    self._process_frame(stOutFrame, t_trigger, t_buffer, generation)
+                elif not self.exit and streaming == self.streaming:
+                    logger.error(str_id + " cam get image buffer fail! ret[0x%x]" % ret)
+        finally:
+            self._finished.set()
+
+    def _process_frame(self, stOutFrame, t_trigger: float = None, t_buffer: float = 0.0, generation: int = 0):
+        # 输出影像长、宽等信息
+        logger.debug(self.name + "\tget one frame: Width[%d], Height[%d], nFrameNum[%d]" % (
+            self.stFrameInfo.nWidth, self.stFrameInfo.nHeight, self.stFrameInfo.nFrameNum))
+
+        raw_writer = self.raw_writer
+        if raw_writer is not None:
+            raw_writer.append(self.camera, stOutFrame.pBufAddr, self.stFrameInfo)
+
+        # 转换像素格式为RGB，SDK直接从取流缓冲区写入 img_buff，这是唯一的一次拷贝
+        nConvertSize = self.stFrameInfo.nWidth * self.stFrameInfo.nHeight * 3
+        img_buff = self.pool.acquire(self.stFrameInfo.nWidth, self.stFrameInfo.nHeight,
+                                     self.sdk.PixelType_Gvsp_RGB8_Packed, nConvertSize)
+        stConvertParam = self.sdk.MV_CC_PIXEL_CONVERT_PARAM()
+        memset(byref(stConvertParam), 0, sizeof(stConvertParam))
+        stConvertParam.nWidth = self.stFrameInfo.nWidth
+        stConvertParam.nHeight = self.stFrameInfo.nHeight
+        stConvertParam.pSrcData = stOutFrame.pBufAddr
+        stConvertParam.nSrcDataLen = self.stFrameInfo.nFrameLen
+        stConvertParam.enSrcPixelType = self.stFrameInfo.enPixelType
+        stConvertParam.enDstPixelType = self.sdk.PixelType_Gvsp_RGB8_Packed
+        stConvertParam.pDstBuffer = cast(img_buff, POINTER(c_ubyte))
+        stConvertParam.nDstBufferSize = nConvertSize
+        t0 = time.perf_counter()
+        ret = self.cam.MV_CC_ConvertPixelType(stConvertParam)
+        t0 = latency.since("convert", t0)
+
+        # 转换完成后立即归还SDK缓冲区
+        nRet = self.cam.MV_CC_FreeImageBuffer(stOutFrame)
+        if ret != 0:
+            logger.error("convert pixel type fail! ret[0x%x]" % ret)
+            self.pool.release(img_buff)
+            return
+
+        # img_buff 的numpy视图，不再拷贝；所有视图释放后缓冲区自动归还缓冲池
+        numArray = self.pool.wrap(img_buff, self.stFrameInfo.nWidth, self.stFrameInfo.nHeight)
+        self.last_frame = numArray
+        # logger.info(f"frame shape: {numArray.shape} from {self.name} cam")
+        captured = CapturedFrame.from_frame_info(self.camera, numArray, self.stFrameInfo)
+        captured.arrival = t_buffer
+        t0 = latency.since("wrap", t0)
+        captured.preview = self._make_preview(numArray)
+        if latency.enabled:
+            latency.since("preview", t0)
+            if t_trigger is not None:
+                captured.stamps["trigger"] = t_trigger
+            captured.stamps["emit"] = time.perf_counter()
+        self._deliver(captured, generation)
+
+    def _make_preview(self, frame: np.ndarray) -> np.ndarray:
+        # 按面积重采样缩小到视口内，保持宽高比
+        view_w, view_h = self.preview_size
+        h, w = frame.shape[:2]
+        scale = min(view_w / w, view_h / h, 1.0)
+        if scale == 1.0:
+            return frame.copy()
+        size = (max(int(w * scale), 1), max(int(h * scale), 1))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def stop(self, wait_ms=1000):
+        """
+            Ask the acquisition loop to exit and wait until it has left the SDK calls
+
+        Returns:
+        --------------------
+            bool: whether the loop exited within wait_ms
+        """
+        with QMutexLocker(self._mutex):
+            self.exit = True
+            self._wake.wakeAll()
+        if not self._started:
+            return True
+        return self._finished.wait(wait_ms / 1000)
 
     # 存jpg图像
-    def Save_jpg(self, file_path):
-        if self.buf_save_image is None:
+    def Save_jpg(self, file_path, image: np.ndarray = None):
+        """
+            Encode an RGB frame to jpg with the SDK, defaults to the latest frame of this camera
+        """
+        if image is None:
+            image = self.last_frame
+        if image is None:
             return
+        image = np.ascontiguousarray(image)
+        nHeight, nWidth = image.shape[:2]
 
         c_file_path = str(file_path).encode('ascii')
         print(c_file_path)
-        stSaveParam = MV_SAVE_IMAGE_TO_FILE_PARAM_EX()
-        stSaveParam.enPixelType = self.stFrameInfo.enPixelType  # ch:相机对应的像素格式 | en:Camera pixel type
-        stSaveParam.nWidth = self.stFrameInfo.nWidth  # ch:相机对应的宽 | en:Width
-        stSaveParam.nHeight = self.stFrameInfo.nHeight  # ch:相机对应的高 | en:Height
-        stSaveParam.nDataLen = self.stFrameInfo.nFrameLen
-        stSaveParam.pData = cast(self.buf_save_image, POINTER(c_ubyte))
-        stSaveParam.enImageType = MV_Image_Jpeg  # ch:需要保存的图像类型 | en:Image format to save
+        stSaveParam = self.sdk.MV_SAVE_IMAGE_TO_FILE_PARAM_EX()
+        stSaveParam.enPixelType = self.sdk.PixelType_Gvsp_RGB8_Packed  # ch:缓冲区已转换为RGB | en:Buffer is already RGB
+        stSaveParam.nWidth = nWidth  # ch:相机对应的宽 | en:Width
+        stSaveParam.nHeight = nHeight  # ch:相机对应的高 | en:Height
+        stSaveParam.nDataLen = image.nbytes
+        stSaveParam.pData = image.ctypes.data_as(POINTER(c_ubyte))
+        stSaveParam.enImageType = self.sdk.MV_Image_Jpeg  # ch:需要保存的图像类型 | en:Image format to save
         stSaveParam.nQuality = 90
-        stSaveParam.pcImagePath = ctypes.create_string_buffer(c_file_path)
+        stSaveParam.pcImagePath = create_string_buffer(c_file_path)
         stSaveParam.iMethodValue = 2
         ret = self.cam.MV_CC_SaveImageToFileEx(stSaveParam)
 
@@ -0,0 +1,170 @@
+# image_writer.py
+
+import time
+import queue
+import threading
+from pathlib import Path
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from hik.frames import CapturedFrame
+from hik.latency import recorder as latency
+
+
+@dataclass
+class WriteResult:
+    path: Path
+    encode_ms: float
+    write_ms: float
+    nbytes: int
+
+
+class ImageWriter:
+    """
+        Background jpg writer: a bounded number of pending images shared by a pool of worker threads.
+
+    ``submit`` blocks once ``max_pending`` images are waiting, which is the backpressure point; the scan
+    loop should call ``wait_for_capacity`` before triggering so the GUI thread rarely has to block.
+    """
+    def __init__(self, workers: int = 2, max_pending: int = 4, quality: int = 90):
+        self.max_pending = max_pending
+        self.quality = quality
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._pending = 0
+        self.closed = False
+
+        self.written = 0
+        self.total_encode_ms = 0.0
+        self.total_write_ms = 0.0
+        self.total_bytes = 0
+
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"ImageWriter-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, path: str | Path, image: CapturedFrame | np.ndarray, timeout: float = None) -> Future:
+        """
+            Queue one image for encoding and writing
+
+        Args:
+        --------------------
+            path: str or Path, output file
+            image: CapturedFrame, converted to BGR in the worker via as_bgr(),
+                   or np.ndarray already in BGR; must not be modified until the future is done
+            timeout: float, seconds to wait for a free slot, None waits forever
+
+        Returns:
+        --------------------
+            Future resolving to a WriteResult
+        """
+        with self._cond:
+            # checked and queued under the lock close() takes, so no image lands behind the stop items
+            if not self._cond.wait_for(lambda: self.closed or self._pending < self.max_pending, timeout):
+                raise TimeoutError("image writer queue is full")
+            if self.closed:
+                raise RuntimeError("image writer is closed")
+            self._pending += 1
+            future = Future()
+            self._queue.put((Path(path), image, future, time.perf_counter()))
+        return future
+
+    def wait_for_capacity(self, slots: int = 1, timeout: float = None) -> bool:
+        """
+            Block until at least ``slots`` images can be queued without blocking
+        """
+        slots = min(slots, self.max_pending)
+        with self._cond:
+            return self._cond.wait_for(lambda: self.max_pending - self._pending >= slots, timeout)
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+            Block until every queued image has been written
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self):
+        """
+            Write every queued image, then stop the worker threads
+        """
+        with self._cond:
+            if self.closed:
+                return
+            self._cond.wait_for(lambda: self._pending == 0)
+            self.closed = True
+            self._cond.notify_all()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, image, future, t_submit = item
+            if not future.set_running_or_notify_cancel():
+                self._done()
+                continue
+            try:
+                t0 = time.perf_counter()
+                stamps = None
+                if isinstance(image, CapturedFrame):
+                    stamps = image.stamps
+                    image = image.as_bgr()
+                ok, encoded = cv2.imencode(path.suffix or ".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if not ok:
+                    raise IOError(f"failed to encode {path}")
+                t1 = time.perf_counter()
+                with open(path, "wb") as f:
+                    f.write(encoded)
+                t2 = time.perf_counter()
+
+                result = WriteResult(path, (t1 - t0) * 1e3, (t2 - t1) * 1e3, encoded.nbytes)
+                if latency.enabled:
+                    latency.record("queue", (t0 - t_submit) * 1e3)
+                    latency.record("encode", result.encode_ms)
+                    latency.record("write", result.write_ms)
+                    if stamps and "trigger" in stamps:
+                        latency.record("trigger_to_disk", (t2 - stamps["trigger"]) * 1e3)
+                with self._cond:
+                    self.written += 1
+                    self.total_encode_ms += result.encode_ms
+                    self.total_write_ms += result.write_ms
+                    self.total_bytes += result.nbytes
+                logger.debug(f"saved {path.name}: encode {result.encode_ms:.1f} ms, write {result.write_ms:.1f} ms, "
+                             f"{result.nbytes / 1e6:.2f} MB")
+                future.set_result(result)
+            except Exception as e:
+                logger.error(f"failed to save {path}: {e}")
+                future.set_exception(e)
+            finally:
+                self._done()
+
+    def _done(self):
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            n = max(self.written, 1)
+            return {
+                "written": self.written,
+                "pending": self._pending,
+                "mean_encode_ms": self.total_encode_ms / n,
+                "mean_write_ms": self.total_write_ms / n,
+                "total_mb": self.total_bytes / 1e6,
+            }
@@ -0,0 +1,149 @@
+# latency.py
+#
+# Per-stage latency histograms of the capture pipeline, from the software trigger to the file on disk.
+# Disabled by default: every instrumentation point then costs one attribute check. Enable with
+# AUTOCAMCALIB_LATENCY=1 or latency.recorder.enabled = True.
+#
+# Stages, in pipeline order:
+#   trigger             MV_CC_SetCommandValue("TriggerSoftware")
+#   trigger_to_buffer   trigger sent -> MV_CC_GetImageBuffer returned, per camera
+#   convert             MV_CC_ConvertPixelType
+#   wrap                MV_CC_FreeImageBuffer, numpy view of the pool buffer and CapturedFrame
+#   preview             preview downscale on the acquisition thread
+#   signal              captured_frame emitted -> slot running in the group's thread
+#   paint               GUI preview update
+#   queue               ImageWriter.submit -> worker picks the image up
+#   encode, write       jpg encode and file write
+#   trigger_to_disk     trigger sent -> file written
+
+import os
+import json
+import math
+import time
+import bisect
+import threading
+from pathlib import Path
+
+from loguru import logger
+
+
+LATENCY_ENV = "AUTOCAMCALIB_LATENCY"
+STAGES = ("trigger", "trigger_to_buffer", "convert", "wrap", "preview", "signal", "paint",
+          "queue", "encode", "write", "trigger_to_disk")
+
+# log-spaced bins from 1 us to 100 s, 50 per decade (4.7 % wide)
+_BINS_PER_DECADE = 50
+_BIN_EDGES_MS = [10 ** (k / _BINS_PER_DECADE) for k in range(-3 * _BINS_PER_DECADE, 5 * _BINS_PER_DECADE + 1)]
+
+
+class StageHistogram:
+    """
+        Latency histogram of one stage with constant memory, percentiles are accurate to a bin width
+    """
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(_BIN_EDGES_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(_BIN_EDGES_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def percentile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= rank and n:
+                # geometric centre of the bin, within the observed range
+                low = _BIN_EDGES_MS[i - 1] if i > 0 else 0.0
+                high = _BIN_EDGES_MS[i] if i < len(_BIN_EDGES_MS) else self.max
+                centre = math.sqrt(low * high) if low > 0 else high
+                return min(max(centre, self.min), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.max,
+        }
+
+
+class LatencyRecorder:
+    """
+        Thread-safe collection of StageHistogram by stage name
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, stage: str, ms: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = StageHistogram()
+            histogram.add(ms)
+
+    def since(self, stage: str, t0: float) -> float:
+        """
+            Record the time since perf_counter() value t0, return perf_counter() now
+        """
+        now = time.perf_counter()
+        self.record(stage, (now - t0) * 1e3)
+        return now
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def stats(self) -> dict:
+        """
+            {stage: {count, mean, p50, p95, max}} in ms, pipeline stages first
+        """
+        with self._lock:
+            names = [s for s in STAGES if s in self._stages] + sorted(set(self._stages) - set(STAGES))
+            return {name: self._stages[name].summary() for name in names}
+
+    def report(self) -> str:
+        lines = [f"{'stage':>18} {'count':>6} {'p50':>9} {'p95':>9} {'max':>9}  ms"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:>18} {s['count']:>6} {s['p50']:>9.2f} {s['p95']:>9.2f} {s['max']:>9.2f}")
+        return "\n".join(lines)
+
+    def dump(self, path: str | Path = None, reset: bool = True) -> dict:
+        """
+            Log the report and optionally write the stats as json, e.g. at the end of a scan
+
+        Returns:
+        --------------------
+            dict: the stats, empty when disabled or nothing was recorded
+        """
+        stats = self.stats()
+        if not stats:
+            return stats
+        logger.info("capture latency\n" + self.report())
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2)
+        if reset:
+            self.reset()
+        return stats
+
+
+recorder = LatencyRecorder(os.environ.get(LATENCY_ENV, "0") not in ("", "0"))
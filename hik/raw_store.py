@@ -0,0 +1,224 @@
+# raw_store.py
+#
+# Session file holding undemosaiced 8-bit Bayer frames plus their MV_FRAME_OUT_INFO_EX metadata.
+#
+# Layout:
+#   [0, 8)            magic b"ACCRAW01"
+#   [8, 16)           number of records written, little endian uint64
+#   [16, 20)          length of the json header, little endian uint32
+#   [20, ...)         json header: width, height, pixel_type, capacity, cameras
+#   [HEADER_SIZE, ..) capacity x RECORD (FRAME_META_DTYPE followed by height x width bytes)
+
+import json
+import weakref
+import threading
+from ctypes import memmove
+from pathlib import Path
+from functools import lru_cache
+
+import cv2
+import numpy as np
+from loguru import logger
+
+
+RAW_MAGIC = b"ACCRAW01"
+HEADER_SIZE = 4096
+
+# GenICam PFNC values used by the MVS SDK (PixelType_Gvsp_*)
+PIXEL_TYPE_MONO8 = 0x01080001
+PIXEL_TYPE_BAYER_GR8 = 0x01080008
+PIXEL_TYPE_BAYER_RG8 = 0x01080009
+PIXEL_TYPE_BAYER_GB8 = 0x0108000A
+PIXEL_TYPE_BAYER_BG8 = 0x0108000B
+
+# OpenCV names Bayer patterns after the second row, so RGGB sensors use COLOR_BayerBG2RGB
+DEMOSAIC_CODES = {
+    PIXEL_TYPE_BAYER_RG8: cv2.COLOR_BayerBG2RGB,
+    PIXEL_TYPE_BAYER_GR8: cv2.COLOR_BayerGB2RGB,
+    PIXEL_TYPE_BAYER_GB8: cv2.COLOR_BayerGR2RGB,
+    PIXEL_TYPE_BAYER_BG8: cv2.COLOR_BayerRG2RGB,
+}
+# formats stored at one byte per pixel; 10/12-bit and packed formats are not supported
+RAW_PIXEL_TYPES = (PIXEL_TYPE_MONO8, *DEMOSAIC_CODES)
+
+FRAME_META_DTYPE = np.dtype([
+    ("camera", "<u4"),
+    ("frame_num", "<u4"),
+    ("pixel_type", "<u4"),
+    ("frame_len", "<u4"),
+    ("dev_timestamp", "<u8"),
+    ("host_timestamp", "<i8"),
+    ("exposure_us", "<f4"),
+    ("gain", "<f4"),
+])
+
+
+def _record_dtype(width, height):
+    return np.dtype([("meta", FRAME_META_DTYPE), ("data", np.uint8, (height, width))])
+
+
+class RawCaptureWriter:
+    """
+        Appends raw 8-bit frames into a preallocated, memory-mapped session file.
+
+    Each append is a single copy from the SDK grab buffer into the mapped file, so frames are stored
+    at one byte per pixel instead of three and without jpg artifacts. Safe to call from several
+    camera threads.
+    """
+    def __init__(self, path: str | Path, width: int, height: int, capacity: int,
+                 pixel_type: int = PIXEL_TYPE_BAYER_RG8, cameras: list[str] = None):
+        if pixel_type not in RAW_PIXEL_TYPES:
+            raise ValueError(f"pixel type 0x{pixel_type:x} is not 8-bit Bayer or Mono8")
+        self.path = Path(path)
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        self.pixel_type = pixel_type
+        self._lock = threading.Lock()
+        self._count = 0
+
+        record = _record_dtype(width, height)
+        header = json.dumps({
+            "width": width,
+            "height": height,
+            "pixel_type": pixel_type,
+            "capacity": capacity,
+            "cameras": cameras or [],
+        }).encode()
+        if 20 + len(header) > HEADER_SIZE:
+            raise ValueError("raw session header too large")
+
+        # np.memmap extends the file with a single write at the end, so the file is sparse until filled
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode="w+", shape=(HEADER_SIZE + record.itemsize * capacity,))
+        self._mm[0:8] = np.frombuffer(RAW_MAGIC, dtype=np.uint8)
+        self._mm[16:20] = np.frombuffer(np.uint32(len(header)).tobytes(), dtype=np.uint8)
+        self._mm[20:20 + len(header)] = np.frombuffer(header, dtype=np.uint8)
+        self._count_view = self._mm[8:16].view("<u8")
+        self._count_view[0] = 0
+        self.records = self._mm[HEADER_SIZE:].view(record)
+        logger.info(f"raw session {self.path.name}: {capacity} x {width}x{height} frames, "
+                    f"{self._mm.nbytes / 1e9:.2f} GB reserved")
+
+    def __len__(self):
+        return self._count
+
+    def append(self, camera: int, pBufAddr, stFrameInfo) -> int:
+        """
+            Copy one frame from the SDK buffer into the next free record
+
+        Args:
+        --------------------
+            camera: int, camera index stored with the frame
+            pBufAddr: address of the frame in the SDK buffer (MV_FRAME_OUT.pBufAddr)
+            stFrameInfo: MV_FRAME_OUT_INFO_EX of the frame
+
+        Returns:
+        --------------------
+            int, record index, or -1 if the frame was not stored
+        """
+        if (stFrameInfo.nWidth, stFrameInfo.nHeight) != (self.width, self.height) or \
+                stFrameInfo.enPixelType != self.pixel_type:
+            logger.error(f"raw session: frame {stFrameInfo.nWidth}x{stFrameInfo.nHeight} "
+                         f"type 0x{stFrameInfo.enPixelType:x} does not match the session format")
+            return -1
+
+        with self._lock:
+            if self._count >= self.capacity:
+                logger.error(f"raw session {self.path.name} is full ({self.capacity} frames)")
+                return -1
+            index = self._count
+            self._count += 1
+
+        memmove(self.records["data"][index].ctypes.data, pBufAddr, self.width * self.height)
+        self.records["meta"][index] = (
+            camera,
+            stFrameInfo.nFrameNum,
+            stFrameInfo.enPixelType,
+            stFrameInfo.nFrameLen,
+            (stFrameInfo.nDevTimeStampHigh << 32) | stFrameInfo.nDevTimeStampLow,
+            stFrameInfo.nHostTimeStamp,
+            getattr(stFrameInfo, "fExposureTime", 0.0),
+            getattr(stFrameInfo, "fGain", 0.0),
+        )
+
+        with self._lock:
+            # keep the on-disk count current so a session survives a crash mid-scan
+            self._count_view[0] = max(int(self._count_view[0]), index + 1)
+        return index
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        """
+            Flush and truncate the file to the records actually written
+        """
+        if self._mm is None:
+            return
+        count = int(self._count_view[0])
+        size = HEADER_SIZE + self.records.itemsize * count
+        self._mm.flush()
+        # drop our references, the mapping closes once the memmap and its views are collected
+        mapping = weakref.ref(self._mm)
+        self.records = None
+        self._count_view = None
+        self._mm = None
+        if mapping() is not None:
+            # truncating a file that is still mapped fails on Windows and faults on access elsewhere
+            logger.warning(f"raw session {self.path.name} still referenced, file not truncated")
+            return
+        with open(self.path, "r+b") as f:
+            f.truncate(size)
+        logger.info(f"raw session {self.path.name} closed with {count} frames")
+
+
+class RawCaptureReader:
+    """
+        Read-only access to a raw session file, demosaicing lazily on access
+
+        reader = RawCaptureReader("raw_xxx.accraw")
+        rgb = reader[0]             # demosaiced RGB, cached
+        bayer = reader.raw(0)       # zero-copy view into the file
+        meta = reader.meta(0)
+    """
+    def __init__(self, path: str | Path, cache_size: int = 4):
+        self.path = Path(path)
+        mm = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if bytes(mm[0:8]) != RAW_MAGIC:
+            raise ValueError(f"{self.path} is not a raw capture session")
+        count = int(mm[8:16].view("<u8")[0])
+        header_len = int(mm[16:20].view("<u4")[0])
+        self.header = json.loads(bytes(mm[20:20 + header_len]))
+        self.width = self.header["width"]
+        self.height = self.header["height"]
+        self.pixel_type = self.header["pixel_type"]
+
+        record = _record_dtype(self.width, self.height)
+        self.records = mm[HEADER_SIZE:HEADER_SIZE + record.itemsize * count].view(record)
+        self._demosaic_cached = lru_cache(maxsize=cache_size)(self._demosaic)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index) -> np.ndarray:
+        return self._demosaic_cached(index)
+
+    def raw(self, index) -> np.ndarray:
+        return self.records[index]["data"]
+
+    def meta(self, index) -> dict:
+        meta = self.records[index]["meta"]
+        return {name: meta[name].item() for name in FRAME_META_DTYPE.names}
+
+    def frames_of(self, camera: int) -> np.ndarray:
+        """
+            Record indices of one camera, in capture order
+        """
+        return np.flatnonzero(self.records["meta"]["camera"] == camera)
+
+    def _demosaic(self, index) -> np.ndarray:
+        raw = self.raw(index)
+        pixel_type = int(self.records[index]["meta"]["pixel_type"])
+        if pixel_type == PIXEL_TYPE_MONO8:
+            return np.array(raw)
+        return cv2.cvtColor(raw, DEMOSAIC_CODES[pixel_type])
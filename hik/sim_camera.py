@@ -0,0 +1,716 @@
+# sim_camera.py
+#
+# Simulated camera backend: the subset of MvCameraControl_class used by the capture path, backed by
+# synthetic chessboard frames instead of the MVS SDK. Select it with get_backend("sim"),
+# HikCameraGroup(..., backend="sim") or AUTOCAMCALIB_BACKEND=sim.
+#
+# The simulated rig behaves like the real one: a camera in software trigger mode exposes on
+# TriggerSoftware, and if StrobeEnable is set it triggers every camera whose TriggerSource is a line.
+# With TriggerMode Off a camera free-runs at AcquisitionFrameRate. A frame becomes available
+# latency_ms after its trigger. Width, Height and PixelFormat are fixed by SimCameraConfig.
+
+import time
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass
+from ctypes import (Structure, Union, POINTER, cast, c_ubyte, c_char, c_ushort, c_uint, c_int, c_int64,
+                    c_float, c_void_p, memmove, addressof, string_at)
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from hik.raw_store import (PIXEL_TYPE_MONO8, PIXEL_TYPE_BAYER_RG8, PIXEL_TYPE_BAYER_GR8, PIXEL_TYPE_BAYER_GB8,
+                           PIXEL_TYPE_BAYER_BG8, DEMOSAIC_CODES)
+
+
+# ---------------------------------------------------------------------------------------------------
+# constants, same values as the MVS SDK
+
+MV_OK = 0
+MV_E_HANDLE = 0x80000000
+MV_E_SUPPORT = 0x80000001
+MV_E_CALLORDER = 0x80000003
+MV_E_PARAMETER = 0x80000004
+MV_E_NODATA = 0x80000007
+MV_E_GC_RANGE = 0x80000102
+MV_E_GC_PROPERTY = 0x80000103
+MV_E_GC_ACCESS = 0x80000106
+
+MV_GIGE_DEVICE = 0x00000001
+MV_USB_DEVICE = 0x00000004
+MV_ACCESS_Exclusive = 1
+
+MV_TRIGGER_MODE_OFF = 0
+MV_TRIGGER_MODE_ON = 1
+MV_TRIGGER_SOURCE_SOFTWARE = 7
+MV_GrabStrategy_OneByOne = 0
+MV_GrabStrategy_LatestImagesOnly = 1
+MV_Image_Jpeg = 2
+
+PixelType_Gvsp_Mono8 = PIXEL_TYPE_MONO8
+PixelType_Gvsp_BayerGR8 = PIXEL_TYPE_BAYER_GR8
+PixelType_Gvsp_BayerRG8 = PIXEL_TYPE_BAYER_RG8
+PixelType_Gvsp_BayerGB8 = PIXEL_TYPE_BAYER_GB8
+PixelType_Gvsp_BayerBG8 = PIXEL_TYPE_BAYER_BG8
+PixelType_Gvsp_RGB8_Packed = 0x02180014
+PixelType_Gvsp_BGR8_Packed = 0x02180015
+
+PIXEL_FORMATS = {
+    "Mono8": PixelType_Gvsp_Mono8,
+    "BayerGR8": PixelType_Gvsp_BayerGR8,
+    "BayerRG8": PixelType_Gvsp_BayerRG8,
+    "BayerGB8": PixelType_Gvsp_BayerGB8,
+    "BayerBG8": PixelType_Gvsp_BayerBG8,
+    "RGB8Packed": PixelType_Gvsp_RGB8_Packed,
+}
+_BYTES_PER_PIXEL = {PixelType_Gvsp_RGB8_Packed: 3, PixelType_Gvsp_BGR8_Packed: 3}
+
+# integer values of the enumerations set with MV_CC_SetEnumValue
+_ENUM_VALUES = {
+    "TriggerMode": {"Off": MV_TRIGGER_MODE_OFF, "On": MV_TRIGGER_MODE_ON},
+    "TriggerSource": {"Line0": 0, "Line1": 1, "Line2": 2, "Line3": 3, "Counter0": 4,
+                      "Software": MV_TRIGGER_SOURCE_SOFTWARE, "FrequencyConverter": 8},
+    "TriggerSelector": {"FrameBurstStart": 6},
+    "PixelFormat": PIXEL_FORMATS,
+}
+
+# selector each selected feature depends on, as in the GenApi persistence files
+_SELECTED_BY = {
+    **{name: "TriggerSelector" for name in ("TriggerMode", "TriggerSource", "TriggerActivation", "TriggerDelay")},
+    **{name: "LineSelector" for name in ("LineMode", "LineSource", "LineInverter", "LineDebouncerTime",
+                                         "StrobeEnable", "StrobeLineDuration", "StrobeLineDelay")},
+}
+
+# (min, max, increment) of the float features the camera rounds or bounds, like the real sensors
+_FLOAT_LIMITS = {
+    "ExposureTime": (15.0, 9999500.0, 5.0),
+    "Gain": (0.0, 23.98, 0.01),
+}
+
+# device timestamp tick rate of the simulated cameras, and the spread of their oscillator error
+SIM_TICKS_PER_SECOND = 1_000_000_000
+SIM_CLOCK_PPM = 20.0
+# trigger line propagation from the master's strobe to the slaves
+SIM_LINE_DELAY_S = 2e-6
+# frame rate when free-running without AcquisitionFrameRateEnable
+SIM_MAX_FPS = 30.0
+# frames buffered per camera in MV_GrabStrategy_OneByOne
+SIM_BUFFER_COUNT = 8
+# prerendered noisy copies of the frame, delivered in turn; averaging more frames repeats the noise
+SIM_NOISE_VARIANTS = 8
+
+
+# ---------------------------------------------------------------------------------------------------
+# structs, with the fields the capture path uses
+
+class MV_GIGE_DEVICE_INFO(Structure):
+    _fields_ = [
+        ("nCurrentIp", c_uint),
+        ("chModelName", c_ubyte * 32),
+        ("chSerialNumber", c_ubyte * 16),
+        ("chUserDefinedName", c_ubyte * 16),
+    ]
+
+
+class MV_USB3_DEVICE_INFO(Structure):
+    _fields_ = [
+        ("chModelName", c_ubyte * 64),
+        ("chSerialNumber", c_ubyte * 64),
+        ("chUserDefinedName", c_ubyte * 64),
+    ]
+
+
+class _MV_SPECIAL_INFO(Union):
+    _fields_ = [
+        ("stGigEInfo", MV_GIGE_DEVICE_INFO),
+        ("stUsb3VInfo", MV_USB3_DEVICE_INFO),
+    ]
+
+
+class MV_CC_DEVICE_INFO(Structure):
+    _fields_ = [
+        ("nTLayerType", c_uint),
+        ("SpecialInfo", _MV_SPECIAL_INFO),
+    ]
+
+
+class MV_CC_DEVICE_INFO_LIST(Structure):
+    _fields_ = [
+        ("nDeviceNum", c_uint),
+        ("pDeviceInfo", POINTER(MV_CC_DEVICE_INFO) * 256),
+    ]
+
+
+class MV_FRAME_OUT_INFO_EX(Structure):
+    _fields_ = [
+        ("nWidth", c_ushort),
+        ("nHeight", c_ushort),
+        ("enPixelType", c_int),
+        ("nFrameNum", c_uint),
+        ("nDevTimeStampHigh", c_uint),
+        ("nDevTimeStampLow", c_uint),
+        ("nHostTimeStamp", c_int64),
+        ("nFrameLen", c_uint),
+        ("fExposureTime", c_float),
+        ("fGain", c_float),
+    ]
+
+
+class MV_FRAME_OUT(Structure):
+    _fields_ = [
+        ("pBufAddr", POINTER(c_ubyte)),
+        ("stFrameInfo", MV_FRAME_OUT_INFO_EX),
+    ]
+
+
+class MV_CC_PIXEL_CONVERT_PARAM(Structure):
+    _fields_ = [
+        ("nWidth", c_ushort),
+        ("nHeight", c_ushort),
+        ("enSrcPixelType", c_int),
+        ("pSrcData", POINTER(c_ubyte)),
+        ("nSrcDataLen", c_uint),
+        ("enDstPixelType", c_int),
+        ("pDstBuffer", POINTER(c_ubyte)),
+        ("nDstLen", c_uint),
+        ("nDstBufferSize", c_uint),
+    ]
+
+
+class MV_SAVE_IMAGE_TO_FILE_PARAM_EX(Structure):
+    _fields_ = [
+        ("nWidth", c_uint),
+        ("nHeight", c_uint),
+        ("enPixelType", c_int),
+        ("pData", POINTER(c_ubyte)),
+        ("nDataLen", c_uint),
+        ("enImageType", c_int),
+        ("pcImagePath", POINTER(c_char)),
+        ("nQuality", c_uint),
+        ("iMethodValue", c_int),
+    ]
+
+
+class MVCC_INTVALUE(Structure):
+    _fields_ = [("nCurValue", c_uint), ("nMax", c_uint), ("nMin", c_uint), ("nInc", c_uint)]
+
+
+class MVCC_FLOATVALUE(Structure):
+    _fields_ = [("fCurValue", c_float), ("fMax", c_float), ("fMin", c_float)]
+
+
+class MVCC_ENUMVALUE(Structure):
+    _fields_ = [("nCurValue", c_uint), ("nSupportedNum", c_uint), ("nSupportValue", c_uint * 64)]
+
+
+class MVCC_STRINGVALUE(Structure):
+    _fields_ = [("chCurValue", c_char * 256), ("nMaxLength", c_int64)]
+
+
+# ---------------------------------------------------------------------------------------------------
+# simulated rig
+
+@dataclass
+class SimCameraConfig:
+    user_name: str
+    serial_number: str = None
+    width: int = 2048
+    height: int = 1536
+    pixel_format: str = "BayerRG8"
+    latency_ms: float = 30.0        # trigger to frame available
+    noise_sigma: float = 2.0        # temporal sensor noise, DN
+    transport: str = "USB"
+    ip: str = None                  # GigE only
+
+    def __post_init__(self):
+        if self.pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"unsupported simulated pixel format: {self.pixel_format}")
+
+
+SIM_DEVICES = [
+    SimCameraConfig("left", "SIM00000001"),
+    SimCameraConfig("right", "SIM00000002"),
+]
+
+_lock = threading.Lock()
+_open_cameras = []
+# feature values of every simulated device, kept across close / open like a camera that stays powered
+_device_state = {}
+
+
+def configure(names=("left", "right"), **kwargs) -> list[SimCameraConfig]:
+    """
+        Replace the simulated devices, one per name, sharing the SimCameraConfig fields in kwargs
+
+        configure(["cam0", "cam1", "cam2", "cam3"], width=4032, height=3036, latency_ms=60)
+    """
+    with _lock:
+        SIM_DEVICES[:] = [SimCameraConfig(name, f"SIM{i + 1:08d}", **kwargs) for i, name in enumerate(names)]
+        _device_state.clear()
+    return SIM_DEVICES
+
+
+def _fill(chars, text: str):
+    data = text.encode("ascii")[:len(chars) - 1]
+    memmove(chars, data, len(data))
+
+
+def _chessboard(width, height, index) -> np.ndarray:
+    # RGB chessboard with a slight per-camera shift, so the views of a rig are not identical
+    square = max(min(width, height) // 12, 2)
+    shift = index * square // 4
+    y, x = np.ogrid[:height, :width]
+    board = (((x + shift) // square + y // square) % 2).astype(np.uint8) * 200 + 30
+    image = np.repeat(board[:, :, None], 3, axis=2)
+    image[..., 0] = np.clip(image[..., 0].astype(np.int16) + 10, 0, 255)
+    return image
+
+
+def _to_pixel_format(rgb: np.ndarray, pixel_type: int) -> np.ndarray:
+    if pixel_type == PixelType_Gvsp_RGB8_Packed:
+        return rgb
+    if pixel_type == PixelType_Gvsp_Mono8:
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    # mosaic: pick the channel of every pixel according to the 2x2 Bayer pattern
+    pattern = {PixelType_Gvsp_BayerRG8: "RGGB", PixelType_Gvsp_BayerGR8: "GRBG",
+               PixelType_Gvsp_BayerGB8: "GBRG", PixelType_Gvsp_BayerBG8: "BGGR"}[pixel_type]
+    channel = {"R": 0, "G": 1, "B": 2}
+    raw = np.empty(rgb.shape[:2], dtype=np.uint8)
+    for i, c in enumerate(pattern):
+        dy, dx = divmod(i, 2)
+        raw[dy::2, dx::2] = rgb[dy::2, dx::2, channel[c]]
+    return raw
+
+
+def _as_array(pointer, nbytes) -> np.ndarray:
+    return np.ctypeslib.as_array(cast(pointer, POINTER(c_ubyte)), shape=(nbytes,))
+
+
+class _SimFrame:
+    __slots__ = ("frame_num", "t_trigger", "t_ready", "exposure_us", "gain")
+
+    def __init__(self, frame_num, t_trigger, t_ready, exposure_us, gain):
+        self.frame_num = frame_num
+        self.t_trigger = t_trigger
+        self.t_ready = t_ready
+        self.exposure_us = exposure_us
+        self.gain = gain
+
+
+class MvCamera:
+    """
+        Simulated MvCamera, see the module docstring
+    """
+    def __init__(self):
+        self.config = None
+        self.index = -1
+        self._opened = False
+        self._grabbing = False
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._strategy = MV_GrabStrategy_OneByOne
+        self._frame_num = 0
+        self._buffers = []
+        self._free_run = None
+        self._clock_offset = 0
+        self._clock_rate = 1.0
+        self._values = {}       # {(name, selector): value}, in GenApi persistence order
+        self._types = {}        # {name: "int" | "float" | "bool" | "enum" | "string"}
+        self._depends = dict(_SELECTED_BY)  # {name: selector name}
+        self._selectors = {}                # {selector name: current value}
+        self._readonly = set()
+        self._last_selector = None
+
+    # ---- enumeration and connection ---------------------------------------------------------------
+
+    @staticmethod
+    def MV_CC_EnumDevices(nTLayerType, stDevList):
+        devices = [d for d in SIM_DEVICES
+                   if nTLayerType & (MV_GIGE_DEVICE if d.transport == "GigE" else MV_USB_DEVICE)]
+        # keep the infos alive as long as the list refers to them
+        stDevList._infos = infos = [MV_CC_DEVICE_INFO() for _ in devices]
+        stDevList.nDeviceNum = len(devices)
+        for i, (device, info) in enumerate(zip(devices, infos)):
+            if device.transport == "GigE":
+                info.nTLayerType = MV_GIGE_DEVICE
+                special = info.SpecialInfo.stGigEInfo
+                a, b, c, d = (int(part) for part in (device.ip or f"192.168.1.{10 + i}").split("."))
+                special.nCurrentIp = (a << 24) | (b << 16) | (c << 8) | d
+            else:
+                info.nTLayerType = MV_USB_DEVICE
+                special = info.SpecialInfo.stUsb3VInfo
+            _fill(special.chUserDefinedName, device.user_name)
+            _fill(special.chModelName, "SIM-CHESSBOARD")
+            _fill(special.chSerialNumber, device.serial_number)
+            stDevList.pDeviceInfo[i] = cast(addressof(info), POINTER(MV_CC_DEVICE_INFO))
+        return MV_OK
+
+    def MV_CC_CreateHandle(self, stDevInfo):
+        if stDevInfo.nTLayerType == MV_GIGE_DEVICE:
+            serial = bytes(stDevInfo.SpecialInfo.stGigEInfo.chSerialNumber).split(b"\0", 1)[0].decode()
+        else:
+            serial = bytes(stDevInfo.SpecialInfo.stUsb3VInfo.chSerialNumber).split(b"\0", 1)[0].decode()
+        for index, device in enumerate(SIM_DEVICES):
+            if device.serial_number == serial:
+                self.config = device
+                self.index = index
+                return MV_OK
+        return MV_E_PARAMETER
+
+    def MV_CC_OpenDevice(self, nAccessMode=MV_ACCESS_Exclusive, nSwitchoverKey=0):
+        if self.config is None:
+            return MV_E_HANDLE
+        with _lock:
+            if any(cam.config is self.config for cam in _open_cameras):
+                return MV_E_CALLORDER
+            _open_cameras.append(self)
+            state = _device_state.get(self.config.serial_number)
+        if state is None:
+            self._init_features()
+            state = (self._values, self._types, self._depends, self._selectors, self._readonly)
+            with _lock:
+                _device_state[self.config.serial_number] = state
+        self._values, self._types, self._depends, self._selectors, self._readonly = state
+        # every device clock starts at its own epoch and runs slightly fast or slow
+        self._clock_offset = random.randrange(1 << 40)
+        self._clock_rate = 1 + random.uniform(-SIM_CLOCK_PPM, SIM_CLOCK_PPM) * 1e-6
+        self._opened = True
+        return MV_OK
+
+    def MV_CC_CloseDevice(self):
+        if not self._opened:
+            return MV_E_CALLORDER
+        self.MV_CC_StopGrabbing()
+        with _lock:
+            _open_cameras.remove(self)
+        self._opened = False
+        return MV_OK
+
+    def MV_CC_DestroyHandle(self):
+        self.config = None
+        return MV_OK
+
+    def _init_features(self):
+        c = self.config
+        defaults = [
+            ("DeviceUserID", "string", c.user_name),
+            ("DeviceSerialNumber", "string", c.serial_number),
+            ("PixelFormat", "enum", c.pixel_format),
+            ("Width", "int", str(c.width)),
+            ("Height", "int", str(c.height)),
+            ("AcquisitionFrameRate", "float", "30"),
+            ("AcquisitionFrameRateEnable", "bool", "0"),
+            ("ExposureTime", "float", "80000"),
+            ("Gain", "float", "0"),
+            ("GevTimestampTickFrequency", "int", str(SIM_TICKS_PER_SECOND)),
+            ("StrobeEnable", "bool", "0"),
+            ("TriggerMode", "enum", "On"),
+            ("TriggerSource", "enum", "Software"),
+        ]
+        self._values.clear()
+        self._selectors = {"TriggerSelector": "FrameBurstStart", "LineSelector": "Line2"}
+        for name, kind, value in defaults:
+            self._types[name] = kind
+            self._values[self._key(name)] = value
+        self._readonly = {"DeviceSerialNumber", "PixelFormat", "Width", "Height", "GevTimestampTickFrequency"}
+
+    # ---- features -----------------------------------------------------------------------------------
+
+    def _key(self, name):
+        selector = self._depends.get(name)
+        if selector is None:
+            return name, None
+        return name, (selector, self._selectors.get(selector, ""))
+
+    def _get(self, name, kind):
+        if name.endswith("Selector") and name in self._selectors:
+            return self._selectors[name]
+        if self._types.get(name, kind) != kind:
+            return None
+        return self._values.get(self._key(name))
+
+    def _set(self, name, kind, value: str):
+        if not self._opened:
+            return MV_E_CALLORDER
+        if name.endswith("Selector"):
+            self._selectors[name] = value
+            self._last_selector = name
+            return MV_OK
+        last_selector, self._last_selector = self._last_selector, None
+        if name not in self._types and name not in self._depends and last_selector is not None:
+            # unknown feature written right after a selector depends on it, as in the persistence files
+            self._depends[name] = last_selector
+        known = self._types.setdefault(name, kind)
+        if known != kind:
+            return MV_E_GC_PROPERTY
+        if name in self._readonly:
+            return MV_E_GC_ACCESS
+        self._values[self._key(name)] = value
+        return MV_OK
+
+    def MV_CC_GetIntValue(self, strKey, stIntValue):
+        value = self._get(strKey, "int")
+        if value is None:
+            return MV_E_GC_PROPERTY
+        stIntValue.nCurValue = int(value)
+        return MV_OK
+
+    def MV_CC_SetIntValue(self, strKey, nValue):
+        return self._set(strKey, "int", str(int(nValue)))
+
+    def MV_CC_GetFloatValue(self, strKey, stFloatValue):
+        value = self._get(strKey, "float")
+        if value is None:
+            return MV_E_GC_PROPERTY
+        stFloatValue.fCurValue = float(value)
+        return MV_OK
+
+    def MV_CC_SetFloatValue(self, strKey, fValue):
+        fValue = float(fValue)
+        if strKey in _FLOAT_LIMITS:
+            low, high, inc = _FLOAT_LIMITS[strKey]
+            if not low <= fValue <= high:
+                return MV_E_GC_RANGE
+            fValue = low + round((fValue - low) / inc) * inc
+        return self._set(strKey, "float", f"{fValue:g}")
+
+    def MV_CC_GetBoolValue(self, strKey, stBoolValue):
+        value = self._get(strKey, "bool")
+        if value is None:
+            return MV_E_GC_PROPERTY
+        stBoolValue.value = value == "1"     # c_bool
+        return MV_OK
+
+    def MV_CC_SetBoolValue(self, strKey, bValue):
+        return self._set(strKey, "bool", "1" if bValue else "0")
+
+    def MV_CC_GetEnumValue(self, strKey, stEnumValue):
+        value = self._get(strKey, "enum")
+        if value is None:
+            return MV_E_GC_PROPERTY
+        values = _ENUM_VALUES.get(strKey, {})
+        stEnumValue.nCurValue = values[value] if value in values else (int(value) if value.isdigit() else 0)
+        return MV_OK
+
+    def MV_CC_SetEnumValue(self, strKey, nValue):
+        names = {v: k for k, v in _ENUM_VALUES.get(strKey, {}).items()}
+        return self._set(strKey, "enum", names.get(int(nValue), str(int(nValue))))
+
+    def MV_CC_SetEnumValueByString(self, strKey, strValue):
+        return self._set(strKey, "enum", strValue)
+
+    def MV_CC_GetStringValue(self, strKey, stStringValue):
+        value = self._get(strKey, "string")
+        if value is None:
+            return MV_E_GC_PROPERTY
+        stStringValue.chCurValue = value.encode("ascii")
+        return MV_OK
+
+    def MV_CC_SetStringValue(self, strKey, strValue):
+        return self._set(strKey, "string", strValue)
+
+    def MV_CC_FeatureLoad(self, strFileName):
+        from hik.feature_config import FeatureFile
+        if not self._opened:
+            return MV_E_CALLORDER
+        for setting in FeatureFile.parse(strFileName).settings.values():
+            if setting.name in self._readonly:
+                continue
+            if setting.selector is not None:
+                if self._depends.get(setting.name) != setting.selector[0]:
+                    self._values.pop(self._key(setting.name), None)
+                    self._depends[setting.name] = setting.selector[0]
+                self._selectors[setting.selector[0]] = setting.selector[1]
+            self._types.setdefault(setting.name, _infer_type(setting.value))
+            self._values[self._key(setting.name)] = setting.value
+        return MV_OK
+
+    def MV_CC_FeatureSave(self, strFileName):
+        if not self._opened:
+            return MV_E_CALLORDER
+        lines = ["# simulated camera persistence file"]
+        # unselected features first, so none of them follows a selector line
+        for (name, selector), value in sorted(self._values.items(), key=lambda item: item[0][1] is not None):
+            if selector is not None:
+                lines.append(f"{selector[0]}\t{selector[1]}")
+            lines.append(f"{name}\t{value}")
+        for name, value in self._selectors.items():
+            lines.append(f"{name}\t{value}")
+        with open(strFileName, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return MV_OK
+
+    def _value(self, name, default=None):
+        return self._values.get(self._key(name), default)
+
+    def _any_value(self, name, value) -> bool:
+        # whether the feature has this value for any selector value, e.g. a strobe on any line
+        return any(v == value for (n, _), v in self._values.items() if n == name)
+
+    # ---- acquisition --------------------------------------------------------------------------------
+
+    @property
+    def _pixel_type(self):
+        return PIXEL_FORMATS[self.config.pixel_format]
+
+    @property
+    def _frame_len(self):
+        return self.config.width * self.config.height * _BYTES_PER_PIXEL.get(self._pixel_type, 1)
+
+    def MV_CC_StartGrabbing(self):
+        if not self._opened:
+            return MV_E_CALLORDER
+        if self._grabbing:
+            return MV_OK
+        c = self.config
+        frame = _to_pixel_format(_chessboard(c.width, c.height, self.index), self._pixel_type).reshape(-1)
+        variants = [frame]
+        if c.noise_sigma > 0:
+            # one noise field, read at a different offset per variant so every pixel gets independent samples
+            rng = np.random.default_rng(self.index)
+            noise = rng.standard_normal(frame.size + SIM_NOISE_VARIANTS * 7919, dtype=np.float32) * c.noise_sigma
+            noise = np.rint(noise).astype(np.int16)
+            variants = [np.clip(frame + noise[k * 7919:k * 7919 + frame.size], 0, 255).astype(np.uint8)
+                        for k in range(SIM_NOISE_VARIANTS)]
+        self._buffers = []
+        for variant in variants:
+            buffer = (c_ubyte * self._frame_len)()
+            memmove(buffer, variant.ctypes.data, self._frame_len)
+            self._buffers.append(buffer)
+        self._grabbing = True
+        self._free_run = threading.Thread(target=self._free_run_loop, name=f"SimCam-{c.user_name}", daemon=True)
+        self._free_run.start()
+        return MV_OK
+
+    def MV_CC_StopGrabbing(self):
+        if not self._grabbing:
+            return MV_OK
+        with self._cond:
+            self._grabbing = False
+            self._queue.clear()
+            self._cond.notify_all()
+        self._free_run.join()
+        return MV_OK
+
+    def MV_CC_SetGrabStrategy(self, enGrabStrategy):
+        self._strategy = enGrabStrategy
+        return MV_OK
+
+    def MV_CC_ClearImageBuffer(self):
+        with self._cond:
+            self._queue.clear()
+        return MV_OK
+
+    def MV_CC_SetCommandValue(self, strKey):
+        if strKey != "TriggerSoftware":
+            return MV_E_SUPPORT
+        if not self._grabbing or self._value("TriggerMode") != "On" or self._value("TriggerSource") != "Software":
+            return MV_E_CALLORDER
+        self._expose(time.perf_counter())
+        return MV_OK
+
+    def _free_run_loop(self):
+        while self._grabbing:
+            if self._value("TriggerMode") == "Off":
+                self._expose(time.perf_counter())
+                fps = float(self._value("AcquisitionFrameRate", SIM_MAX_FPS)) \
+                    if self._value("AcquisitionFrameRateEnable") == "1" else SIM_MAX_FPS
+                period = 1 / max(fps, 0.1)
+            else:
+                period = 0.01
+            with self._cond:
+                self._cond.wait_for(lambda: not self._grabbing, period)
+
+    def _expose(self, t_trigger):
+        # the strobe of the exposing camera triggers the cameras listening on the trigger line
+        if self._any_value("StrobeEnable", "1"):
+            with _lock:
+                listeners = [cam for cam in _open_cameras if cam is not self and cam._grabbing and
+                             cam._value("TriggerMode") == "On" and
+                             str(cam._value("TriggerSource", "")).startswith("Line")]
+            for cam in listeners:
+                cam._expose(t_trigger + SIM_LINE_DELAY_S)
+        # exposure and gain are latched at the trigger, the frame is read out after the exposure
+        exposure_us = float(self._value("ExposureTime", 0))
+        gain = float(self._value("Gain", 0))
+        timer = threading.Timer(self.config.latency_ms / 1000 + exposure_us / 1e6, self._frame_ready,
+                                args=(t_trigger, exposure_us, gain))
+        timer.daemon = True
+        timer.start()
+
+    def _frame_ready(self, t_trigger, exposure_us=0.0, gain=0.0):
+        with self._cond:
+            if not self._grabbing:
+                return
+            self._frame_num += 1
+            self._queue.append(_SimFrame(self._frame_num, t_trigger, time.perf_counter(), exposure_us, gain))
+            limit = 1 if self._strategy == MV_GrabStrategy_LatestImagesOnly else SIM_BUFFER_COUNT
+            while len(self._queue) > limit:
+                self._queue.popleft()
+            self._cond.notify_all()
+
+    def MV_CC_GetImageBuffer(self, stOutFrame, nMsec):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._queue or not self._grabbing, nMsec / 1000):
+                return MV_E_NODATA
+            if not self._queue:
+                return MV_E_NODATA
+            frame = self._queue.popleft()
+
+        dev_ticks = self._clock_offset + int(frame.t_trigger * self._clock_rate * SIM_TICKS_PER_SECOND)
+        info = stOutFrame.stFrameInfo
+        info.nWidth = self.config.width
+        info.nHeight = self.config.height
+        info.enPixelType = self._pixel_type
+        info.nFrameNum = frame.frame_num
+        info.nDevTimeStampHigh = (dev_ticks >> 32) & 0xffffffff
+        info.nDevTimeStampLow = dev_ticks & 0xffffffff
+        info.nHostTimeStamp = int((time.time() - (time.perf_counter() - frame.t_ready)) * 1000)
+        info.nFrameLen = self._frame_len
+        info.fExposureTime = frame.exposure_us
+        info.fGain = frame.gain
+        buffer = self._buffers[frame.frame_num % len(self._buffers)]
+        stOutFrame.pBufAddr = cast(buffer, POINTER(c_ubyte))
+        return MV_OK
+
+    def MV_CC_FreeImageBuffer(self, stOutFrame):
+        return MV_OK
+
+    def MV_CC_ConvertPixelType(self, stConvertParam):
+        p = stConvertParam
+        width, height = p.nWidth, p.nHeight
+        if p.enDstPixelType != PixelType_Gvsp_RGB8_Packed or p.nDstBufferSize < width * height * 3:
+            return MV_E_PARAMETER
+        dst = _as_array(p.pDstBuffer, width * height * 3).reshape(height, width, 3)
+        if p.enSrcPixelType == PixelType_Gvsp_RGB8_Packed:
+            dst[...] = _as_array(p.pSrcData, width * height * 3).reshape(height, width, 3)
+        elif p.enSrcPixelType == PixelType_Gvsp_Mono8:
+            cv2.cvtColor(_as_array(p.pSrcData, width * height).reshape(height, width), cv2.COLOR_GRAY2RGB, dst=dst)
+        elif p.enSrcPixelType in DEMOSAIC_CODES:
+            cv2.cvtColor(_as_array(p.pSrcData, width * height).reshape(height, width),
+                         DEMOSAIC_CODES[p.enSrcPixelType], dst=dst)
+        else:
+            return MV_E_SUPPORT
+        p.nDstLen = width * height * 3
+        return MV_OK
+
+    def MV_CC_SaveImageToFileEx(self, stSaveParam):
+        p = stSaveParam
+        if p.enPixelType != PixelType_Gvsp_RGB8_Packed:
+            return MV_E_SUPPORT
+        rgb = _as_array(p.pData, p.nWidth * p.nHeight * 3).reshape(p.nHeight, p.nWidth, 3)
+        path = string_at(cast(p.pcImagePath, c_void_p).value).decode()
+        ok = cv2.imwrite(path, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, int(p.nQuality)])
+        return MV_OK if ok else MV_E_PARAMETER
+
+
+def _infer_type(value: str) -> str:
+    try:
+        float(value)
+    except ValueError:
+        return "enum"
+    if value in ("0", "1"):
+        return "bool"
+    return "float" if "." in value else "int"
@@ -0,0 +1,150 @@
+# sync_monitor.py
+#
+# Exposure-start skew between the cameras of a hardware-synchronized group, from the device timestamps.
+#
+# Every camera stamps frames with its own free-running clock (nDevTimeStampHigh/Low), so device times of
+# different cameras cannot be compared directly. Each camera's clock is mapped onto the host clock from
+# the offsets (host - device) of its recent frames: the host sees a frame after the exposure start plus
+# a delivery delay, so the offsets lie above the delay-free offset by the delivery delay, whose minimum
+# is about equal for cameras of the same model and transport. The device oscillators run tens of ppm
+# off the host clock, so over a window of triggers tens of seconds apart the delay-free offset is a
+# line, not a constant: it is estimated as the lower envelope of the samples, the line below all of
+# them that lies highest at their mean device time (a lower convex hull edge), whose slope is the
+# clock rate difference.
+
+import math
+from collections import deque
+
+from loguru import logger
+
+
+# device timestamp ticks per second, unless the camera reports GevTimestampTickFrequency
+DEVICE_TICKS_PER_SECOND = 1_000_000_000
+# pairs whose exposure starts differ by more than this are out of sync
+SYNC_TOLERANCE_MS = 1.0
+# frames per camera the clock offset line is fitted over
+OFFSET_WINDOW = 16
+# frames per camera before the offset estimate is trusted to reject sets
+MIN_OFFSET_SAMPLES = 4
+# fitted clock rate differences beyond this are delivery jitter over a short window, not drift
+MAX_CLOCK_DRIFT_PPM = 500
+
+
+def _cross(o, a, b) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def envelope_offset(samples, device_s: float) -> float:
+    """
+        Delay-free clock offset at device time device_s from (device time, host - device) samples
+
+    The offset line is the lower convex hull edge of the samples spanning their mean device time; it
+    falls back to the minimum offset while the samples cover no time span or the fitted rate exceeds
+    MAX_CLOCK_DRIFT_PPM.
+    """
+    points = sorted(samples)
+    lowest = min(offset for _, offset in points)
+    if len(points) < 2 or points[-1][0] <= points[0][0]:
+        return lowest
+
+    hull = []
+    for point in points:
+        while len(hull) >= 2 and _cross(hull[-2], hull[-1], point) <= 0:
+            hull.pop()
+        hull.append(point)
+    mean_s = sum(t for t, _ in points) / len(points)
+    (t0, o0), (t1, o1) = next((a, b) for a, b in zip(hull, hull[1:]) if b[0] >= mean_s)
+    rate = (o1 - o0) / (t1 - t0)
+    if abs(rate) > MAX_CLOCK_DRIFT_PPM * 1e-6:
+        return lowest
+    return o0 + rate * (device_s - t0)
+
+
+class SyncMonitor:
+    """
+        Maps every frame's device timestamp onto the host clock and measures the exposure-start spread of
+    each frame set, with running statistics.
+
+    ``measure`` stores on the set:
+        exposure_starts: list of float, exposure start of every frame on the host clock, s
+        in_sync:         bool, spread within tolerance_ms
+    The host time of a frame is CapturedFrame.arrival (perf_counter when the SDK returned the buffer),
+    or nHostTimeStamp when the frame has none.
+    """
+    def __init__(self, n_views: int, tolerance_ms: float = SYNC_TOLERANCE_MS,
+                 ticks_per_second: float = DEVICE_TICKS_PER_SECOND, window: int = OFFSET_WINDOW):
+        self.n_views = n_views
+        self.tolerance_ms = tolerance_ms
+        self.window = window
+        self.ticks_per_second = [float(ticks_per_second)] * n_views
+        self._offsets = [deque(maxlen=window) for _ in range(n_views)]
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.count = 0
+        self.flagged = 0
+        self.last_skew_ms = None
+        self.max_spread_ms = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def reset(self):
+        """
+            Forget the clock offsets and statistics, e.g. after the cameras were reopened
+        """
+        for offsets in self._offsets:
+            offsets.clear()
+        self._reset_stats()
+
+    def set_tick_rate(self, camera: int, ticks_per_second: float):
+        self.ticks_per_second[camera] = float(ticks_per_second)
+        self._offsets[camera].clear()
+
+    @property
+    def calibrated(self) -> bool:
+        return all(len(offsets) >= MIN_OFFSET_SAMPLES for offsets in self._offsets)
+
+    def _host_time(self, frame) -> float:
+        return frame.arrival if frame.arrival else frame.host_timestamp / 1000
+
+    def measure(self, frame_set) -> bool:
+        """
+            Update the clock offsets with the frames of a set and return whether the set is in sync
+        """
+        starts = []
+        for frame in frame_set.frames:
+            device_s = frame.dev_timestamp / self.ticks_per_second[frame.camera]
+            samples = self._offsets[frame.camera]
+            samples.append((device_s, self._host_time(frame) - device_s))
+            starts.append(device_s + envelope_offset(samples, device_s))
+        frame_set.exposure_starts = starts
+
+        skew_ms = (starts[0] - starts[-1]) * 1e3
+        spread_ms = (max(starts) - min(starts)) * 1e3
+        frame_set.in_sync = spread_ms <= self.tolerance_ms
+
+        self.count += 1
+        delta = skew_ms - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (skew_ms - self._mean)
+        self.last_skew_ms = skew_ms
+        self.max_spread_ms = max(self.max_spread_ms, spread_ms)
+        if not frame_set.in_sync:
+            self.flagged += 1
+            logger.warning(f"frame set seq[{frame_set.seq}] out of sync: exposure starts spread {spread_ms:.3f} ms "
+                           f"> {self.tolerance_ms} ms" + ("" if self.calibrated else " (clock offsets still settling)"))
+        return frame_set.in_sync
+
+    def stats(self) -> dict:
+        """
+            Running statistics of the signed skew (first camera minus last camera), ms
+        """
+        return {
+            "sets": self.count,
+            "flagged": self.flagged,
+            "mean_skew_ms": self._mean,
+            "std_skew_ms": math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0,
+            "last_skew_ms": self.last_skew_ms,
+            "max_spread_ms": self.max_spread_ms,
+            "tolerance_ms": self.tolerance_ms,
+        }
@@ -1,49 +1,52 @@
-
 def load_hik_sdk():
+    """
+        Put the MvImport directory of the installed MVS SDK on sys.path and import MvCameraControl_class.
+
+    Raises:
+    --------------------
+        ImportError: the SDK is not installed where MVCAM_SDK_PATH / MVCAM_COMMON_RUNENV point to,
+                     or its python bindings failed to import
+    """
     import os
     import sys
     import platform
+    import importlib
     from pathlib import Path
 
     if platform.system() == 'Linux':
         MVS_PATH = os.getenv('MVCAM_SDK_PATH')
         if platform.processor() == 'aarch64':
-            MV_IMPORT_PATH = Path(MVS_PATH) / "Samples/aarch64/Python/MvImport"
+            MV_IMPORT_SUBDIR = "Samples/aarch64/Python/MvImport"
         else:
-            MV_IMPORT_PATH = Path(MVS_PATH) / "Samples/64/Python/MvImport"
+            MV_IMPORT_SUBDIR = "Samples/64/Python/MvImport"
     elif platform.system() == 'Windows':
         MVS_PATH = os.getenv('MVCAM_COMMON_RUNENV')
-        MV_IMPORT_PATH = Path(MVS_PATH) / "Samples/Python/MvImport"
+        MV_IMPORT_SUBDIR = "Samples/Python/MvImport"
+    else:
+        raise ImportError(f"MVS SDK is not available on {platform.system()}")
 
+    if MVS_PATH is None:
+        raise ImportError("MVS SDK path not set, install the MVS SDK or set MVCAM_SDK_PATH / MVCAM_COMMON_RUNENV")
+    MV_IMPORT_PATH = Path(MVS_PATH) / MV_IMPORT_SUBDIR
     if not MV_IMPORT_PATH.exists():
-        print(f"MV_IMPORT_PATH not found: {MV_IMPORT_PATH}")
-        sys.exit()
-
-    sys.path.append(str(MV_IMPORT_PATH))
+        raise ImportError(f"MV_IMPORT_PATH not found: {MV_IMPORT_PATH}")
 
-    try:
-        import MvCameraControl_class
-        print(f"MvCameraControl_class imported successfully from {MV_IMPORT_PATH}")
-    except Exception as e:
-        print(f"Error importing MvCameraControl_class: {e}")
-        sys.exit()
+    if str(MV_IMPORT_PATH) not in sys.path:
+        sys.path.append(str(MV_IMPORT_PATH))
+    return importlib.import_module("MvCameraControl_class")
 
 
 # 将二进制的影像数据转换成numpy的矩阵，方便后处理
-def buffer2numpy(data, nWidth, nHeight):
-    import numpy as np
-    data_ = np.frombuffer(data, count=int(nWidth * nHeight * 3), dtype=np.uint8, offset=0)
-    data_r = data_[0:nWidth * nHeight * 3:3]
-    data_g = data_[1:nWidth * nHeight * 3:3]
-    data_b = data_[2:nWidth * nHeight * 3:3]
-
-    data_r_arr = data_r.reshape(nHeight, nWidth)
-    data_g_arr = data_g.reshape(nHeight, nWidth)
-    data_b_arr = data_b.reshape(nHeight, nWidth)
-    numArray = np.zeros([nHeight, nWidth, 3], "uint8")
-
-    numArray[:, :, 0] = data_r_arr
-    numArray[:, :, 1] = data_g_arr
-    numArray[:, :, 2] = data_b_arr
-    return numArray
+def buffer2numpy(data, nWidth, nHeight, nChannels=3):
+    """
+        Wrap a packed 8-bit image buffer as a (H, W, C) numpy array without copying.
 
+    The returned array is a view that keeps ``data`` alive, so the buffer must not be
+    reused for another frame while the array is still referenced.
+    """
+    import numpy as np
+    count = int(nWidth * nHeight * nChannels)
+    data_ = np.frombuffer(data, count=count, dtype=np.uint8, offset=0)
+    if nChannels == 1:
+        return data_.reshape(nHeight, nWidth)
+    return data_.reshape(nHeight, nWidth, nChannels)
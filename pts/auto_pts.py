@@ -1,17 +1,44 @@
-from .pts_controller import PTSController
+from .pts_controller import PTSController, _angle_error
 import numpy as np
-import time
 from loguru import logger
 
+
+SCAN_ORDERS = ("raster", "serpentine", "hilbert", "tour")
+DEFAULT_SCAN_ORDER = "raster"   # 与已有扫描的拍摄顺序和文件序号一致; "auto" 选择预计移动时间最短的顺序
+# 速度模型: 两轴同时运动, 一次移动耗时 max(|dpan| / v_pan, |dtilt| / v_tilt)
+PAN_SPEED_DEG_S = 20.0          # 平移速度估计（度/秒）
+TILT_SPEED_DEG_S = 10.0         # 倾斜速度估计（度/秒）
+
+
+def _hilbert_d2xy(bits, d):
+    """Hilbert 曲线上第 d 个点在 2^bits x 2^bits 网格中的坐标"""
+    x = y = 0
+    s = 1
+    while s < (1 << bits):
+        rx = 1 & (d // 2)
+        ry = 1 & (d ^ rx)
+        if ry == 0:
+            if rx == 1:
+                x, y = s - 1 - x, s - 1 - y
+            x, y = y, x
+        x += s * rx
+        y += s * ry
+        d //= 4
+        s *= 2
+    return x, y
+
+
 class PTSPositionGenerator:
-    def __init__(self, center_pan=90, center_tilt=30, h_fov=60, v_fov=40, h_count=9, v_count=9):
+    def __init__(self, center_pan=90, center_tilt=30, h_fov=60, v_fov=40, h_count=9, v_count=9,
+                 pan_speed=PAN_SPEED_DEG_S, tilt_speed=TILT_SPEED_DEG_S):
         self.center_pan = center_pan
         self.center_tilt = center_tilt
         self.h_fov = h_fov
         self.v_fov = v_fov
         self.h_count = h_count
         self.v_count = v_count
-
+        self.pan_speed = pan_speed
+        self.tilt_speed = tilt_speed
     def update_params(self, center_pan=None, center_tilt=None, h_fov=None, v_fov=None, h_count=None, v_count=None):
         if center_pan is not None:
             self.center_pan = center_pan
@@ -40,41 +67,117 @@ class PTSPositionGenerator:
     def bottom_right(self):
         return [self.center_pan + self.h_fov/2, self.center_tilt + self.v_fov/2]
 
-    def generate_grid_positions(self):
+    def generate_grid_positions(self, order=DEFAULT_SCAN_ORDER, times=None):
         """
         在给定视场角范围内生成均匀分布的云台位置
-        
+
+        参数:
+            order: 扫描顺序
+                raster      逐行, 每行都从同一侧开始
+                serpentine  逐行往返
+                hilbert     Hilbert 曲线
+                tour        最近邻路径再经 2-opt 优化, 以速度模型的移动时间为距离
+                auto        预计移动时间最短的顺序
+            times: auto 时使用的 predict_travel_times() 结果, None 时在此计算
+
         返回:
             positions: 包含[pan, tilt]坐标的列表
         """
-        # 计算网格大小
-        grid_h = self.h_count 
-        grid_v = self.v_count
-        
+        if order == "auto":
+            if times is None:
+                times = self.predict_travel_times()
+            order = min(times, key=times.get)
+            logger.info(f"扫描顺序: {order}, 预计移动时间 {times[order]:.1f}s")
+        return [self._wrap(position) for position in self._ordered_positions(order)]
+
+    def _grid(self):
         # 计算位置范围
         pan_min = self.center_pan - self.h_fov/2
         pan_max = self.center_pan + self.h_fov/2
         tilt_min = self.center_tilt - self.v_fov/2
         tilt_max = self.center_tilt + self.v_fov/2
-        
+
         # 生成网格点
-        pan_positions = np.linspace(pan_min, pan_max, grid_h)
-        tilt_positions = np.linspace(tilt_min, tilt_max, grid_v)
-        
-        # 创建位置列表
-        positions = []
-        for tilt in tilt_positions:
-            for pan in pan_positions:
-                # 确保pan角度在0-359范围内
-                pan = pan % 360
-                # 确保tilt角度在0-180范围内
-                tilt = np.clip(tilt, 0, 180)
-                positions.append([pan, tilt])
-                
-        return positions
-
-
-def scan_positions(h_fov: float = 40, v_fov: float = 40, h_count: int = 9, v_count: int = 9, port: str="COM4"):
+        pan_positions = np.linspace(pan_min, pan_max, self.h_count)
+        tilt_positions = np.linspace(tilt_min, tilt_max, self.v_count)
+        return pan_positions, tilt_positions
+
+    def _wrap(self, position):
+        pan, tilt = position
+        # 确保pan角度在0-359范围内, tilt角度在0-180范围内
+        return [float(pan % 360), float(np.clip(tilt, 0, 180))]
+
+    def _ordered_positions(self, order):
+        pan_positions, tilt_positions = self._grid()
+        cells = [(row, col) for row in range(self.v_count) for col in range(self.h_count)]
+        if order == "raster":
+            pass
+        elif order == "serpentine":
+            cells = [(row, col if row % 2 == 0 else self.h_count - 1 - col) for row, col in cells]
+        elif order == "hilbert":
+            bits = max(1, int(np.ceil(np.log2(max(self.h_count, self.v_count)))))
+            curve = [_hilbert_d2xy(bits, d) for d in range(1 << (2 * bits))]
+            cells = [(row, col) for col, row in curve if row < self.v_count and col < self.h_count]
+        elif order == "tour":
+            positions = [[pan_positions[col], tilt_positions[row]] for row, col in cells]
+            return [positions[i] for i in self._tour(positions, self._ordered_positions("serpentine"))]
+        else:
+            raise ValueError(f"未知的扫描顺序: {order}, 可选 {SCAN_ORDERS}")
+        return [[pan_positions[col], tilt_positions[row]] for row, col in cells]
+
+    def _tour(self, positions, serpentine):
+        """
+        从第一个位置出发的最近邻路径和逐行往返路径分别经 2-opt 优化, 返回较短者的位置索引
+        """
+        n = len(positions)
+        times = [[self.move_time(a, b) for b in positions] for a in positions]
+
+        nearest_neighbor = [0]
+        left = set(range(1, n))
+        while left:
+            nearest = min(left, key=lambda j: times[nearest_neighbor[-1]][j])
+            nearest_neighbor.append(nearest)
+            left.remove(nearest)
+        index = {tuple(p): i for i, p in enumerate(positions)}
+        tours = [self._two_opt(nearest_neighbor, times), self._two_opt([index[tuple(p)] for p in serpentine], times)]
+        return min(tours, key=lambda tour: sum(times[a][b] for a, b in zip(tour, tour[1:])))
+
+    def _two_opt(self, tour, times):
+        n = len(tour)
+        # 2-opt: 翻转 tour[i..j], 以 (i-1, j), (i, j+1) 代替 (i-1, i), (j, j+1); 起点固定, 终点开放
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, n - 1):
+                for j in range(i + 1, n):
+                    a, b, c = tour[i - 1], tour[i], tour[j]
+                    delta = times[a][c] - times[a][b]
+                    if j + 1 < n:
+                        d = tour[j + 1]
+                        delta += times[b][d] - times[c][d]
+                    if delta < -1e-9:
+                        tour[i:j + 1] = tour[i:j + 1][::-1]
+                        improved = True
+        return tour
+
+    def move_time(self, a, b):
+        """按速度模型估计从位置 a 到位置 b 的移动时间（秒）"""
+        return float(max(abs(_angle_error(b[0], a[0])) / self.pan_speed, abs(b[1] - a[1]) / self.tilt_speed))
+
+    def travel_time(self, positions):
+        """按顺序经过所有位置的预计移动时间（秒）"""
+        return sum(self.move_time(a, b) for a, b in zip(positions, positions[1:]))
+
+    def predict_travel_times(self):
+        """
+        返回:
+            dict: {扫描顺序: 预计移动时间（秒）}
+        """
+        return {order: self.travel_time(self._ordered_positions(order)) for order in SCAN_ORDERS}
+
+
+def scan_positions(h_fov: float = 40, v_fov: float = 40, h_count: int = 9, v_count: int = 9, port: str="COM4",
+                   order: str = DEFAULT_SCAN_ORDER):
     """
     生成器函数，用于控制云台按网格扫描位置
     
@@ -84,6 +187,7 @@ def scan_positions(h_fov: float = 40, v_fov: float = 40, h_count: int = 9, v_cou
         h_count: 水平网格点数
         v_count: 垂直网格点数
         port: 串口端口
+        order: 扫描顺序, 见 PTSPositionGenerator.generate_grid_positions
         
     yields:
         dict: 包含当前位置信息的字典
@@ -91,6 +195,7 @@ def scan_positions(h_fov: float = 40, v_fov: float = 40, h_count: int = 9, v_cou
             - actual: [pan, tilt] 实际位置
             - success: bool 是否成功到达位置
             - index: int 当前位置索引
+            - settle_s: float 从发出命令到停稳的时间（秒）
     """
     try:
         controller = PTSController(port=port)
@@ -105,7 +210,11 @@ def scan_positions(h_fov: float = 40, v_fov: float = 40, h_count: int = 9, v_cou
             h_count=h_count,
             v_count=v_count
         )
-        positions = position_generator.generate_grid_positions()
+        # 只在自动选择顺序时预测, 结果传给 generate_grid_positions, 不再重复计算
+        times = position_generator.predict_travel_times() if order == "auto" else None
+        if times is not None:
+            logger.info("预计移动时间: " + ", ".join(f"{name} {t:.1f}s" for name, t in times.items()))
+        positions = position_generator.generate_grid_positions(order, times)
         
         logger.info(f"已生成 {len(positions)} 个位置点")
         logger.info("开始移动云台...")
@@ -118,15 +227,17 @@ def scan_positions(h_fov: float = 40, v_fov: float = 40, h_count: int = 9, v_cou
                 'target': [pan, tilt],
                 'actual': None,
                 'success': False,
-                'index': i
+                'index': i,
+                'settle_s': None,
             }
             
-            # 设置云台位置并等待到达目标位置
+            # 设置云台位置并等待到达目标位置, 返回时云台已停稳
             ret = controller.goto_position_blocked(pan, tilt)
-            time.sleep(0.5)
+            settle = controller.last_settle
+            result['settle_s'] = settle['time_s']
 
             if ret:
-                actual_pan, actual_tilt = controller.get_current_pose()
+                actual_pan, actual_tilt = settle['pan'], settle['tilt']
                 if actual_pan is not None and actual_tilt is not None:
                     result['actual'] = [actual_pan, actual_tilt]
                     result['success'] = True
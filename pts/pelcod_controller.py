@@ -1,65 +1,202 @@
 import serial
 import time
+import queue
+import threading
+from concurrent.futures import Future
 from loguru import logger
 
 
+PELCOD_SYNC = 0xFF          # 帧头
+PELCOD_FRAME_LEN = 7        # FF addr cmd1 cmd2 data1 data2 checksum
+RESPONSE_TIMEOUT_S = 1.0    # 等待一帧响应的最长时间
+COMMAND_GAP_S = 0.02        # 一条命令发送完毕后留给云台处理的时间
+BITS_PER_BYTE = 10          # 1 起始位 + 8 数据位 + 1 停止位
+
+
+def _then(future, fn) -> Future:
+    """Future of fn(result of future)"""
+    result = Future()
+
+    def _done(f):
+        try:
+            result.set_result(fn(f.result()))
+        except Exception as e:
+            result.set_exception(e)
+    future.add_done_callback(_done)
+    return result
+
+
 class PelcoDController:
-    def __init__(self, port='COM4', address=0x01):
+    """
+        Pelco-D over a serial port, owned by one I/O thread.
+
+    Commands are queued and sent in order; after each command the thread waits for its wire time at
+    the port's baudrate plus COMMAND_GAP_S, and after each query for the reply, so requests never
+    overlap on the half-duplex line. ``_send_command`` returns at once, ``_submit_query`` returns a
+    Future of the reply so several queries can be queued before waiting on any of them.
+    """
+    def __init__(self, port='COM4', address=0x01, response_timeout=RESPONSE_TIMEOUT_S, command_gap=COMMAND_GAP_S):
         self.serial = serial.Serial(
             port=port,
             baudrate=2400,
             bytesize=8,
             parity=serial.PARITY_NONE,
             stopbits=1,
-            timeout=1,
+            timeout=response_timeout,
         )
         self.address = address
+        self.response_timeout = response_timeout
+        self.command_gap = command_gap
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._io_worker, name=f"PelcoD-{port}", daemon=True)
+        self._thread.start()
 
     def _calculate_checksum(self, command):
-        return sum(command[1:6]) % 256
+        """校验和: 除帧头外所有字节之和, command 不含校验和"""
+        return sum(command[1:]) % 256
+
+    def _frame(self, command):
+        return bytes(command) + bytes([self._calculate_checksum(command)])
+
+    def _submit(self, frame, response=None, reply_len=PELCOD_FRAME_LEN, timeout=None) -> Future:
+        """
+            Queue a frame for the I/O thread
 
-    def _send_command(self, command):
-        """发送命令"""
-        self.serial.reset_input_buffer()
-        self.serial.reset_output_buffer()
+        Args:
+        --------------------
+            frame: bytes, complete frame including the checksum
+            response: int, cmd2 of the expected reply, None for commands without reply
+            reply_len: int, length of the reply frame
+            timeout: float, seconds to wait for the reply, None for response_timeout
 
-        # 发送新命令
-        checksum = self._calculate_checksum(command)
-        command.append(checksum)
-        self.serial.write(bytes(command))
-        time.sleep(0.1)  # 等待命令执行
+        Returns:
+        --------------------
+            Future resolving to the reply frame, or None for commands
+        """
+        if not self._thread.is_alive():
+            raise RuntimeError("串口已关闭")
+        future = Future()
+        self._queue.put((frame, response, reply_len, timeout, future))
+        return future
+
+    def _send_command(self, command) -> Future:
+        """发送命令，不等待执行"""
+        return self._submit(self._frame(command))
+
+    def _submit_query(self, command) -> Future:
+        """
+            Queue a query, the Future resolves to the position value (data1 << 8 | data2)
+        of the reply, or raises TimeoutError
+        """
+        # Pelco-D 查询的响应码为查询码 + 8, 如 0x51 -> 0x59
+        reply = self._submit(self._frame(command), response=command[3] + 8)
+        return _then(reply, lambda response: (response[4] << 8) | response[5])
 
     def _send_query_command(self, command):
         """发送查询命令并读取返回值"""
-        self.serial.reset_input_buffer()
-        self.serial.reset_output_buffer()
-
-        checksum = self._calculate_checksum(command)
-        command.append(checksum)
-        self.serial.write(bytes(command))
-        time.sleep(0.1)  # 等待响应
-        
-        # read all data in a iterative way
-        response=bytearray();prev=None
+        return self._submit_query(command).result()
+
+    def flush(self):
+        """
+            Block until every queued command has been sent
+        """
+        self._queue.join()
+
+    def cancel_pending(self) -> int:
+        """
+            Drop the commands still waiting in the queue, return how many were dropped
+        """
+        dropped = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return dropped
+            if item is None:
+                # 保留关闭信号
+                self._queue.task_done()
+                self._queue.put(None)
+                return dropped
+            item[-1].cancel()
+            self._queue.task_done()
+            dropped += 1
+
+    def close(self):
+        """发送完队列中的命令后关闭串口"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.serial.is_open:
+            self.serial.close()
+
+    def _io_worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                frame, response, reply_len, timeout, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self._transfer(frame, response, reply_len, timeout or self.response_timeout))
+                except Exception as e:
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def _transfer(self, frame, response, reply_len, timeout):
+        if response is not None and self.serial.in_waiting:
+            # 上一次超时查询迟到的响应, 不能当作本次查询的结果
+            stale = self.serial.read(self.serial.in_waiting)
+            logger.debug(f"丢弃迟到的云台响应: {[hex(x) for x in stale]}")
+
+        self.serial.write(frame)
+        if response is None:
+            # 等待命令在 2400 波特率下发送完毕并被云台处理
+            time.sleep(len(frame) * BITS_PER_BYTE / self.serial.baudrate + self.command_gap)
+            return None
+
+        reply = self._read_frame(response, reply_len, timeout)
+        logger.debug(f"收到云台响应: {[hex(x) for x in reply]}")
+        return reply
+
+    def _read_frame(self, response=None, length=PELCOD_FRAME_LEN, timeout=None):
+        """
+            Read one response frame: sync on 0xFF, take ``length`` bytes, check checksum and address.
+        Returns as soon as a valid frame is complete; garbage, corrupt frames and frames whose cmd2 is
+        not ``response`` are skipped.
+
+        Raises:
+        --------------------
+            TimeoutError: no valid frame within timeout, default response_timeout
+        """
+        timeout = timeout or self.response_timeout
+        deadline = time.perf_counter() + timeout
+        buffer = bytearray()
         while True:
-            response+= self.serial.read(1)
-            if prev == response:
-                break
-            prev=response.copy()
-        response=bytes(response)
-
-        # 读取7字节的响应
-        if len(response) != 7:
-            logger.error(f"未收到云台响应: {[hex(x) for x in response]}")
-            raise TimeoutError("未收到云台响应")
-        else:
-            logger.debug(f"收到云台响应: {[hex(x) for x in response]}")
-        
-        # 返回位置值（byte5和byte6）
-        return (response[4] << 8) | response[5]
-    
-
-        # other reading methods
-        # response=self.serial.readline()
-        # data_left = self.serial.in_waiting
-        # response = self.serial.read(7)
+            # 丢弃帧头之前的字节
+            start = buffer.find(PELCOD_SYNC)
+            del buffer[:start if start >= 0 else len(buffer)]
+
+            if len(buffer) >= length:
+                frame = bytes(buffer[:length])
+                if self._calculate_checksum(frame[:-1]) == frame[-1] and frame[1] == self.address:
+                    if response is None or frame[3] == response:
+                        return frame
+                    logger.debug(f"丢弃非本次查询的响应帧: {[hex(x) for x in frame]}")
+                    del buffer[:length]
+                    continue
+                logger.debug(f"丢弃无效响应帧: {[hex(x) for x in frame]}")
+                # 从下一个字节重新寻找帧头
+                del buffer[:1]
+                continue
+
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                logger.debug(f"未收到云台响应: {[hex(x) for x in buffer]}")
+                raise TimeoutError("未收到云台响应")
+            # read() returns once the requested bytes arrived, or when the time left is used up
+            self.serial.timeout = remaining
+            buffer += self.serial.read(length - len(buffer) if buffer else 1)
@@ -1,46 +1,103 @@
-from .pelcod_controller import PelcoDController
+from .pelcod_controller import PelcoDController, _then
 import time
+from collections import deque
 from loguru import logger
 
+
+# 到位检测
+SETTLE_POLL_MIN_S = 0.05    # 最短轮询间隔（秒）
+SETTLE_POLL_MAX_S = 0.5     # 最长轮询间隔（秒）
+SETTLE_WINDOW = 3           # 连续读数不变的次数, 达到后认为云台已停止
+SETTLE_STABLE_DEG = 0.02    # 读数不变的容限（度）, 位置分辨率为 0.01 度
+SETTLE_STALL_S = 2.0        # 停在容限之外超过该时间则判定为未到达
+
+# 扩展指令: 0x91 同时设置 pan/tilt/zoom 和速度, 0x93 同时查询 pan/tilt/zoom (响应 0x9B)
+EXTENDED_MOVE_SPEED = (10 * 100) // 2   # 0x91 的速度字段, 与 pts/test.py 原型相同
+EXTENDED_REPLY_LEN = 11                 # FF addr 00 9B panM panL tiltM tiltL zoomM zoomL checksum
+EXTENDED_PROBE_TIMEOUT_S = 0.3          # 连接时探测扩展指令的等待时间
+
+# 探测结果按 (串口, 地址) 缓存, 同一云台再次连接时不再等待探测超时
+_extended_by_port = {}
+
+
+def _angle_error(current, target):
+    """平移角度差, 考虑 0/360 度回绕"""
+    return (current - target + 180) % 360 - 180
+
+
 class PTSController(PelcoDController):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, extended=None, **kwargs):
+        """
+        参数:
+            extended: 是否使用 0x91/0x93 扩展指令, None 时使用本串口上次的探测结果, 没有则在连接时探测
+        """
         # 初始化父类
         super().__init__(*args, **kwargs)
+        # 每次移动的到位记录: settled, time_s, polls, pan, tilt
+        self.last_settle = None
+        self.settle_history = []
+        # 支持扩展指令时, 每次位姿设置和位置查询只需一帧
+        if extended is None:
+            key = (self.serial.port, self.address)
+            if key not in _extended_by_port:
+                _extended_by_port[key] = self._probe_extended()
+            extended = _extended_by_port[key]
+        self.extended = extended
+
+    def _probe_extended(self):
+        try:
+            self._submit_pose_query(timeout=EXTENDED_PROBE_TIMEOUT_S).result()
+        except TimeoutError:
+            logger.info("云台不支持 0x91/0x93 扩展指令, 使用标准 Pelco-D 指令")
+            return False
+        logger.info("云台支持 0x91/0x93 扩展指令")
+        return True
 
     # Getters
+    _PAN_QUERY = 0x51
+    _TILT_QUERY = 0x53
+
+    def _query_degrees(self, future):
+        try:
+            # 将位置值转换为角度 (0~35900 -> 0~359, 0~18000 -> 0~180)
+            return future.result() / 100.0
+        except TimeoutError:
+            return None
+
     def get_pan_position(self):
         """获取当前平移角度
         返回值: 0-359度之间的浮点数
         """
-        command = [0xFF, self.address, 0x00, 0x51, 0x00, 0x00]
-        try:
-            position = self._send_query_command(command)
-            # 将位置值转换为角度 (0~35900 -> 0~359)
-            return position / 100.0
-        except TimeoutError:
-            return None
+        command = [0xFF, self.address, 0x00, self._PAN_QUERY, 0x00, 0x00]
+        return self._query_degrees(self._submit_query(command))
 
     def get_tilt_position(self):
         """获取当前倾斜角度
         返回值: 0-180度之间的浮点数
         """
-        command = [0xFF, self.address, 0x00, 0x53, 0x00, 0x00]
-        try:
-            position = self._send_query_command(command)
-            # 将位置值转换为角度 (0~18000 -> 0~180)
-            return position / 100.0
-        except TimeoutError:
-            return None
+        command = [0xFF, self.address, 0x00, self._TILT_QUERY, 0x00, 0x00]
+        return self._query_degrees(self._submit_query(command))
+
+    def _submit_pose_query(self, timeout=None):
+        """0x93 查询, Future 的结果为 (pan, tilt, zoom) 原始位置值"""
+        command = [0xFF, self.address, 0x00, 0x93, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]
+        reply = self._submit(self._frame(command), response=0x9B, reply_len=EXTENDED_REPLY_LEN, timeout=timeout)
+        return _then(reply, lambda r: ((r[4] << 8) | r[5], (r[6] << 8) | r[7], (r[8] << 8) | r[9]))
 
     def get_current_pose(self):
         """获取当前云台的完整位置信息
         返回值: (pan_angle, tilt_angle) 元组，如果查询失败则相应位置为None
         """
-        time.sleep(0.1)
-        pan = self.get_pan_position()
-        time.sleep(0.1)
-        tilt = self.get_tilt_position()
-        return (pan, tilt)
+        if self.extended:
+            try:
+                pan, tilt, _ = self._submit_pose_query().result()
+            except TimeoutError:
+                return (None, None)
+            return (pan / 100.0, tilt / 100.0)
+        # 两个查询一起排队, 再等待结果
+        pan = self._submit_query([0xFF, self.address, 0x00, self._PAN_QUERY, 0x00, 0x00])
+        tilt = self._submit_query([0xFF, self.address, 0x00, self._TILT_QUERY, 0x00, 0x00])
+        return (self._query_degrees(pan), self._query_degrees(tilt))
 
     # Setters
     def set_pan_position(self, degree):
@@ -75,62 +132,122 @@ class PTSController(PelcoDController):
         self._send_command(command)
         print(f"正在前往预设位置 {preset_number}")
 
-    def set_pan_tilt(self, pan, tilt):
-        self.set_pan_position(pan)
-        self.set_tilt_position(tilt)
+    def set_pan_tilt(self, pan, tilt, speed=EXTENDED_MOVE_SPEED):
+        """同时设置平移和倾斜角度, 命令排队发送, 立即返回
+        参数:
+            speed: 0x91 扩展指令的速度字段, 标准指令时忽略
+        """
+        if not self.extended:
+            self.set_pan_position(pan)
+            self.set_tilt_position(tilt)
+            return
+        if not 0 <= pan <= 359:
+            raise ValueError("平移角度必须在0-359度之间")
+        if not 0 <= tilt <= 180:
+            raise ValueError("倾斜角度必须在0-180度之间")
+
+        pan, tilt = int(pan * 100), int(tilt * 100)  # 转换为协议要求的范围
+        command = [0xFF, self.address, 0x00, 0x91,
+                  (pan >> 8) & 0xFF, pan & 0xFF,        # Pan MSB, LSB
+                  (tilt >> 8) & 0xFF, tilt & 0xFF,      # Tilt MSB, LSB
+                  0x00, 0x00,                           # Zoom
+                  (speed >> 8) & 0xFF, speed & 0xFF]    # Speed MSB, LSB
+        self._send_command(command)
 
     # Others
     def cancel_movement(self):
-        """取消当前运动指令"""
+        """取消当前运动指令, 并丢弃尚未发送的命令"""
+        dropped = self.cancel_pending()
+        if dropped:
+            logger.debug(f"丢弃 {dropped} 条未发送的命令")
         cancel_command = [0xFF, self.address, 0x00, 0x80, 0x00, 0x00]
-        checksum = self._calculate_checksum(cancel_command)
-        cancel_command.append(checksum)
-        self.serial.write(bytes(cancel_command))
-        time.sleep(0.1)  # 等待取消命令执行
-
-    def close(self):
-        if self.serial.is_open:
-            self.serial.close()
+        self._send_command(cancel_command).result()
 
     # High level functions
     def wait_for_movement(self, target_pan, target_tilt, timeout=40, tolerance=0.5):
         """
-        等待云台移动到目标位置
-        
+        等待云台移动到目标位置并停稳
+
+        位置在容限之内且连续 SETTLE_WINDOW 次读数不变时返回 True. 轮询间隔按剩余距离和
+        估计的移动速度自适应: 远离目标时稀疏, 接近目标时加密. 每次移动的耗时记录在
+        last_settle 和 settle_history 中.
+
         参数:
-            target_pan: 目标平移角度
-            target_tilt: 目标倾斜角度
+            target_pan: 目标平移角度 or None
+            target_tilt: 目标倾斜角度 or None
             timeout: 最大等待时间（秒）
             tolerance: 位置误差容限（度）
-        
+
         返回:
             bool: 是否成功到达目标位置
         """
-        time.sleep(1)
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
+        start_time = time.perf_counter()
+        readings = deque(maxlen=SETTLE_WINDOW)
+        previous = None         # (时间, 误差), 用于估计速度
+        speed = None            # 误差减小的速度（度/秒）
+        stalled_since = None
+        polls = 0
+        current_pan = current_tilt = None
+
+        while time.perf_counter() - start_time < timeout:
             current_pan, current_tilt = self.get_current_pose()
-            
+            polls += 1
+            now = time.perf_counter()
+
             # 如果获取位置失败，说明还在移动中，继续等待
-            if current_pan is not None and current_tilt is not None:
-                if abs(current_pan - target_pan) < tolerance and abs(current_tilt - target_tilt) < tolerance:
-                    return True
-                else:
-                    logger.debug(f"moved to position  ... {current_pan}, {current_tilt}")
-                    logger.debug(f"yet target position... {target_pan}, {target_tilt}")
-                    return True
-                    # this is a hack to make the function return True, sometimes this query command will fail to get correct position
-                    # time.sleep(1)
-                    # continue
-            else:
+            if current_pan is None or current_tilt is None:
                 logger.debug("等待云台移动中...")
-                time.sleep(1)
+                readings.clear()
+                previous = None
+                time.sleep(SETTLE_POLL_MAX_S)
                 continue
-        
-        
+
+            error = max(abs(_angle_error(current_pan, target_pan)) if target_pan is not None else 0.0,
+                        abs(current_tilt - target_tilt) if target_tilt is not None else 0.0)
+            readings.append((current_pan, current_tilt))
+            stable = len(readings) == SETTLE_WINDOW and all(
+                abs(_angle_error(pan, current_pan)) <= SETTLE_STABLE_DEG and abs(tilt - current_tilt) <= SETTLE_STABLE_DEG
+                for pan, tilt in readings)
+
+            if stable and error < tolerance:
+                self._record_settle(True, start_time, polls, current_pan, current_tilt)
+                return True
+            if stable:
+                # 已停止但不在目标位置, 可能是刚发出命令尚未启动, 等待 SETTLE_STALL_S 再判定
+                stalled_since = stalled_since or now
+                if now - stalled_since >= SETTLE_STALL_S:
+                    logger.warning(f"云台停在 {current_pan}, {current_tilt}, 目标 {target_pan}, {target_tilt}")
+                    break
+            else:
+                stalled_since = None
+
+            if previous is not None and now > previous[0]:
+                speed = abs(previous[1] - error) / (now - previous[0])
+            previous = (now, error)
+            if error < tolerance:
+                # 确认是否停稳
+                interval = SETTLE_POLL_MIN_S
+            elif speed:
+                # 预计到达时间的一半
+                interval = (error - tolerance) / speed / 2
+            else:
+                interval = SETTLE_POLL_MAX_S
+            time.sleep(min(max(interval, SETTLE_POLL_MIN_S), SETTLE_POLL_MAX_S))
+
+        self._record_settle(False, start_time, polls, current_pan, current_tilt)
         return False
 
+    def _record_settle(self, settled, start_time, polls, pan, tilt):
+        self.last_settle = {
+            'settled': settled,
+            'time_s': time.perf_counter() - start_time,
+            'polls': polls,
+            'pan': pan,
+            'tilt': tilt,
+        }
+        self.settle_history.append(self.last_settle)
+        logger.debug(f"到位检测: {'已停稳' if settled else '未到达'}, 耗时 {self.last_settle['time_s']:.2f}s, 查询 {polls} 次")
+
     def goto_position_blocked(self, target_pan, target_tilt):
         """
         前往目标位置并等待到达
@@ -143,12 +260,12 @@ class PTSController(PelcoDController):
             bool: 是否成功到达目标位置
         """
         # 设置云台位置
-        if target_pan is not None:
+        if target_pan is not None and target_tilt is not None:
+            self.set_pan_tilt(target_pan, target_tilt)
+        elif target_pan is not None:
             self.set_pan_position(target_pan)
-            time.sleep(0.1)
-        if target_tilt is not None:
+        elif target_tilt is not None:
             self.set_tilt_position(target_tilt)
-            time.sleep(0.1)
 
         # 等待云台到达目标位置
         logger.info("等待云台到达目标位置...")
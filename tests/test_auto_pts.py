@@ -0,0 +1,30 @@
+import pytest
+
+from pts.auto_pts import SCAN_ORDERS, PTSPositionGenerator
+
+
+GRIDS = [(9, 9), (5, 3), (2, 7)]
+
+
+def _grid(generator, order):
+    return sorted(tuple(position) for position in generator.generate_grid_positions(order))
+
+
+@pytest.mark.parametrize("h_count, v_count", GRIDS)
+@pytest.mark.parametrize("order", SCAN_ORDERS + ("auto",))
+def test_order_is_permutation_of_grid(order, h_count, v_count):
+    generator = PTSPositionGenerator(h_count=h_count, v_count=v_count)
+    positions = generator.generate_grid_positions(order)
+
+    assert len(positions) == h_count * v_count
+    assert _grid(generator, order) == _grid(generator, "raster")
+
+
+@pytest.mark.parametrize("h_count, v_count", GRIDS)
+def test_auto_is_never_slower_than_raster(h_count, v_count):
+    generator = PTSPositionGenerator(h_count=h_count, v_count=v_count)
+    times = generator.predict_travel_times()
+
+    assert generator.travel_time(generator.generate_grid_positions("auto", times)) <= times["raster"]
+    assert generator.travel_time(generator.generate_grid_positions("auto")) <= \
+        generator.travel_time(generator.generate_grid_positions("raster"))
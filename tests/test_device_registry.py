@@ -0,0 +1,45 @@
+import pytest
+
+from hik import sim_camera
+from hik.errors import CameraError
+from hik.device_registry import DeviceRegistry
+
+
+@pytest.fixture
+def registry():
+    yield DeviceRegistry("sim")
+    sim_camera.configure()
+
+
+def test_resolve_matches_exactly(registry):
+    sim_camera.configure(["left", "right", "left_spare"])
+    assert registry.resolve("LEFT").user_name == "left"
+    assert registry.resolve("SIM00000002").user_name == "right"
+    # an exact match wins over names containing the key
+    assert registry.resolve("left").user_name == "left"
+    # serial numbers are not searched for substrings
+    assert registry.resolve("1") is None
+
+
+def test_resolve_falls_back_to_part_of_the_name(registry):
+    sim_camera.configure(["A_left_cam", "D_right_cam"])
+    assert registry.resolve("left").user_name == "A_left_cam"
+    assert registry.resolve("RIGHT").user_name == "D_right_cam"
+    with pytest.raises(CameraError):
+        registry.resolve("cam")
+
+
+def test_resolve_raises_on_ambiguous_name(registry):
+    sim_camera.configure(["left", "left"])
+    with pytest.raises(CameraError):
+        registry.resolve("left")
+    assert registry.by_name("left") is None
+
+
+def test_invalidate_enumerates_again(registry):
+    sim_camera.configure(["left", "right"])
+    assert len(registry.devices()) == 2
+    sim_camera.configure(["cam0", "cam1", "cam2"])
+    assert len(registry.devices()) == 2
+    registry.invalidate()
+    assert [d.user_name for d in registry.devices()] == ["cam0", "cam1", "cam2"]
@@ -0,0 +1,76 @@
+from ctypes import POINTER, cast
+
+import pytest
+
+from hik import sim_camera
+from hik.backend import get_backend
+from hik.feature_config import FeatureConfigEngine, FeatureFile
+from hik.hik_sync_cam import SLAVE_CFG_PATH
+
+TRIGGER_SOURCE = ("TriggerSource", ("TriggerSelector", "FrameBurstStart"))
+
+
+@pytest.fixture
+def sdk():
+    sim_camera.configure(["cam0"])
+    yield get_backend("sim")
+    sim_camera.configure()
+
+
+def _open(sdk):
+    device_list = sdk.MV_CC_DEVICE_INFO_LIST()
+    sdk.MvCamera.MV_CC_EnumDevices(sdk.MV_GIGE_DEVICE | sdk.MV_USB_DEVICE, device_list)
+    cam = sdk.MvCamera()
+    assert cam.MV_CC_CreateHandle(cast(device_list.pDeviceInfo[0], POINTER(sdk.MV_CC_DEVICE_INFO)).contents) == 0
+    assert cam.MV_CC_OpenDevice() == 0
+    return cam
+
+
+def _close(cam):
+    cam.MV_CC_CloseDevice()
+    cam.MV_CC_DestroyHandle()
+
+
+def _device_value(cam, key, tmp_path):
+    path = tmp_path / "device.cfg"
+    assert cam.MV_CC_FeatureSave(str(path)) == 0
+    return FeatureFile.parse(path).settings[key].value
+
+
+def test_cached_apply_rewrites_trigger_settings(sdk, tmp_path):
+    engine = FeatureConfigEngine()
+    cam = _open(sdk)
+    engine.apply(cam, SLAVE_CFG_PATH, "cam0", sdk=sdk)
+    assert _device_value(cam, TRIGGER_SOURCE, tmp_path) == "Line5"
+    _close(cam)
+
+    # another program switches the trigger source while the app is disconnected
+    cam = _open(sdk)
+    cam.MV_CC_SetEnumValueByString("TriggerSelector", "FrameBurstStart")
+    cam.MV_CC_SetEnumValueByString("TriggerSource", "Software")
+    _close(cam)
+
+    cam = _open(sdk)
+    report = engine.apply(cam, SLAVE_CFG_PATH, "cam0", sdk=sdk)
+    assert report.cached
+    assert _device_value(cam, TRIGGER_SOURCE, tmp_path) == "Line5"
+    _close(cam)
+
+
+def test_cached_apply_rejects_changed_selected_feature(sdk, tmp_path):
+    engine = FeatureConfigEngine()
+    cam = _open(sdk)
+    engine.apply(cam, SLAVE_CFG_PATH, "cam0", sdk=sdk)
+    _close(cam)
+
+    cam = _open(sdk)
+    cam.MV_CC_SetEnumValueByString("AutoFunctionAOISelector", "AOI1")
+    cam.MV_CC_SetIntValue("AutoFunctionAOIWidth", 64)
+    _close(cam)
+
+    cam = _open(sdk)
+    report = engine.apply(cam, SLAVE_CFG_PATH, "cam0", sdk=sdk)
+    assert not report.cached
+    key = ("AutoFunctionAOIWidth", ("AutoFunctionAOISelector", "AOI1"))
+    assert _device_value(cam, key, tmp_path) == FeatureFile.parse(SLAVE_CFG_PATH).settings[key].value
+    _close(cam)
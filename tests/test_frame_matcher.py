@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from hik.frames import CapturedFrame, StereoMatcher
+
+
+def _frames(interval_ms, triggers, missed=(), order=(0, 1)):
+    """
+        Frames of a stereo rig for the given triggers, in arrival order. A camera that misses a trigger
+    does not expose, so its frame numbers simply continue with the next trigger it sees.
+    """
+    frame_num = {0: 100, 1: 7}
+    frames = []
+    for trigger in triggers:
+        for camera in order:
+            if (camera, trigger) in missed:
+                continue
+            frames.append(CapturedFrame(
+                camera=camera,
+                image=np.zeros((1, 1), np.uint8),
+                frame_num=frame_num[camera],
+                # the second camera arrives a few ms after the first
+                host_timestamp=1_000_000 + trigger * interval_ms + 5 + 3 * order.index(camera),
+                meta={"trigger": trigger},
+            ))
+            frame_num[camera] += 1
+    return frames
+
+
+def _pairs(matcher, frames):
+    sets = [matcher.push(frame) for frame in frames]
+    return [(s.left.meta["trigger"], s.right.meta["trigger"]) for s in sets if s is not None]
+
+
+@pytest.mark.parametrize("interval_ms", [2000, 120])
+@pytest.mark.parametrize("order", [(0, 1), (1, 0)])
+def test_missed_trigger_realigns(interval_ms, order):
+    matcher = StereoMatcher()
+    pairs = _pairs(matcher, _frames(interval_ms, range(10), missed={(1, 3)}, order=order))
+
+    assert pairs == [(t, t) for t in range(10) if t != 3]
+    assert matcher.orphans == 1
+
+
+@pytest.mark.parametrize("interval_ms", [2000, 120])
+def test_lost_first_frame_realigns(interval_ms):
+    matcher = StereoMatcher()
+    pairs = _pairs(matcher, _frames(interval_ms, range(6), missed={(1, 0)}))
+
+    assert pairs == [(t, t) for t in range(1, 6)]
+
+
+@pytest.mark.parametrize("interval_ms", [2000, 120, 30])
+def test_in_sync_frames_pair_by_trigger(interval_ms):
+    matcher = StereoMatcher()
+    pairs = _pairs(matcher, _frames(interval_ms, range(20)))
+
+    assert pairs == [(t, t) for t in range(20)]
+    assert matcher.orphans == 0
@@ -0,0 +1,52 @@
+import gc
+
+import numpy as np
+
+from hik.frame_pool import FrameBufferPool
+
+
+WIDTH, HEIGHT, PIXEL_TYPE = 64, 48, 0x02180014
+NBYTES = WIDTH * HEIGHT * 3
+
+
+def grab(pool, value):
+    buf = pool.acquire(WIDTH, HEIGHT, PIXEL_TYPE, NBYTES)
+    array = pool.wrap(buf, WIDTH, HEIGHT)
+    array[...] = value
+    return array
+
+
+def test_view_keeps_buffer_after_parent_is_deleted():
+    pool = FrameBufferPool("test")
+    array = grab(pool, 7)
+    view = array[10:20].reshape(-1)
+    assert np.shares_memory(view, array)
+    del array
+    gc.collect()
+    assert pool.stats()["in_use"] == 1
+
+    # the next grab must not reuse the buffer the view still points into
+    grab(pool, 200)
+    assert np.all(view == 7)
+
+
+def test_buffer_returns_once_every_view_is_gone():
+    pool = FrameBufferPool("test")
+    array = grab(pool, 1)
+    view = array[:, :, 0]
+    del array
+    gc.collect()
+    assert pool.stats()["in_use"] == 1
+    del view
+    gc.collect()
+    assert pool.stats()["in_use"] == 0
+
+    grab(pool, 2)
+    assert pool.stats()["hits"] == 1
+
+
+def test_single_channel_wrap():
+    pool = FrameBufferPool("test")
+    buf = pool.acquire(WIDTH, HEIGHT, PIXEL_TYPE, WIDTH * HEIGHT)
+    array = pool.wrap(buf, WIDTH, HEIGHT, channels=1)
+    assert array.shape == (HEIGHT, WIDTH) and array.dtype == np.uint8
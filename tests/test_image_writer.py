@@ -0,0 +1,44 @@
+import threading
+
+import numpy as np
+import pytest
+
+from hik.image_writer import ImageWriter
+
+
+def test_close_writes_queued_images_and_stops_workers(tmp_path):
+    writer = ImageWriter(workers=2, max_pending=4)
+    futures = [writer.submit(tmp_path / f"{i}.jpg", np.full((32, 32, 3), i, np.uint8)) for i in range(4)]
+    writer.close()
+
+    assert all(future.done() for future in futures)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["0.jpg", "1.jpg", "2.jpg", "3.jpg"]
+    assert not any(thread.is_alive() for thread in writer._threads)
+    with pytest.raises(RuntimeError):
+        writer.submit(tmp_path / "late.jpg", np.zeros((32, 32, 3), np.uint8))
+    writer.close()
+
+
+def test_submit_racing_close_raises_closed_error(tmp_path):
+    writer = ImageWriter(workers=2, max_pending=2)
+    image = np.zeros((16, 16, 3), np.uint8)
+    futures, errors = [], []
+
+    def submit_loop(k):
+        for i in range(200):
+            try:
+                futures.append(writer.submit(tmp_path / f"{k}_{i}.jpg", image))
+            except RuntimeError as e:
+                errors.append(str(e))
+                return
+
+    threads = [threading.Thread(target=submit_loop, args=(k,)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    writer.close()
+    for thread in threads:
+        thread.join()
+
+    # every accepted image is written, every late one gets the writer's own error
+    assert all(future.done() and future.exception() is None for future in futures)
+    assert set(errors) <= {"image writer is closed"}
@@ -0,0 +1,149 @@
+import os
+import pty
+import queue
+import select
+import threading
+import time
+import tty
+
+import pytest
+
+from pts import pts_controller
+from pts.pelcod_controller import BITS_PER_BYTE, PelcoDController
+
+
+PAN_QUERY = [0xFF, 0x01, 0x00, 0x51, 0x00, 0x00]
+PAN_REPLY = 0x59
+BAUDRATE = 2400
+
+
+def _frame(body, checksum=None):
+    return bytes([0xFF, *body, sum(body) % 256 if checksum is None else checksum])
+
+
+def _reply(value, opcode=PAN_REPLY, address=0x01, checksum=None):
+    return _frame([address, 0x00, opcode, value >> 8, value & 0xFF], checksum)
+
+
+class FakeHead:
+    """
+        Pan-tilt head on the master side of a pty: answers every 7 byte request with the next queued
+    reply, after the reply's wire time at 2400 baud. A reply given as a list of (delay s, bytes) is
+    written chunk by chunk.
+    """
+    def __init__(self):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.replies = queue.Queue()
+        self.requests = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        buffer = b""
+        while not self._stop.is_set():
+            if not select.select([self.master], [], [], 0.05)[0]:
+                continue
+            buffer += os.read(self.master, 64)
+            while len(buffer) >= 7:
+                request, buffer = buffer[:7], buffer[7:]
+                self.requests.append(request)
+                try:
+                    reply = self.replies.get_nowait()
+                except queue.Empty:
+                    continue
+                if isinstance(reply, bytes):
+                    reply = [(len(reply) * BITS_PER_BYTE / BAUDRATE, reply)]
+                for delay, chunk in reply:
+                    time.sleep(delay)
+                    os.write(self.master, chunk)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+@pytest.fixture
+def head():
+    head = FakeHead()
+    yield head
+    head.close()
+
+
+@pytest.fixture
+def controller(head):
+    controller = PelcoDController(port=head.port, response_timeout=0.2)
+    yield controller
+    controller.close()
+
+
+def test_query_returns_in_wire_time(head):
+    controller = PelcoDController(port=head.port)
+    try:
+        head.replies.put(_reply(12345))
+        start = time.perf_counter()
+        assert controller._send_query_command(PAN_QUERY) == 12345
+        # request and reply are 7 bytes each, ~60 ms at 2400 baud, far below the 1 s response timeout
+        assert time.perf_counter() - start < 0.3
+        assert head.requests == [_frame(PAN_QUERY[1:])]
+    finally:
+        controller.close()
+
+
+def test_syncs_on_header_after_garbage(head, controller):
+    head.replies.put(b"\x00\x12\x34" + _reply(100))
+    assert controller._send_query_command(PAN_QUERY) == 100
+
+
+def test_skips_frame_with_bad_checksum(head, controller):
+    corrupt = bytearray(_reply(100))
+    corrupt[-1] ^= 0x01
+    head.replies.put(bytes(corrupt) + _reply(200))
+    assert controller._send_query_command(PAN_QUERY) == 200
+
+
+def test_skips_frame_of_other_address(head, controller):
+    head.replies.put(_reply(100, address=0x02) + _reply(200))
+    assert controller._send_query_command(PAN_QUERY) == 200
+
+
+def test_skips_reply_to_other_query(head, controller):
+    # a tilt reply (0x5B) is not the answer to a pan query
+    head.replies.put(_reply(100, opcode=0x5B) + _reply(200))
+    assert controller._send_query_command(PAN_QUERY) == 200
+
+
+def test_times_out_without_valid_reply(head, controller):
+    head.replies.put(_reply(100, checksum=0x00))
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        controller._send_query_command(PAN_QUERY)
+    assert 0.2 <= time.perf_counter() - start < 0.5
+
+
+def test_timeout_holds_while_bytes_trickle_in(head, controller):
+    # a byte of garbage just before each serial timeout must not extend the wait for a frame
+    head.replies.put([(0.18, b"\x00")] * 3)
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        controller._send_query_command(PAN_QUERY)
+    assert time.perf_counter() - start < 0.28
+
+
+def test_extended_probe_runs_once_per_port(head, monkeypatch):
+    monkeypatch.setattr(pts_controller, "_extended_by_port", {})
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        controller = pts_controller.PTSController(port=head.port)
+        timings.append(time.perf_counter() - start)
+        controller.close()
+        assert not controller.extended
+
+    # the standard head does not answer 0x93: the first connection waits for the probe, the second does not
+    assert timings[0] >= pts_controller.EXTENDED_PROBE_TIMEOUT_S
+    assert timings[1] < 0.1
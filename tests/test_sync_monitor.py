@@ -0,0 +1,35 @@
+import random
+
+import numpy as np
+
+from hik.frames import CapturedFrame, FrameSet
+from hik.sync_monitor import SyncMonitor
+
+
+def _frame_set(camera_clocks, t_trigger, rng):
+    frames = []
+    for camera, (epoch, rate) in enumerate(camera_clocks):
+        frames.append(CapturedFrame(
+            camera=camera,
+            image=np.zeros((1, 1), np.uint8),
+            dev_timestamp=int((epoch + t_trigger * rate) * 1e9),
+            # delivery delay 5 ms plus up to 0.2 ms of jitter
+            arrival=t_trigger + 0.005 + rng.uniform(0, 0.0002),
+        ))
+    return FrameSet(frames)
+
+
+def test_drifting_clocks_stay_in_sync_over_the_window():
+    rng = random.Random(0)
+    # the cameras' clocks run 20 ppm fast and slow, triggers are 3 s apart so 16 frames span 45 s
+    clocks = [(1000.0, 1 + 20e-6), (52.0, 1 - 20e-6)]
+    monitor = SyncMonitor(2)
+    spreads = []
+    for i in range(60):
+        frame_set = _frame_set(clocks, 3.0 * i, rng)
+        monitor.measure(frame_set)
+        spreads.append(max(frame_set.exposure_starts) - min(frame_set.exposure_starts))
+
+    # once the window is full, the residual is the delivery jitter; a constant offset would be off by ~1 ms
+    assert max(spreads[16:]) * 1e3 < 0.5
+    assert monitor.stats()["flagged"] == 0